@@ -17,10 +17,19 @@ PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
 # 导入模型和数据库操作
 from database.models import db, User, Song, Rating, PlayHistory
 from database.db_operations import (
-    get_system_stats, get_top_songs, get_new_songs, 
+    get_top_songs, get_new_songs, 
     get_high_rated_songs, record_play, get_song_by_id,
-    search_songs, get_user_ratings, get_user_play_history
+    search_songs, count_search_songs, fuzzy_search_songs, get_user_ratings, get_user_play_history, record_play_batch,
+    upgrade_schema
 )
+from database.play_buffer import play_buffer
+from database.system_stats import system_stats
+from database.song_pages import get_song_page
+from database.storage import init_storage
+from web.page_cache import page_cache
+from web.conditional import conditional_get, song_version, genres_version, artists_version, charts_version
+from web.json_response import json_response
+from database.song_fields import parse_fields, song_to_dict, CHART_FIELDS, CHART_FIELDS_ALLOWED
 
 # 导入推荐算法
 try:
@@ -28,6 +37,7 @@ try:
     from recommender.collaborative import CollaborativeFiltering
     from recommender.content_based import ContentBasedRecommender  # 添加这行
     from recommender.hybrid import HybridRecommender
+    from recommender.popularity_snapshot import popularity_snapshot
     print("✅ 推荐算法导入成功")
 except ImportError as e:
     print(f"⚠️  推荐算法导入失败: {e}")
@@ -61,6 +71,14 @@ except ImportError as e:
             pass
         def recommend_by_type(self, user_id, rec_type):
             return []
+    class _DatabaseSnapshot:  # 直接查询数据库的榜单
+        def get(self, list_type, limit=10):
+            loaders = {'popular': get_top_songs, 'trending': get_top_songs,
+                       'new': get_new_songs, 'high_rated': get_high_rated_songs}
+            return loaders[list_type](limit=limit)
+        def current_version(self):
+            return None  # 没有快照，页面不缓存
+    popularity_snapshot = _DatabaseSnapshot()
 
 # 初始化推荐器
 popularity_recommender = PopularityRecommender(top_n=10)
@@ -86,8 +104,9 @@ app.config.from_object(Config)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('logs', exist_ok=True)
 
-# 初始化数据库
-db.init_app(app)
+# 初始化数据库（SQLITE_STORAGE_MODE=concurrent 时为 WAL + 读写分离的连接池，见 database.storage）
+init_storage(app)
+play_buffer.init_app(app)  # 播放记录写缓冲，进程退出时写入剩余记录
 
 # Flask-Login配置
 login_manager = LoginManager()
@@ -112,14 +131,24 @@ if ROUTES_AVAILABLE:
 
 # ==================== 基础路由 ====================
 
+def _charts_version():
+    """首页/探索/排行榜页面的数据版本：榜单快照刷新后改变（热度榜模式另加热度榜的版本）"""
+    version = popularity_snapshot.current_version()
+    if version is None or request.args.get('mode') != 'trending':
+        return version
+    from recommender.trending import trending_engine
+    trending_engine.top(20)  # 热度榜缓存过期时重新计算
+    return f'{version}.{trending_engine.top_version}'
+
 @app.route('/')
+@page_cache.cached(_charts_version)
 def index():
     """首页"""
     try:
-        # 获取热门歌曲
-        hot_songs = get_top_songs(limit=6)
-        new_songs = get_new_songs(limit=6)
-        high_rated_songs = get_high_rated_songs(limit=6)
+        # 获取热门歌曲（内存榜单快照）
+        hot_songs = popularity_snapshot.get('popular', limit=6)
+        new_songs = popularity_snapshot.get('new', limit=6)
+        high_rated_songs = popularity_snapshot.get('high_rated', limit=6)
         
         return render_template('index.html',
                              hot_songs=hot_songs,
@@ -174,7 +203,10 @@ def test_db():
 def get_stats():
     """获取系统统计数据"""
     try:
-        stats = get_system_stats()
+        stats = system_stats.get()
+        # 首页统计卡片使用的字段名
+        stats.update(songs_count=stats['total_songs'], users_count=stats['total_users'],
+                     plays_count=stats['total_plays'], ratings_count=stats['total_ratings'])
         return jsonify({
             'success': True,
             'data': stats
@@ -185,6 +217,56 @@ def get_stats():
             'error': str(e)
         }), 500
 
+@app.route('/api/suggest')
+def suggest():
+    """搜索框输入提示：标题/歌手/专辑/流派的前缀补全，按热度排序"""
+    from search import suggest_index
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', Config.SUGGEST_LIMIT, type=int)
+    if limit < 1:
+        return jsonify({'success': False, 'error': 'limit 必须大于0'}), 400
+    response = jsonify({
+        'success': True,
+        'query': query,
+        'data': suggest_index.suggest(query, limit=limit)
+    })
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@app.route('/api/recommendations/cache_stats')
+def recommendation_cache_stats():
+    """推荐结果缓存的命中/未命中统计"""
+    from recommender.result_cache import recommendation_cache
+    return jsonify({
+        'success': True,
+        'data': recommendation_cache.stats()
+    })
+
+@app.route('/api/recommendations/source_stats')
+def recommendation_source_stats():
+    """混合推荐各候选来源的耗时分位数与超时次数"""
+    from recommender.candidates import source_timings
+    return jsonify({
+        'success': True,
+        'data': source_timings.stats()
+    })
+
+@app.route('/api/plays/batch', methods=['POST'])
+@login_required
+def play_batch():
+    """批量上报播放 {"plays": [{song_id, played_at, duration, key}, ...]}，按 key 去重"""
+    data = request.get_json(silent=True)
+    plays = data.get('plays') if isinstance(data, dict) else data
+    if not isinstance(plays, list):
+        return jsonify({'success': False, 'message': '缺少播放数据'}), 400
+    if len(plays) > Config.PLAY_BATCH_MAX_SIZE:
+        return jsonify({'success': False, 'message': f'单次最多上报{Config.PLAY_BATCH_MAX_SIZE}条播放'}), 413
+    
+    result = record_play_batch(current_user.id, plays)
+    if result is None:
+        return jsonify({'success': False, 'message': '保存播放记录失败，请重试'}), 503
+    return jsonify({'success': True, 'data': result})
+
 @app.route('/init_db')
 def init_database_route():
     """初始化数据库路由（仅开发使用）"""
@@ -210,6 +292,7 @@ def test_print():
     return "测试成功 - 查看控制台输出"
 
 @app.route('/explore')
+@page_cache.cached(_charts_version)
 def explore():
     """探索音乐页面"""
     try:
@@ -217,26 +300,16 @@ def explore():
         
         # 获取各种类型的歌曲
         print(f"🔍 获取热门歌曲...")
-        hot_songs = get_top_songs(limit=12)
+        hot_songs = popularity_snapshot.get('popular', limit=12)
         print(f"🔍 热门歌曲数量: {len(hot_songs)}")
         
         print(f"🔍 获取新歌...")
-        new_songs = get_new_songs(limit=12)
+        new_songs = popularity_snapshot.get('new', limit=12)
         print(f"🔍 新歌数量: {len(new_songs)}")
         
         print(f"🔍 获取高评分歌曲...")
-        high_rated_items = get_high_rated_songs(limit=12)  # 注意：这是 Row 对象
-        print(f"🔍 高评分歌曲数量: {len(high_rated_items)}")
-        
-        # 从 Row 对象中提取 Song 对象
-        high_rated_songs = []
-        for item in high_rated_items:
-            if hasattr(item, '_asdict'):
-                row_dict = item._asdict()
-                if 'Song' in row_dict and row_dict['Song']:
-                    high_rated_songs.append(row_dict['Song'])
-        
-        print(f"🔍 提取后的高评分歌曲数量: {len(high_rated_songs)}")
+        high_rated_songs = popularity_snapshot.get('high_rated', limit=12)
+        print(f"🔍 高评分歌曲数量: {len(high_rated_songs)}")
         
         # 打印详细数据
         print(f"\n🔍 详细数据检查:")
@@ -250,7 +323,6 @@ def explore():
         
         print(f"3. high_rated_songs 类型: {type(high_rated_songs)}, 长度: {len(high_rated_songs)}")
         if high_rated_songs:
-            print(f"   数据结构: Song 对象")
             print(f"   第一首歌曲: {high_rated_songs[0].title} - {high_rated_songs[0].artist}")
         
         return render_template('explore.html',
@@ -297,22 +369,29 @@ def debug_data():
         }), 500
 
 @app.route('/charts')
+@page_cache.cached(_charts_version)
 def charts():
     """排行榜页面"""
+    # 热门榜模式: total（累计播放次数）或 trending（近期热度，按时间衰减）
+    hot_mode = 'trending' if request.args.get('mode') == 'trending' else 'total'
     try:
-        # 获取排行榜数据
-        hot_songs = get_top_songs(limit=20)
-        new_songs = get_new_songs(limit=20)
-        high_rated_songs = get_high_rated_songs(limit=20)
+        # 获取排行榜数据（内存榜单快照）
+        hot_songs = popularity_snapshot.get('trending' if hot_mode == 'trending' else 'popular', limit=20)
+        new_songs = popularity_snapshot.get('new', limit=20)
+        high_rated_songs = popularity_snapshot.get('high_rated', limit=20)
         
         return render_template('charts.html',
                              hot_songs=hot_songs,
+                             hot_mode=hot_mode,
+                             trending_days=Config.POPULARITY_DAYS,
                              new_songs=new_songs,
                              high_rated_songs=high_rated_songs)
     except Exception as e:
         print(f"排行榜页面错误: {e}")
         return render_template('charts.html',
                              hot_songs=[],
+                             hot_mode=hot_mode,
+                             trending_days=Config.POPULARITY_DAYS,
                              new_songs=[],
                              high_rated_songs=[])
 
@@ -347,6 +426,10 @@ def recommendations():
             print(f"🔍 使用协同过滤推荐")
             hybrid_recommender.train(current_user.id)
             recommendations = hybrid_recommender.recommend_by_type(current_user.id, 'collaborative')
+        elif rec_type == 'als':
+            print(f"🔍 使用矩阵分解推荐")
+            hybrid_recommender.train(current_user.id)
+            recommendations = hybrid_recommender.recommend_by_type(current_user.id, 'als')
         elif rec_type == 'content':
             print(f"🔍 使用基于内容的推荐")
             hybrid_recommender.train(current_user.id)
@@ -448,11 +531,82 @@ def play_song(song_id):
         flash('播放失败，请重试', 'error')
         return redirect(request.referrer or url_for('index'))
 
+@app.route('/api/songs')
+def get_songs_api():
+    """歌曲列表：?cursor= 游标翻页（深翻页与第一页开销相同），旧的 page/per_page 仍然可用；?fields= 只返回这些字段"""
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), Config.SONGS_PAGE_MAX)
+    cursor = request.args.get('cursor', '')
+    include_total = request.args.get('include_total', '0' if cursor else '1') in ('1', 'true')
+    
+    try:
+        fields = parse_fields(request.args.get('fields', ''))
+        result = get_song_page(sort_by=request.args.get('sort_by', 'play_count'),
+                               genre=request.args.get('genre', ''), artist=request.args.get('artist', ''),
+                               limit=per_page, cursor=cursor or None, page=page, with_total=include_total,
+                               fields=fields)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    pagination = {'per_page': per_page, 'next_cursor': result['next_cursor'], 'has_more': result['has_more']}
+    if not cursor:
+        pagination['page'] = page
+    if result['total'] is not None:
+        pagination['total'] = result['total']
+        pagination['pages'] = (result['total'] + per_page - 1) // per_page
+    
+    return json_response({
+        'success': True,
+        'pagination': pagination,
+        'data': [song_to_dict(song, fields) for song in result['songs']]
+    })
+
+@app.route('/api/songs/search')
+def search_songs_api():
+    """搜索歌曲；精确搜索没有结果时按拼写容错匹配歌名/歌手名"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': '搜索关键词不能为空'}), 400
+    
+    try:
+        fields = parse_fields(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        songs = search_songs(query, limit=50, fields=fields)
+        fuzzy = False
+        if not songs:
+            songs = fuzzy_search_songs(query, limit=50, fields=fields)
+            fuzzy = bool(songs)
+        
+        return json_response({
+            'success': True,
+            'query': query,
+            'fuzzy': fuzzy,
+            'count': len(songs),
+            'data': [song_to_dict(song, fields) for song in songs]
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/song/<int:song_id>')
+@app.route('/api/songs/<int:song_id>')
+@conditional_get(song_version)
 def get_song_info(song_id):
-    """获取歌曲信息API"""
+    """获取歌曲信息API（?fields= 只返回这些字段）"""
     try:
-        song = get_song_by_id(song_id)
+        fields = parse_fields(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        song = get_song_by_id(song_id, fields=fields)
         
         if not song:
             return jsonify({
@@ -460,19 +614,9 @@ def get_song_info(song_id):
                 'error': '歌曲不存在'
             }), 404
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': {
-                'id': song.id,
-                'title': song.title,
-                'artist': song.artist,
-                'album': song.album,
-                'genre': song.genre,
-                'duration': song.duration,
-                'release_year': song.release_year,
-                'play_count': song.play_count,
-                'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0
-            }
+            'data': song_to_dict(song, fields)
         })
     except Exception as e:
         return jsonify({
@@ -480,6 +624,67 @@ def get_song_info(song_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/genres')
+@conditional_get(genres_version)
+def get_genres_api():
+    """全部流派"""
+    try:
+        genres = db.session.query(Song.genre).filter(Song.genre.isnot(None)).distinct().all()
+        genre_list = sorted(genre for genre, in genres if genre)
+        return json_response({'success': True, 'data': genre_list, 'count': len(genre_list)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/artists')
+@conditional_get(artists_version)
+def get_artists_api():
+    """艺术家列表（按总播放次数排序）"""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), Config.SONGS_PAGE_MAX)
+    try:
+        artists = db.session.query(
+            Song.artist,
+            db.func.count(Song.id).label('song_count'),
+            db.func.sum(Song.play_count).label('total_plays')
+        ).group_by(Song.artist).order_by(db.desc('total_plays')).limit(limit).all()
+        data = [{'name': artist, 'song_count': song_count, 'total_plays': total_plays or 0}
+                for artist, song_count, total_plays in artists]
+        return json_response({'success': True, 'data': data, 'count': len(data)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/charts')
+@conditional_get(charts_version)
+def get_charts_api():
+    """排行榜（?type=popular/new/high_rated，热门榜 ?mode=trending 为时间衰减热度榜），从内存榜单快照切片"""
+    chart_type = request.args.get('type', 'popular')
+    mode = request.args.get('mode', 'total')
+    limit = request.args.get('limit', 20, type=int)
+    try:
+        fields = parse_fields(request.args.get('fields', ''), default=CHART_FIELDS, allowed=CHART_FIELDS_ALLOWED)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        from recommender.popularity_snapshot import popularity_snapshot
+        trending = chart_type == 'popular' and mode == 'trending'
+        if chart_type == 'new':
+            songs = popularity_snapshot.get('new', limit)
+        elif chart_type == 'high_rated':
+            songs = [s for s in popularity_snapshot.get('high_rated', limit) if (s.avg_rating or 0) >= 4.0]
+        elif trending:
+            songs = popularity_snapshot.get('trending', limit)
+        else:
+            songs = popularity_snapshot.get('popular', limit)
+        
+        data = [{'rank': i + 1, **song_to_dict(song, fields)} for i, song in enumerate(songs)]
+        if trending:
+            from recommender.trending import trending_engine
+            for item in data:
+                item['trend_score'] = round(trending_engine.score(item['id']), 4)
+        return json_response({'success': True, 'type': chart_type, 'mode': mode, 'data': data, 'count': len(data)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ==================== 搜索路由 ====================
 
 @app.route('/search')
@@ -502,7 +707,7 @@ def search():
         
         # 执行搜索
         songs = search_songs(query, limit=per_page, offset=offset)
-        total_count = len(search_songs(query, limit=1000))  # 粗略估计总数
+        total_count = count_search_songs(query)
         
         return render_template('search.html',
                              songs=songs,
@@ -637,8 +842,7 @@ def inject_user():
 def inject_stats():
     """注入统计信息到模板"""
     try:
-        stats = get_system_stats()
-        return dict(system_stats=stats)
+        return dict(system_stats=system_stats.get())  # 内存缓存，不查询数据库
     except:
         return dict(system_stats={})
 
@@ -658,8 +862,9 @@ def print_startup_info():
     print("  2. ⭐ 好评排行推荐") 
     print("  3. 🆕 最近排行推荐")
     print("  4. 👥 协同过滤推荐")
-    print("  5. 🎵 内容推荐")
-    print("  6. ⚙️  混合推荐")
+    print("  5. 🧮 矩阵分解推荐")
+    print("  6. 🎵 内容推荐")
+    print("  7. ⚙️  混合推荐")
     print("-"*60)
     print("🚀 核心路由:")
     print("  /                      - 首页")
@@ -684,8 +889,9 @@ def test_vars():
 
 if __name__ == '__main__':
     with app.app_context():
-        # 创建数据库表（如果不存在）
+        # 创建数据库表（如果不存在），并为旧数据库补充新增的列
         db.create_all()
+        upgrade_schema()
     
     print_startup_info()
     
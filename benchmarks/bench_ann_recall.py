@@ -0,0 +1,58 @@
+"""
+近似最近邻索引基准测试：不同 n_probe 下的 recall@10 与查询延迟（对比精确搜索）
+
+用法: python -m benchmarks.bench_ann_recall [songs] [queries]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommender.ann_index import IVFIndex
+from recommender.content_based import ContentBasedRecommender
+from recommender.interactions import top_n_indices
+from benchmarks.bench_content import synthetic_songs
+
+
+def run(num_songs=100000, queries=300, k=10):
+    print(f"📊 ANN召回率基准: {num_songs}首歌曲, {queries}次查询, recall@{k}")
+    model = ContentBasedRecommender().fit_rows(synthetic_songs(num_songs))
+    features, song_ids = model.features, model.song_ids
+
+    start = time.perf_counter()
+    index = IVFIndex().build(song_ids, features)
+    print(f"  建索引({len(index.centroids)}个簇): {time.perf_counter() - start:.2f}s")
+
+    # 查询向量：随机若干首歌特征的平均，与用户画像的构造方式一致
+    rng = np.random.default_rng(0)
+    query_vectors = []
+    for _ in range(queries):
+        profile = features[rng.integers(0, num_songs, size=30)].mean(axis=0)
+        query_vectors.append(profile / np.linalg.norm(profile))
+
+    exact, latencies = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        top = top_n_indices(features @ query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        exact.append(set(song_ids[top].tolist()))
+    print(f"  精确搜索: p50={np.percentile(latencies, 50):.2f}ms")
+
+    for n_probe in (1, 2, 4, 8, 16, 32):
+        if n_probe > len(index.centroids):
+            break
+        hits, latencies = 0, []
+        for query, truth in zip(query_vectors, exact):
+            start = time.perf_counter()
+            ids, _ = index.search(query, k, n_probe=n_probe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(truth & set(ids.tolist()))
+        print(f"  n_probe={n_probe:>2}: recall@{k}={hits / (k * queries):.3f} "
+              f"p50={np.percentile(latencies, 50):.2f}ms p95={np.percentile(latencies, 95):.2f}ms")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,60 @@
+"""
+条件 GET 基准测试：客户端反复轮询歌曲详情 /api/song/<id>，比较不带验证（每次查询数据库并序列化）
+和带 If-None-Match（版本未变时直接返回 304，不查询数据库）的单次请求延迟和执行的 SQL 条数。
+使用 Flask 测试客户端在进程内发请求（不含网络开销）。
+
+用法: python -m benchmarks.bench_conditional_get [请求数]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import app
+from database.models import db, Song
+
+
+def _poll(client, paths, etags):
+    latencies = []
+    for path in paths:
+        headers = {'If-None-Match': etags[path]} if etags is not None else {}
+        start = time.perf_counter()
+        client.get(path, headers=headers).get_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def run(num_requests=5000):
+    with app.app_context():
+        song_ids = [song_id for song_id, in db.session.query(Song.id).limit(100)]
+        engine = db.engine
+    if not song_ids:
+        print("❌ 数据库中没有歌曲")
+        return
+    client = app.test_client()
+    paths = [f'/api/song/{song_ids[i % len(song_ids)]}' for i in range(num_requests)]
+    etags = {path: client.get(path).headers.get('ETag') for path in set(paths)}
+    print(f"📊 条件 GET 基准: {len(etags)}首歌曲的详情, 共{num_requests}次请求")
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        for label, validators in (('不带验证', None), ('If-None-Match', etags)):
+            statements[0] = 0
+            latencies = _poll(client, paths, validators)
+            print(f"  {label:<14}: {num_requests / (latencies.sum() / 1000):8.0f} 次/秒, "
+                  f"p50 {np.percentile(latencies, 50):5.2f}ms, p99 {np.percentile(latencies, 99):5.2f}ms, "
+                  f"SQL {statements[0] / num_requests:.1f} 条/次")
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:2]]
+    run(*args)
@@ -0,0 +1,62 @@
+"""
+内容推荐基准测试（合成数据，不需要数据库）
+
+用法: python -m benchmarks.bench_content [songs] [requests]
+"""
+import os
+import sys
+import time
+import numpy as np
+from collections import namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommender.content_based import ContentBasedRecommender
+
+SongRow = namedtuple('SongRow', 'id genre artist release_year duration audio_features')
+
+GENRES = ['流行', '摇滚', '嘻哈', '爵士', '古典', '电子', 'R&B', '民谣', '乡村', '蓝调']
+
+
+def synthetic_songs(num_songs, seed=42):
+    """生成带音频特征的合成歌曲行"""
+    rng = np.random.default_rng(seed)
+    genres = rng.integers(0, len(GENRES), num_songs)
+    artists = rng.integers(0, max(num_songs // 20, 1), num_songs)
+    years = rng.integers(1960, 2025, num_songs)
+    durations = rng.integers(120, 480, num_songs)
+    audio = rng.random((num_songs, 4))
+    return [
+        SongRow(i + 1, GENRES[genres[i]], f'artist_{artists[i]}', int(years[i]), int(durations[i]),
+                {'tempo': float(audio[i, 0] * 100 + 60), 'energy': float(audio[i, 1]),
+                 'danceability': float(audio[i, 2]), 'valence': float(audio[i, 3])})
+        for i in range(num_songs)
+    ]
+
+
+def run(num_songs=100000, requests=500):
+    print(f"📊 内容推荐基准: {num_songs}首歌曲")
+    rows = synthetic_songs(num_songs)
+
+    model = ContentBasedRecommender(top_n=10)
+    start = time.perf_counter()
+    model.fit_rows(rows)
+    print(f"  训练(特征矩阵 {model.features.shape}, float32): {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(0)
+    latencies = []
+    for _ in range(requests):
+        history = rng.integers(1, num_songs + 1, size=30)
+        weighted = {int(song_id): float(w) for song_id, w in zip(history, rng.random(30) + 0.5)}
+        start = time.perf_counter()
+        model.recommend_ids(0, 10, weighted_songs=weighted)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = np.array(latencies)
+    print(f"  单次推荐延迟({requests}次): p50={np.percentile(latencies, 50):.2f}ms "
+          f"p95={np.percentile(latencies, 95):.2f}ms p99={np.percentile(latencies, 99):.2f}ms")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,69 @@
+"""
+模糊搜索基准测试（合成数据，不需要数据库）：建索引耗时与内存、拼错1-2处的歌名/歌手名的查询延迟和召回率
+
+用法: python -m benchmarks.bench_fuzzy [songs] [queries]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search.fuzzy import FuzzyIndex
+from search.suggest import normalize
+from benchmarks.bench_suggest import synthetic_rows, CHARS
+
+
+def _typo(text, rng, edits):
+    """在文本中随机做 edits 处替换、删除、插入或相邻交换"""
+    chars = list(text)
+    for _ in range(edits):
+        position = int(rng.integers(0, len(chars)))
+        action = int(rng.integers(0, 4))
+        replacement = chr(ord('a') + int(rng.integers(0, 26))) if chars[position].isascii() else \
+            CHARS[int(rng.integers(0, len(CHARS)))]
+        if action == 0:
+            chars[position] = replacement
+        elif action == 1 and len(chars) > 2:
+            chars.pop(position)
+        elif action == 2:
+            chars.insert(position, replacement)
+        elif position + 1 < len(chars):
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return ''.join(chars)
+
+
+def run(num_songs=1000000, num_queries=1000):
+    print(f"📊 模糊搜索基准: {num_songs}首歌曲, {num_queries}个拼错的查询")
+    rng = np.random.default_rng(0)
+    rows = synthetic_rows(0, num_songs, rng)
+
+    start = time.perf_counter()
+    index = FuzzyIndex().build(rows)
+    arrays = (index._keys, index._offsets, index._postings, index._gram_counts, index._popularity,
+              index._kinds, index._song_offsets, index._song_ids)
+    array_mb = sum(array.nbytes for array in arrays) / 1024 / 1024
+    print(f"  建索引: {time.perf_counter() - start:.2f}s, {len(index._texts)}个名称, "
+          f"{len(index._keys)}个三元组, 数组 {array_mb:.1f}MB")
+
+    # 只拼错足够长的名称（短名称的编辑距离上限为1）
+    picks = [rows[i] for i in rng.integers(0, num_songs, num_queries * 2)]
+    texts = [row.title if i % 2 else row.artist for i, row in enumerate(picks)]
+    texts = [text for text in texts if len(normalize(text)) >= 6][:num_queries]
+    for edits in (1, 2):
+        latencies, found = [], 0
+        for text in texts:
+            query = _typo(text, rng, edits)
+            start = time.perf_counter()
+            matches = index.lookup(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += any(normalize(match['text']) == normalize(text) for match in matches)
+        print(f"  拼错{edits}处: p50 {np.percentile(latencies, 50):.2f}ms, "
+              f"p95 {np.percentile(latencies, 95):.2f}ms, p99 {np.percentile(latencies, 99):.2f}ms, "
+              f"召回率 {found / len(texts):.1%}")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,85 @@
+"""
+整页缓存基准测试：未登录用户反复请求首页、探索、排行榜页面，比较关闭缓存（每次渲染）、
+缓存命中（返回缓存的页面）和浏览器带 If-None-Match 验证（304，无响应体）时每秒处理的请求数。
+使用 Flask 测试客户端在进程内发请求（不含网络开销），多个线程同时请求。
+
+用法: python -m benchmarks.bench_page_cache [线程数] [每种情况秒数]
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from web.page_cache import page_cache
+
+PATHS = ('/', '/explore', '/charts', '/charts?mode=trending')
+
+
+def _load(num_threads, seconds, revalidate):
+    stop = threading.Event()
+    latencies = [[] for _ in range(num_threads)]
+    statuses = {}
+
+    def client_loop(slot):
+        client = app.test_client()
+        etags = {}
+        i = slot
+        while not stop.is_set():
+            path = PATHS[i % len(PATHS)]
+            i += 1
+            headers = {'If-None-Match': etags[path]} if revalidate and path in etags else {}
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            response.get_data()
+            latencies[slot].append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.headers.get('ETag'):
+                etags[path] = response.headers['ETag']
+
+    threads = [threading.Thread(target=client_loop, args=(slot,)) for slot in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    merged = np.array([value for slot in latencies for value in slot])
+    return len(merged) / seconds, np.percentile(merged, 50), np.percentile(merged, 99), statuses
+
+
+def run(num_threads=4, seconds=5):
+    print(f"📊 整页缓存基准: {num_threads}个线程, 页面 {', '.join(PATHS)}, 每种情况{seconds}秒")
+    # 预热：建立榜单快照、热度榜和模板缓存
+    client = app.test_client()
+    for path in PATHS:
+        client.get(path)
+
+    import builtins
+    original_print = builtins.print
+    builtins.print = lambda *args, **kwargs: None  # 视图中的调试输出不计入
+    try:
+        results = []
+        for label, enabled, revalidate in (('关闭缓存', False, False),
+                                           ('缓存命中', True, False),
+                                           ('304 验证', True, True)):
+            page_cache.enabled = enabled
+            page_cache.clear()
+            results.append((label,) + _load(num_threads, seconds, revalidate))
+    finally:
+        builtins.print = original_print
+        page_cache.enabled = True
+
+    base = results[0][1]
+    for label, rps, p50, p99, statuses in results:
+        print(f"  {label}: {rps:8.0f} 次/秒 ({rps / base:5.1f}x), p50 {p50:6.2f}ms, p99 {p99:7.2f}ms, "
+              f"状态码 {dict(sorted(statuses.items()))}")
+    print(f"  缓存统计: {page_cache.stats()}")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,77 @@
+"""
+歌曲列表分页基准测试：旧做法 query.paginate()（COUNT(*) + OFFSET 读整行）vs 游标分页（在 (排序键, id) 索引上定位），
+不同页码下取一页的延迟。播放次数取值很少（大量同分歌曲），游标落在同分区间中间也要能直接定位。
+
+用法: python -m benchmarks.bench_pagination [歌曲数] [每页数]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from database.models import db, Song
+from database.song_pages import get_song_page, encode_cursor, _sort_column
+from benchmarks.bench_search import _rows
+
+PAGES = (1, 10, 100, 1000, 5000, 20000)
+
+
+def _old_page(sort_by, page, per_page):
+    """旧做法：routes/api.get_songs 中的 query.paginate()"""
+    pagination = Song.query.order_by(_sort_column(sort_by).desc()).paginate(page=page, per_page=per_page,
+                                                                           error_out=False)
+    return pagination.items, pagination.total
+
+
+def _cursor_before(sort_by, page, per_page):
+    """第 page 页的游标（上一页最后一首），相当于客户端逐页翻到这里"""
+    column = _sort_column(sort_by)
+    last = Song.query.order_by(column.desc(), Song.id.desc()).offset((page - 1) * per_page - 1).first()
+    return encode_cursor(sort_by, getattr(last, column.key), last.id)
+
+
+def _ms(func, repeat=5):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.median(latencies)
+
+
+def run(num_songs=500000, per_page=20):
+    print(f"📊 分页基准: {num_songs}首歌曲, 每页{per_page}首（中位数）")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            for chunk in range(0, num_songs, 50000):
+                rows = _rows(chunk, min(chunk + 50000, num_songs), rng)
+                for row in rows:
+                    row['play_count'] %= 50  # 大量同分歌曲
+                db.session.execute(Song.__table__.insert(), rows)
+            db.session.commit()
+
+            for sort_by in ('play_count', 'new'):
+                print(f"  排序 {sort_by}:")
+                for page in PAGES:
+                    if (page - 1) * per_page >= num_songs:
+                        break
+                    old_ms = _ms(lambda: _old_page(sort_by, page, per_page))
+                    offset_ms = _ms(lambda: get_song_page(sort_by, limit=per_page, page=page))
+                    cursor = _cursor_before(sort_by, page, per_page) if page > 1 else None
+                    cursor_ms = _ms(lambda: get_song_page(sort_by, limit=per_page, cursor=cursor))
+                    print(f"    第{page:>6}页: paginate() {old_ms:8.2f}ms, page 参数 {offset_ms:7.2f}ms, "
+                          f"游标 {cursor_ms:5.2f}ms")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
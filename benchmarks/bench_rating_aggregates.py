@@ -0,0 +1,81 @@
+"""
+歌曲评分统计重建基准测试：逐首歌曲查询（旧做法） vs 一次 GROUP BY 联表更新，以及单次评分的增量更新
+
+用法: python -m benchmarks.bench_rating_aggregates [ratings] [songs]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func
+from database.models import db, Song, Rating
+from database.db_operations import update_all_song_ratings, add_rating
+
+
+def _populate(num_ratings, num_songs, num_users):
+    rng = np.random.default_rng(0)
+    songs = Song.__table__
+    db.session.execute(songs.insert(), [
+        {'id': i, 'title': f'歌曲{i}', 'artist': f'歌手{i % 1000}', 'play_count': 0}
+        for i in range(1, num_songs + 1)
+    ])
+    # 每个 (用户, 歌曲) 只评一次：在 用户×歌曲 空间中不重复抽样
+    pairs = rng.choice(num_users * num_songs, size=num_ratings, replace=False)
+    values = rng.integers(1, 6, size=num_ratings).astype(float)
+    rows = [{'user_id': int(p // num_songs) + 1, 'song_id': int(p % num_songs) + 1, 'rating': float(v)}
+            for p, v in zip(pairs, values)]
+    for start in range(0, len(rows), 50000):
+        db.session.execute(Rating.__table__.insert(), rows[start:start + 50000])
+    db.session.commit()
+
+
+def _per_song_rebuild(limit):
+    """旧做法：每首歌曲一次聚合查询"""
+    for song in Song.query.limit(limit).all():
+        count, total = db.session.query(func.count(Rating.id), func.sum(Rating.rating)).filter(
+            Rating.song_id == song.id).one()
+        song.rating_count = count
+        song.rating_sum = total or 0.0
+        song.avg_rating = (total / count) if count else 0.0
+    db.session.commit()
+
+
+def run(num_ratings=1000000, num_songs=50000):
+    num_users = max(1000, num_ratings // 50)
+    print(f"📊 评分统计基准: {num_ratings}条评分, {num_songs}首歌曲, {num_users}个用户")
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.execute(db.text('CREATE INDEX ix_ratings_song_id ON ratings (song_id)'))
+            start = time.perf_counter()
+            _populate(num_ratings, num_songs, num_users)
+            print(f"  生成数据: {time.perf_counter() - start:.2f}s")
+
+            sample = min(1000, num_songs)
+            start = time.perf_counter()
+            _per_song_rebuild(sample)
+            elapsed = time.perf_counter() - start
+            print(f"  逐首重建 {sample}首: {elapsed:.2f}s (全部歌曲约 {elapsed * num_songs / sample:.1f}s)")
+
+            start = time.perf_counter()
+            update_all_song_ratings()
+            print(f"  GROUP BY 联表重建全部歌曲: {time.perf_counter() - start:.2f}s")
+
+            rng = np.random.default_rng(1)
+            start = time.perf_counter()
+            for _ in range(200):
+                add_rating(int(rng.integers(1, num_users + 1)), int(rng.integers(1, num_songs + 1)), 4.0)
+            print(f"  增量更新: {(time.perf_counter() - start) / 200 * 1000:.2f}ms/次评分")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,98 @@
+"""
+歌曲搜索基准测试：ILIKE '%q%' 全表扫描（旧做法，另查 limit=1000 估算总数） vs FTS5 索引 vs 进程内 n-gram 倒排索引，
+曲库逐步扩大时单次搜索（一页结果 + 总数）的延迟；分别测试3个字符的查询和2个字的中文查询（如 "周杰"）
+
+用法: python -m benchmarks.bench_search [最大歌曲数] [查询数]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import or_
+from database.models import db, Song
+from search import FTS5SongIndex, MemorySongIndex
+from search.tokenize import parse_terms
+
+GENRES = ['流行', '摇滚', '嘻哈', '爵士', '古典', '电子', 'R&B', '民谣', '乡村', '蓝调']
+CHARS = [chr(0x4e00 + i) for i in range(0, 20000, 7)]  # 约2800个常见范围内的汉字
+
+
+def _rows(start, end, rng):
+    """生成 [start, end) 号歌曲：标题2-6个随机汉字，歌手3个汉字（每位歌手约20首）"""
+    rows = []
+    for i in range(start, end):
+        artist_rng = np.random.default_rng(i // 20)
+        artist = ''.join(CHARS[j] for j in artist_rng.integers(0, len(CHARS), 3))
+        title = ''.join(CHARS[j] for j in rng.integers(0, len(CHARS), int(rng.integers(2, 7))))
+        rows.append({'id': i + 1, 'title': title, 'artist': artist, 'album': f'{artist}的专辑{i % 7}',
+                     'genre': GENRES[i % len(GENRES)], 'play_count': int(rng.zipf(1.5) % 100000)})
+    return rows
+
+
+def _like_search(query, limit=20):
+    """旧做法：四个字段 ILIKE，一页结果 + limit=1000 估算总数"""
+    pattern = f'%{query}%'
+    condition = or_(Song.title.ilike(pattern), Song.artist.ilike(pattern),
+                    Song.album.ilike(pattern), Song.genre.ilike(pattern))
+    page = Song.query.filter(condition).limit(limit).all()
+    total = len(Song.query.filter(condition).limit(1000).all())
+    return page, total
+
+
+def _p50(func, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50)
+
+
+def run(max_songs=400000, num_queries=100):
+    sizes = [size for size in (10000, 50000, 100000, 200000, 400000, 1000000) if size <= max_songs]
+    print(f"📊 搜索基准: 曲库 {sizes}, 每档 {num_queries} 个查询（p50，含一页结果与总数）")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            fts = FTS5SongIndex()
+            fts.ensure_index()  # 先建触发器，之后插入的歌曲自动进入索引
+            loaded = 0
+            for size in sizes:
+                start = time.perf_counter()
+                for chunk in range(loaded, size, 50000):
+                    db.session.execute(Song.__table__.insert(), _rows(chunk, min(chunk + 50000, size), rng))
+                db.session.commit()
+                loaded = size
+                insert_seconds = time.perf_counter() - start
+
+                memory = MemorySongIndex()
+                start = time.perf_counter()
+                memory.load()
+                load_seconds = time.perf_counter() - start
+
+                # 查询取自曲库中的歌手名和标题片段
+                sample = Song.query.filter(Song.id.in_(rng.integers(1, size + 1, num_queries).tolist())).all()
+                postings_mb = sum(len(p) for p in memory._postings.values()) * 4 / 1024 / 1024
+                print(f"  {size:>8}首 (写入含触发器 {insert_seconds:.1f}s, n-gram 索引加载 {load_seconds:.1f}s, "
+                      f"倒排数组 {postings_mb:.1f}MB)")
+                for length in (3, 2):
+                    queries = [song.artist[:length] if i % 2 else song.title[:length] for i, song in enumerate(sample)]
+                    like_ms = _p50(_like_search, queries)
+                    fts_ms = _p50(lambda q: (fts.search(parse_terms(q)), fts.count(parse_terms(q))), queries)
+                    memory_ms = _p50(lambda q: (memory.search(parse_terms(q)), memory.count(parse_terms(q))), queries)
+                    print(f"    {length}字查询: ILIKE {like_ms:.2f}ms, FTS5 {fts_ms:.2f}ms"
+                          f"{'（短词退化为 LIKE 扫描）' if length < 3 else ''}, n-gram 索引 {memory_ms:.2f}ms")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
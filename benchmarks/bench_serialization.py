@@ -0,0 +1,98 @@
+"""
+歌曲序列化基准测试：旧做法（取整行 ORM Song 对象，包括 audio_features，逐个手写字典，jsonify 编码）
+vs 字段投影（只查询需要的列，返回轻量的行，song_to_dict + json_response 编码），
+以及稀疏字段集 fields=id,title,artist。分别测一页歌曲列表和按ID取搜索结果，比较耗时和响应体大小。
+
+用法: python -m benchmarks.bench_serialization [歌曲数] [每页数]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from database.models import db, Song
+from database.song_fields import DEFAULT_SONG_FIELDS, song_to_dict, get_song_rows
+from database.song_pages import get_song_page
+from web.json_response import json_response, ORJSON_AVAILABLE
+from benchmarks.bench_search import _rows
+
+SPARSE_FIELDS = ('id', 'title', 'artist')
+
+
+def _old_dict(song):
+    """旧做法：routes/api.py 中手写的字典"""
+    return {
+        'id': song.id,
+        'title': song.title,
+        'artist': song.artist,
+        'album': song.album,
+        'genre': song.genre,
+        'duration': song.duration,
+        'release_year': song.release_year,
+        'play_count': song.play_count,
+        'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0
+    }
+
+
+def _measure(func, repeat=50):
+    """中位数耗时（毫秒）和响应体字节数；每次结束后清空会话，与每个请求一个会话相同"""
+    latencies = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = func()
+        size = len(response.get_data())
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.session.remove()
+    return np.median(latencies), size
+
+
+def run(num_songs=200000, per_page=100):
+    print(f"📊 序列化基准: {num_songs}首歌曲（每首带音频特征）, 每次{per_page}首, "
+          f"JSON 编码: {'orjson' if ORJSON_AVAILABLE else 'Flask jsonify（未安装 orjson）'}")
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            for chunk in range(0, num_songs, 50000):
+                rows = _rows(chunk, min(chunk + 50000, num_songs), rng)
+                features = rng.random((len(rows), 12)).round(4)
+                for row, vector in zip(rows, features):
+                    row['audio_features'] = dict(zip([f'f{j}' for j in range(12)], vector.tolist()))
+                db.session.execute(Song.__table__.insert(), rows)
+            db.session.commit()
+
+            page = 50
+            song_ids = [int(i) for i in rng.choice(np.arange(1, num_songs + 1), per_page, replace=False)]
+            cases = {
+                '歌曲列表': (
+                    lambda: jsonify({'data': [_old_dict(song) for song in get_song_page(
+                        limit=per_page, page=page)['songs']]}),
+                    lambda fields: json_response({'data': [song_to_dict(song, fields) for song in get_song_page(
+                        limit=per_page, page=page, fields=fields)['songs']]}),
+                ),
+                '按ID取歌曲': (
+                    lambda: jsonify({'data': [_old_dict(song) for song in
+                                              Song.query.filter(Song.id.in_(song_ids)).all()]}),
+                    lambda fields: json_response({'data': [song_to_dict(song, fields) for song in
+                                                           get_song_rows(song_ids, fields)]}),
+                ),
+            }
+            for label, (old, new) in cases.items():
+                old_ms, old_size = _measure(old)
+                new_ms, new_size = _measure(lambda: new(DEFAULT_SONG_FIELDS))
+                sparse_ms, sparse_size = _measure(lambda: new(SPARSE_FIELDS))
+                print(f"  {label}: ORM整行 {old_ms:6.2f}ms {old_size:6d}B, 字段投影 {new_ms:6.2f}ms {new_size:6d}B, "
+                      f"fields={','.join(SPARSE_FIELDS)} {sparse_ms:6.2f}ms {sparse_size:6d}B")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
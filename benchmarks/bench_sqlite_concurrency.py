@@ -0,0 +1,121 @@
+"""
+SQLite 并发读写基准测试：默认存储模式（回滚日志、共用连接池）vs 并发模式（WAL + 读连接池 + 单一写连接），
+多个读线程模拟请求（歌曲详情、歌曲列表、用户评分）的同时，一个写线程不断批量写入播放（record_plays），
+比较读吞吐量、读延迟和写入的播放数。
+
+用法: python -m benchmarks.bench_sqlite_concurrency [读线程数] [秒数] [歌曲数]
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import numpy as np
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from database.models import db, Song, User, Rating
+from database.storage import init_storage
+from database.db_operations import get_song_by_id, get_user_ratings, record_plays
+from database.song_pages import get_song_page, SONG_SORTS
+from benchmarks.bench_search import _rows
+
+NUM_USERS = 2000
+PLAY_BATCH = 20
+
+
+def _create_app(path, mode):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLITE_STORAGE_MODE'] = mode
+    init_storage(app)
+    return app
+
+
+def _populate(app, num_songs, rng):
+    with app.app_context():
+        db.create_all()
+        for chunk in range(0, num_songs, 50000):
+            db.session.execute(Song.__table__.insert(), _rows(chunk, min(chunk + 50000, num_songs), rng))
+        db.session.execute(User.__table__.insert(), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+            for i in range(1, NUM_USERS + 1)
+        ])
+        db.session.execute(Rating.__table__.insert(), [
+            {'user_id': int(user_id), 'song_id': int(song_id), 'rating': 4.0}
+            for user_id, song_id in {(int(u), int(s)) for u, s in zip(rng.integers(1, NUM_USERS + 1, 40000),
+                                                                      rng.integers(1, num_songs + 1, 40000))}
+        ])
+        db.session.commit()
+
+
+def _run_mode(path, mode, num_readers, seconds, num_songs):
+    app = _create_app(path, mode)
+    stop = threading.Event()
+    latencies = [[] for _ in range(num_readers)]
+    errors = []
+    plays = [0]
+
+    def reader(slot):
+        rng = np.random.default_rng(slot)
+        while not stop.is_set():
+            kind = int(rng.integers(0, 3))
+            start = time.perf_counter()
+            try:
+                with app.app_context():  # 每次操作相当于一个请求，结束时释放会话
+                    if kind == 0:
+                        get_song_by_id(int(rng.integers(1, num_songs + 1)))
+                    elif kind == 1:
+                        get_song_page(SONG_SORTS[int(rng.integers(0, 3))], limit=20,
+                                      page=int(rng.integers(1, 50)))
+                    else:
+                        get_user_ratings(int(rng.integers(1, NUM_USERS + 1)))
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies[slot].append((time.perf_counter() - start) * 1000)
+
+    def writer():
+        rng = np.random.default_rng(1000)
+        while not stop.is_set():
+            events = [(int(rng.integers(1, NUM_USERS + 1)), int(rng.integers(1, num_songs + 1)), 180,
+                       datetime.utcnow(), None) for _ in range(PLAY_BATCH)]
+            with app.app_context():
+                if record_plays(events):
+                    plays[0] += len(events)
+
+    threads = [threading.Thread(target=reader, args=(slot,)) for slot in range(num_readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+    merged = np.array([value for slot in latencies for value in slot]) if any(latencies) else np.zeros(1)
+    print(f"  {mode:<10}: 读 {len(merged) / seconds:8.0f} 次/秒, p50 {np.percentile(merged, 50):6.2f}ms, "
+          f"p99 {np.percentile(merged, 99):7.2f}ms, 读错误 {len(errors)}, 写入播放 {plays[0] / seconds:6.0f} 条/秒")
+
+
+def run(num_readers=8, seconds=10, num_songs=100000):
+    print(f"📊 SQLite 并发基准: {num_songs}首歌曲, {num_readers}个读线程 + 1个写线程（每批{PLAY_BATCH}条播放）, "
+          f"每种模式{seconds}秒")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        _populate(_create_app(path, 'default'), num_songs, np.random.default_rng(0))
+        # 先测默认模式（回滚日志）；并发模式会把数据库切换为 WAL（持久设置）
+        for mode in ('default', 'concurrent'):
+            _run_mode(path, mode, num_readers, seconds, num_songs)
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:4]]
+    run(*args)
@@ -0,0 +1,75 @@
+"""
+输入提示基准测试（合成数据，不需要数据库）：建索引耗时、不同长度前缀的补全延迟、新歌增量插入耗时
+
+用法: python -m benchmarks.bench_suggest [songs] [queries]
+"""
+import os
+import sys
+import time
+import numpy as np
+from collections import namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search.suggest import SuggestIndex
+
+SongRow = namedtuple('SongRow', 'id title artist album genre play_count')
+
+GENRES = ['流行', '摇滚', '嘻哈', '爵士', '古典', '电子', 'R&B', '民谣', '乡村', '蓝调']
+SYLLABLES = ['la', 'mo', 'ri', 'ka', 'to', 'ne', 'shi', 'an', 'yu', 'be', 'lo', 'ver', 'sun', 'ry']
+CHARS = [chr(0x4e00 + i) for i in range(0, 20000, 7)]
+
+
+def synthetic_rows(start, end, rng):
+    """一半英文标题（2-4个单词），一半中文标题；歌手约20首歌一位，播放次数长尾分布"""
+    rows = []
+    for i in range(start, end):
+        if i % 2:
+            words = [''.join(rng.choice(SYLLABLES, int(rng.integers(1, 4)))) for _ in range(int(rng.integers(2, 5)))]
+            title = ' '.join(words).title()
+        else:
+            title = ''.join(CHARS[j] for j in rng.integers(0, len(CHARS), int(rng.integers(2, 7))))
+        artist = f'Artist {i // 20}' if i % 3 else f'歌手{i // 20}'
+        rows.append(SongRow(i + 1, title, artist, f'{title} (Deluxe)' if i % 5 == 0 else None,
+                            GENRES[i % len(GENRES)], int(rng.zipf(1.5) % 100000)))
+    return rows
+
+
+def _latencies(index, prefixes):
+    latencies = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def run(num_songs=200000, num_queries=2000):
+    print(f"📊 输入提示基准: {num_songs}首歌曲, {num_queries}个前缀")
+    rng = np.random.default_rng(0)
+    rows = synthetic_rows(0, num_songs, rng)
+
+    start = time.perf_counter()
+    index = SuggestIndex(reload_seconds=float('inf')).build(rows)
+    print(f"  建索引: {time.perf_counter() - start:.2f}s, {len(index._keys)}个查找键")
+
+    # 从真实文本中截取长度1-4的前缀（用户逐字输入）
+    texts = [rows[i].title if i % 2 else rows[i].artist for i in rng.integers(0, num_songs, num_queries)]
+    for length in (1, 2, 3, 4):
+        prefixes = [text[:length] for text in texts]
+        cold = _latencies(index, prefixes)
+        warm = _latencies(index, prefixes)
+        print(f"  前缀长度{length}: 首次 p50={cold[0]:.3f}ms p99={cold[1]:.3f}ms, "
+              f"再次 p50={warm[0]:.3f}ms p99={warm[1]:.3f}ms")
+
+    new_rows = synthetic_rows(num_songs, num_songs + 100, rng)
+    start = time.perf_counter()
+    for row in new_rows:
+        index.add_songs([row])
+    print(f"  增量插入: {(time.perf_counter() - start) / len(new_rows) * 1000:.2f}ms/首")
+    assert any(item['song_id'] == new_rows[-1].id for item in index.suggest(new_rows[-1].title, limit=20))
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,51 @@
+"""
+时间衰减热度榜基准测试：增量累加播放事件的吞吐量与取榜单的延迟
+
+用法: python -m benchmarks.bench_trending [events] [songs]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommender.trending import TrendingEngine, SECONDS_PER_DAY
+
+
+def run(num_events=1000000, num_songs=100000, k=50):
+    print(f"📊 热度榜基准: {num_events}次播放, {num_songs}首歌曲, top{k}")
+    rng = np.random.default_rng(0)
+    # 歌曲热度服从长尾分布，播放时间均匀分布在最近30天
+    song_ids = (rng.zipf(1.3, size=num_events) % num_songs).astype(np.int64)
+    now = time.time()
+    played_at = np.sort(now - rng.uniform(0, 30 * SECONDS_PER_DAY, size=num_events))
+
+    engine = TrendingEngine(half_life_days=7)
+    engine._anchor = played_at[0]
+    start = time.perf_counter()
+    for song_id, t in zip(song_ids.tolist(), played_at.tolist()):
+        engine.record(song_id, played_at=t)
+    elapsed = time.perf_counter() - start
+    print(f"  增量累加: {elapsed:.2f}s ({elapsed / num_events * 1e6:.2f}µs/次)")
+
+    latencies = []
+    for _ in range(100):
+        start = time.perf_counter()
+        top = engine.top_ids(k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"  取榜单: p50={np.percentile(latencies, 50):.2f}ms p95={np.percentile(latencies, 95):.2f}ms")
+
+    # 与全量重算（对全部事件逐个计算衰减）对比，验证增量结果
+    start = time.perf_counter()
+    weights = np.exp(-engine.decay_rate * (now - played_at))
+    exact = np.bincount(song_ids, weights=weights, minlength=num_songs)
+    elapsed = (time.perf_counter() - start) * 1000
+    exact_top = set(np.argsort(-exact)[:k].tolist())
+    overlap = len(exact_top & {song_id for song_id, _ in top}) / k
+    print(f"  全量重算: {elapsed:.2f}ms, 与增量榜单重合率 {overlap:.3f}")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
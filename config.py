@@ -13,6 +13,19 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///music_recommendation.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite 存储模式（见 database.storage）：default / concurrent（WAL + 读连接池 + 单一写连接，生产环境使用）
+    SQLITE_STORAGE_MODE = os.environ.get('SQLITE_STORAGE_MODE', 'default')
+    SQLITE_READER_POOL_SIZE = 8  # 读连接池的连接数（满了之后最多再临时打开同样多个）
+    SQLITE_WRITER_TIMEOUT = 30  # 等待写连接的最长秒数
+    SQLITE_PRAGMAS = {  # concurrent 模式下每个连接打开时设置（journal_mode/synchronous 只在写连接上设置）
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # WAL 下只在检查点时同步，进程崩溃不丢数据，断电可能丢最近的提交
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # 负数单位为 KB，即每个连接 64MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,  # 毫秒，其他进程写入时等待而不是立即报 database is locked
+    }
+    
     # 会话配置
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
@@ -25,6 +38,112 @@ class Config:
     TOP_N = 10  # 推荐列表长度
     SIMILARITY_THRESHOLD = 0.7
     POPULARITY_DAYS = 30
+    ITEM_NEIGHBORS = 50  # 物品协同过滤每首歌保留的邻居数
+    MODEL_REFRESH_SECONDS = 600  # 推荐模型重新训练间隔
+    MODEL_MIN_REFIT_SECONDS = 60  # 有新评分时两次训练的最小间隔
+    
+    # 隐式反馈ALS矩阵分解
+    ALS_FACTORS = 32
+    ALS_ITERATIONS = 10
+    ALS_REGULARIZATION = 0.1
+    ALS_ALPHA = 10.0
+    ALS_WORKERS = 2  # 在线重新训练的求解线程数（后台训练不占满CPU）；离线预计算使用 PRECOMPUTE_WORKERS
+    ALS_BLAS_THREADS = 1  # 训练期间BLAS库的线程数（需要 threadpoolctl），None 表示不限制
+    
+    # 内容推荐
+    CONTENT_ARTIST_BUCKETS = 64  # 艺术家特征哈希的桶数
+    
+    # 近似最近邻索引（IVF）
+    ANN_MIN_ITEMS = 20000  # 歌曲数超过该值才启用近似搜索，否则精确搜索
+    ANN_LISTS_FACTOR = 1.0  # 簇数 = sqrt(歌曲数) * 该系数
+    ANN_N_PROBE = 16  # 每次查询扫描的簇数，越大召回率越高、越慢
+    ANN_TRAIN_SAMPLE = 50000  # k-means 训练采样数
+    ANN_MERGE_THRESHOLD = 1000  # 增量插入积累到该数量后并入主索引
+    
+    # 推荐结果缓存
+    RECOMMENDATION_CACHE_TTL = 300  # 秒，0 表示不缓存
+    RECOMMENDATION_CACHE_SIZE = 10000  # 最多缓存的 (用户, 类型, 数量) 条目数
+    
+    # 离线批量预计算推荐（python database/data_loader.py precompute_recs）
+    PRECOMPUTE_TOP_N = 50  # 每个用户每种算法保存的推荐数
+    PRECOMPUTE_BLOCK_SIZE = 256  # 每次矩阵乘法处理的用户数
+    PRECOMPUTE_WORKERS = None  # 进程数，None 表示使用全部CPU核心
+    
+    # 非个性化榜单快照
+    POPULARITY_SNAPSHOT_SIZE = 50  # 每个榜单的初始容量，请求更长的榜单时自动扩容
+    POPULARITY_SNAPSHOT_MAX_SIZE = 1000  # 榜单容量上限（单次请求的 limit 也不超过该值）
+    POPULARITY_REFRESH_SECONDS = 60  # 快照最长使用时间
+    POPULARITY_REFRESH_PLAYS = 100  # 累计多少次播放/评分后提前刷新
+    
+    # 时间衰减热度榜（窗口为 POPULARITY_DAYS 天）
+    TRENDING_HALF_LIFE_DAYS = 7  # 一次播放的热度贡献每隔多少天减半
+    TRENDING_CACHE_SECONDS = 30  # 榜单结果缓存时间
+    TRENDING_RELOAD_SECONDS = 600  # 从 play_events 表重建热度分的间隔（合并其他进程的播放）
+    
+    # 播放记录写缓冲（write-behind，批量写库）
+    PLAY_BUFFER_FLUSH_SECONDS = 0.25  # 最长刷新间隔
+    PLAY_BUFFER_MAX_EVENTS = 500  # 攒够多少条播放立即刷新
+    # async: 立即返回，崩溃时可能丢失最近一个刷新周期的播放；group: 等待所在批次提交；sync: 每次播放单独提交
+    PLAY_BUFFER_DURABILITY = 'async'
+    PLAY_BUFFER_MAX_PENDING = 100000  # 队列上限（写库持续失败时超出的播放被拒绝）
+    PLAY_BUFFER_MAX_RETRIES = 5  # 失败批次整批重试的次数，之后逐条重试同样次数，仍失败的进入死信
+    PLAY_BUFFER_MAX_BACKOFF = 30  # 秒，失败后重试间隔按指数增长的上限
+    PLAY_BUFFER_DEAD_LETTERS = 1000  # 内存中保留的最近无法写入的播放条数
+    
+    # 批量播放上报（POST /api/plays/batch）
+    PLAY_BATCH_MAX_SIZE = 200  # 单次请求最多的播放条数
+    PLAY_BATCH_MAX_AGE_DAYS = 7  # 客户端离线缓存的播放最多保留多久
+    PLAY_BATCH_CLOCK_SKEW_SECONDS = 300  # 允许客户端时钟超前的秒数
+    PLAY_BATCH_MAX_DURATION = 6 * 3600  # 单次播放时长上限（秒）
+    
+    # 匿名页面整页缓存（首页/探索/排行榜，见 web.page_cache）
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_SIZE = 256  # 最多缓存的页面数（路径+查询参数）
+    PAGE_CACHE_CONTROL = 'public, no-cache'  # 浏览器每次用 If-None-Match 验证，未变化时返回 304
+    
+    # JSON 接口的条件 GET（歌曲详情/流派/艺术家/排行榜，见 web.conditional）
+    API_CACHE_MAX_AGE = 5  # 秒内浏览器直接使用缓存
+    API_STALE_WHILE_REVALIDATE = 60  # 过期后这段时间内先用旧响应、后台验证
+    DATA_VERSION_MAX_ENTRIES = 100000  # 最多记录多少个资源（每首修改过的歌曲一个）的版本
+    DATA_VERSION_EPOCH_SECONDS = 300  # 版本计数只在本进程内有效，多进程部署时其他进程的写入最多这么久后可见
+    
+    # 系统统计信息缓存（页面/接口读取内存中的统计，过期后后台重新统计）
+    SYSTEM_STATS_TTL = 30
+    
+    # 歌曲列表分页（GET /api/songs，游标分页见 database.song_pages）
+    SONGS_PAGE_MAX = 100  # per_page 上限
+    SONG_COUNT_TTL = 60  # 歌曲总数缓存时间（秒），新增歌曲时立即失效
+    
+    # 歌曲全文搜索（SQLite 使用 FTS5 索引，其他数据库使用进程内倒排索引）
+    SEARCH_BACKEND = 'auto'  # auto / fts5 / memory
+    SEARCH_FIELD_WEIGHTS = {'title': 4.0, 'artist': 3.0, 'album': 1.5, 'genre': 1.0}  # BM25 字段权重
+    SEARCH_POPULARITY_WEIGHT = 0.5  # 播放次数对相关度的最大加成（0.5 即最多 ×1.5）
+    SEARCH_POPULARITY_PIVOT = 1000  # 播放次数达到该值时加成为最大加成的一半
+    SEARCH_MAX_TERMS = 8  # 查询最多使用的词数
+    SEARCH_PINYIN = True  # 安装 pypinyin 时，含汉字的字段可以用全拼/首字母搜索
+    SEARCH_INDEX_RELOAD_SECONDS = 600  # 进程内索引从数据库重建的间隔（合并其他进程的修改和播放次数）
+    
+    # 拼写容错的模糊搜索（精确搜索没有结果时使用）
+    FUZZY_MAX_DISTANCE = 3  # 编辑距离上限（实际上限为查询长度的1/3，至少为1）
+    FUZZY_MIN_SIMILARITY = 0.2  # 三元组相似度低于该值的名称不计算编辑距离
+    FUZZY_CANDIDATES = 64  # 计算编辑距离的候选名称数
+    FUZZY_MIN_REBUILD_SECONDS = 60  # 有新歌时两次后台重建的最小间隔
+    
+    # 搜索框输入提示（GET /api/suggest，前缀补全）
+    SUGGEST_LIMIT = 8  # 默认返回的补全条数
+    SUGGEST_MAX_LIMIT = 20  # 单次请求的 limit 上限
+    SUGGEST_CACHE_RANGE = 256  # 前缀命中的键多于该数时预先算好并缓存其结果
+    SUGGEST_RELOAD_SECONDS = 300  # 从数据库重建（更新热度）的间隔
+    
+    # 混合推荐候选来源（并行执行，超时使用后备结果）
+    HYBRID_WORKERS = 8  # 候选生成线程数
+    HYBRID_LATENCY_BUDGET = 0.5  # 秒，整次候选生成的时间上限
+    HYBRID_SOURCE_DEADLINES = {  # 秒，各来源的截止时间
+        'charts': 0.2,
+        'collaborative': 0.3,
+        'als': 0.3,
+        'content': 0.3,
+    }
     
     # 日志配置
     LOG_FILE = os.path.join(BASE_DIR, 'logs/app.log')
@@ -1,6 +1,6 @@
 """
 数据库模块初始化
 """
-from database.models import db, User, Song, Rating, PlayHistory, UserPreference
+from database.models import db, User, Song, Rating, PlayHistory, PlayEvent, UserPreference, UserRecommendation
 
-__all__ = ['db', 'User', 'Song', 'Rating', 'PlayHistory', 'UserPreference']
\ No newline at end of file
+__all__ = ['db', 'User', 'Song', 'Rating', 'PlayHistory', 'PlayEvent', 'UserPreference', 'UserRecommendation']
\ No newline at end of file
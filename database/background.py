@@ -0,0 +1,56 @@
+"""
+后台刷新
+
+内存中的快照、索引和模型过期后由 BackgroundRefresher 在后台线程中重建，重建期间读取方继续使用旧数据：
+- 同一个刷新器同一时间最多一个后台线程，用非阻塞的 acquire 判断，已有刷新在进行时直接返回
+- 刷新函数在触发时所在应用的应用上下文中执行（需要访问数据库），没有应用上下文时不刷新
+- 刷新函数抛出的异常打印后忽略，下一次触发时重试
+"""
+import threading
+
+
+class BackgroundRefresher:
+    """单线程的后台刷新触发器"""
+
+    def __init__(self, name, label):
+        self.name = name            # 线程名
+        self.label = label          # 错误日志中的名称
+        self._running = threading.Lock()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._running.locked()
+
+    def trigger(self, refresh, *args):
+        """在后台线程中执行 refresh(*args)，返回是否启动了新的刷新"""
+        from flask import current_app, has_app_context
+        if not has_app_context():
+            return False
+        if not self._running.acquire(blocking=False):
+            return False
+        app = current_app._get_current_object()
+
+        def worker():
+            try:
+                with app.app_context():
+                    refresh(*args)
+            except Exception as e:
+                print(f"❌ {self.label}刷新错误: {e}")
+            finally:
+                self._running.release()
+
+        try:
+            self._thread = threading.Thread(target=worker, name=self.name, daemon=True)
+            self._thread.start()
+        except Exception:
+            self._running.release()
+            raise
+        return True
+
+    def join(self, timeout=None):
+        """等待正在进行的刷新结束（离线任务和测试使用）"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.is_running
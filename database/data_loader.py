@@ -15,7 +15,7 @@ except ImportError:
     print("警告: pandas 未安装，部分功能将不可用")
     
 from database.models import db, Song, User, Rating
-from database.db_operations import add_song, batch_add_songs
+from database.db_operations import add_song, batch_add_songs, update_all_song_ratings
 from utils.data_preprocessing import DataPreprocessor
 from utils.file_handler import FileHandler
 
@@ -276,6 +276,7 @@ class DataLoader:
                     rating_count += 1
         
         db.session.commit()
+        update_all_song_ratings()
         print(f"已创建 {rating_count} 个示例评分")
     
     @staticmethod
@@ -440,6 +441,7 @@ class DataLoader:
                     db.session.add(rating_record)
             
             db.session.commit()
+            update_all_song_ratings()
             print(f"已生成 {num_ratings} 个评分")
         
         print("测试数据生成完成！")
@@ -506,6 +508,18 @@ if __name__ == '__main__':
                 print(f"{key}: {value}")
         elif command == 'clear':
             DataLoader.clear_all_data()
+        elif command == 'recompute_stats':
+            from app import app
+            from database.db_operations import update_all_song_play_counts
+            with app.app_context():
+                update_all_song_ratings()
+                update_all_song_play_counts()
+        elif command == 'precompute_recs':
+            from app import app
+            from recommender.batch_precompute import precompute_recommendations
+            workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            with app.app_context():
+                precompute_recommendations(workers=workers)
         else:
             print("可用命令:")
             print("  load_sample - 加载示例数据")
@@ -513,5 +527,7 @@ if __name__ == '__main__':
             print("  generate_test [users] [songs] [ratings] - 生成测试数据")
             print("  stats - 显示数据统计")
             print("  clear - 清除所有数据（谨慎使用）")
+            print("  recompute_stats - 按评分表和播放历史重建歌曲的评分统计与播放次数")
+            print("  precompute_recs [workers] - 为所有用户离线预计算推荐")
     else:
         print("请指定命令，如: python data_loader.py load_sample")
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+数据版本计数（条件 GET 的 ETag/Last-Modified）
+
+每类资源一个内存计数器，写入成功提交后加一并记录时间，接口据此生成 ETag 和 Last-Modified，
+不需要查询数据库，也不对响应体做哈希：
+  catalog     歌曲集合或全部歌曲的统计变化（新增歌曲、全量重建评分/播放次数）
+  plays       任意歌曲的播放次数变化（艺术家列表按总播放次数排序）
+  song:<id>   单首歌曲的行变化（播放次数、评分统计）
+
+只保留最近修改的 Config.DATA_VERSION_MAX_ENTRIES 个资源（LRU）。被淘汰的资源按“下限版本”（所有被淘汰资源的
+最大版本号）计，再次修改时从下限加一：版本号只增不减，淘汰最多让某些 ETag 多变一次，不会误判为未修改。
+
+计数只在本进程内有效：ETag 带有进程标识（重启或多个工作进程之间不会误判为未修改），
+并且带有 Config.DATA_VERSION_EPOCH_SECONDS 秒的时间段，其他进程的写入最多在一个时间段后可见。
+"""
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from config import Config
+
+
+class DataVersions:
+    """按资源名计数的数据版本（线程安全）"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.DATA_VERSION_MAX_ENTRIES
+        self.nonce = uuid.uuid4().hex[:8]
+        self.started_at = time.time()
+        self._versions = OrderedDict()  # 资源名 -> (版本号, 修改时间)，按最近修改排序
+        self._floor = (0, None)         # 被淘汰资源的 (最大版本号, 最晚修改时间)
+        self._lock = threading.Lock()
+
+    def bump(self, *resources):
+        """资源已修改（在事务提交之后调用）"""
+        now = time.time()
+        with self._lock:
+            for resource in resources:
+                version, _ = self._versions.get(resource, self._floor)
+                self._versions[resource] = (version + 1, now)
+                self._versions.move_to_end(resource)
+            while len(self._versions) > self.max_entries:
+                _, (version, changed_at) = self._versions.popitem(last=False)
+                floor_version, floor_time = self._floor
+                self._floor = (max(floor_version, version), max(floor_time or changed_at, changed_at))
+
+    def bump_songs(self, song_ids, plays=False):
+        """这些歌曲的行已修改；plays=True 表示播放次数变化"""
+        resources = [f'song:{song_id}' for song_id in song_ids]
+        if plays:
+            resources.append('plays')
+        self.bump(*resources)
+
+    def get(self, *resources):
+        """这些资源合并后的 (版本标识, 最后修改时间)，版本标识可直接放进 ETag"""
+        epoch_seconds = Config.DATA_VERSION_EPOCH_SECONDS
+        epoch = int(time.time() // epoch_seconds)
+        modified_at = max(self.started_at, epoch * epoch_seconds)
+        parts = [str(epoch)]
+        with self._lock:
+            for resource in resources:
+                version, changed_at = self._versions.get(resource, self._floor)
+                parts.append(str(version))
+                if changed_at is not None and changed_at > modified_at:
+                    modified_at = changed_at
+        return '.'.join(parts), modified_at
+
+
+# 全进程共享的数据版本
+data_versions = DataVersions()
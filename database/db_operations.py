@@ -1,89 +1,48 @@
 ﻿# database/db_operations.py
-from .models import db, Song, Rating, PlayHistory, User
-from sqlalchemy import func, desc, or_
+from .models import db, Song, Rating, PlayHistory, PlayEvent, User, UserRecommendation
+from .song_fields import get_song_rows, song_columns
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, desc, or_, select, literal, null, union_all, bindparam, case
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# 榜单/推荐列表展示歌曲所需的列
+SONG_DISPLAY_COLUMNS = (
+    Song.id, Song.title, Song.artist, Song.album, Song.genre, Song.duration,
+    Song.release_year, Song.play_count, Song.avg_rating, Song.rating_count, Song.created_at
+)
+
 
 def get_system_stats():
-    """获取系统统计信息"""
+    """从数据库计算系统统计信息（一次聚合查询）
+    
+    评分数/评分总和取自 songs 表上增量维护的 rating_count/rating_sum，不扫描 ratings 表；
+    页面和接口请读取 database.system_stats 中的缓存，不要直接调用。
+    """
     try:
-        print("🔍 get_system_stats被调用")
-        
-        # 1. 获取基本统计
-        total_songs = Song.query.count()
-        total_users = User.query.count()
-        total_ratings = Rating.query.count()
-        
-        print(f"   歌曲总数查询: {total_songs}")
-        print(f"   用户总数查询: {total_users}")
-        print(f"   评分总数查询: {total_ratings}")
-        
-        # 2. 获取总播放量（处理可能为None的情况）
-        total_plays_result = db.session.query(func.sum(Song.play_count)).scalar()
-        total_plays = int(total_plays_result) if total_plays_result else 0
-        
-        print(f"   总播放量查询: {total_plays}")
-        
-        # 3. 获取有评分的歌曲数量
-        rated_songs_result = db.session.query(func.count(func.distinct(Rating.song_id))).scalar()
-        rated_songs = int(rated_songs_result) if rated_songs_result else 0
-        
-        print(f"   有评分的歌曲数: {rated_songs}")
-        
-        # 4. 获取系统平均评分
-        avg_rating_result = db.session.query(func.avg(Rating.rating)).scalar()
-        avg_system_rating = round(float(avg_rating_result), 1) if avg_rating_result else 0.0
-        
-        print(f"   系统平均评分: {avg_system_rating}")
+        row = db.session.execute(select(
+            func.count(Song.id).label('total_songs'),
+            func.coalesce(func.sum(Song.play_count), 0).label('total_plays'),
+            func.coalesce(func.sum(Song.rating_count), 0).label('total_ratings'),
+            func.coalesce(func.sum(Song.rating_sum), 0.0).label('rating_sum'),
+            func.count(case((Song.rating_count > 0, 1))).label('rated_songs'),
+            select(func.count(User.id)).scalar_subquery().label('total_users'),
+        )).one()
         
-        # 5. 获取最高评分的歌曲
-        top_rated_song = None
-        try:
-            # 先获取有评分记录的歌曲
-            songs_with_ratings = db.session.query(Song).join(Rating).group_by(Song.id)
-            top_rated_song = songs_with_ratings.order_by(Song.avg_rating.desc()).first()
-            if top_rated_song:
-                print(f"   最高评分歌曲: {top_rated_song.title} ({top_rated_song.avg_rating})")
-        except Exception as e:
-            print(f"   获取最高评分歌曲错误: {e}")
-            # 如果上面的方法失败，尝试简单方法
-            top_rated_song = Song.query.filter(Song.avg_rating > 0).order_by(Song.avg_rating.desc()).first()
-        
-        # 6. 获取播放最多的歌曲
-        most_played_song = Song.query.order_by(Song.play_count.desc()).first()
-        if most_played_song:
-            print(f"   播放最多歌曲: {most_played_song.title} ({most_played_song.play_count})")
-        
-        stats = {
-            'total_songs': total_songs,
-            'total_users': total_users,
-            'total_ratings': total_ratings,
-            'total_plays': total_plays,
-            'rated_songs': rated_songs,
-            'avg_system_rating': avg_system_rating,
-            'top_rated_song': top_rated_song,
-            'most_played_song': most_played_song
+        return {
+            'total_songs': int(row.total_songs),
+            'total_users': int(row.total_users),
+            'total_ratings': int(row.total_ratings),
+            'total_plays': int(row.total_plays),
+            'rated_songs': int(row.rated_songs),
+            'rating_sum': float(row.rating_sum),
+            'avg_system_rating': round(float(row.rating_sum) / row.total_ratings, 1) if row.total_ratings else 0.0,
         }
         
-        print(f"🔍 返回统计: {stats}")
-        return stats
-        
     except Exception as e:
         print(f"❌ get_system_stats错误: {e}")
-        import traceback
-        traceback.print_exc()
-        
-        # 返回默认值
-        return {
-            'total_songs': 0,
-            'total_users': 0,
-            'total_ratings': 0,
-            'total_plays': 0,
-            'rated_songs': 0,
-            'avg_system_rating': 0.0,
-            'top_rated_song': None,
-            'most_played_song': None
-        }
+        db.session.rollback()
+        return None
 
 
 def get_top_songs(limit=10):
@@ -171,71 +130,381 @@ def get_high_rated_songs(limit=10):
         return []
 
 
-def get_song_by_id(song_id):
-    """根据ID获取歌曲"""
+def get_song_lists_snapshot(limit=10, popular_limit=None):
+    """一次 UNION ALL 查询取热门/高评分/新歌三个榜单，只取展示需要的列
+    
+    返回 {'popular': [...], 'high_rated': [...], 'new': [...]}，
+    每项有 id/title/artist/album/genre/duration/release_year/play_count/avg_rating/rating_count/created_at 属性
+    """
+    try:
+        lists = {
+            'popular': ((Song.play_count.desc(), Song.id.desc()), popular_limit or limit, ()),
+            'high_rated': ((Song.avg_rating.desc(), Song.id.desc()), limit, (Song.avg_rating > 0,)),
+            'new': ((Song.created_at.desc(), Song.id.desc()), limit, ()),
+        }
+        parts = []
+        for name, (order, n, criteria) in lists.items():
+            parts.append(select(
+                literal(name).label('list_name'),
+                func.row_number().over(order_by=order).label('rank'),
+                *SONG_DISPLAY_COLUMNS
+            ).where(*criteria).order_by(*order).limit(n).subquery())
+        
+        stmt = union_all(*[select(part) for part in parts])
+        snapshot = {name: [] for name in lists}
+        for row in db.session.execute(stmt.order_by('list_name', 'rank')).all():
+            snapshot[row.list_name].append(row)
+        return snapshot
+    except Exception as e:
+        print(f"榜单快照查询错误: {e}")
+        return {'popular': [], 'high_rated': [], 'new': []}
+
+
+def get_user_activity_snapshot(user_id):
+    """一次 UNION ALL 查询取用户的评分、播放次数和预计算推荐列表
+    
+    返回 {'ratings': {song_id: rating}, 'plays': {song_id: play_count},
+          'precomputed': {rec_type: [(song_id, score), ...]}}
+    """
+    snapshot = {'ratings': {}, 'plays': {}, 'precomputed': {}}
+    try:
+        stmt = union_all(
+            select(literal('rating').label('kind'), Rating.song_id.label('song_id'),
+                   Rating.rating.label('value'), null().label('items'))
+            .where(Rating.user_id == user_id),
+            select(literal('play'), PlayHistory.song_id, PlayHistory.play_count, null())
+            .where(PlayHistory.user_id == user_id),
+            select(UserRecommendation.rec_type, null(), null(), UserRecommendation.items)
+            .where(UserRecommendation.user_id == user_id),
+        )
+        for kind, song_id, value, items in db.session.execute(stmt).all():
+            if kind == 'rating':
+                snapshot['ratings'][song_id] = value
+            elif kind == 'play':
+                snapshot['plays'][song_id] = value or 0
+            else:
+                # 联合查询中 JSON 列按原始字符串返回
+                items = json.loads(items) if isinstance(items, str) else items
+                snapshot['precomputed'][kind] = [(sid, score) for sid, score in items]
+    except Exception as e:
+        print(f"用户活动快照查询错误: {e}")
+        db.session.rollback()
+    return snapshot
+
+
+def get_song_summaries(song_ids):
+    """按ID批量取歌曲的展示列（SONG_DISPLAY_COLUMNS），返回 {song_id: row}"""
+    if not song_ids:
+        return {}
+    try:
+        rows = db.session.query(*SONG_DISPLAY_COLUMNS).filter(Song.id.in_(list(song_ids))).all()
+        return {row.id: row for row in rows}
+    except Exception as e:
+        print(f"批量查询歌曲错误: {e}")
+        return {}
+
+
+def get_song_by_id(song_id, fields=None):
+    """根据ID获取歌曲；传 fields 时只查询这些列，返回行（见 database.song_fields）"""
     try:
+        if fields is not None:
+            rows = get_song_rows([song_id], fields)
+            return rows[0] if rows else None
         return Song.query.get(song_id)
     except Exception as e:
         print(f"获取歌曲错误: {e}")
         return None
 
 
-def record_play(user_id, song_id):
-    """记录播放历史"""
+def _on_user_activity(user_ids, activity=None):
+    """用户产生新的播放/评分后（事务提交之后调用），清除其推荐结果缓存，并计入榜单快照的刷新计数
+    
+    activity 为本次的播放/评分次数（默认每个用户一次）。预计算推荐列表保留到下一次离线批量计算，
+    读取时去掉用户此后播放/评分过的歌曲（见 recommender/candidates.py），写入路径不做删除。
+    """
+    from recommender.result_cache import recommendation_cache
+    from recommender.popularity_snapshot import popularity_snapshot
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        recommendation_cache.invalidate_user(user_id)
+    popularity_snapshot.note_activity(activity or len(user_ids))
+
+
+def record_play(user_id, song_id, duration=0):
+    """记录一次播放（经写缓冲批量写库，见 database.play_buffer）"""
+    from database.play_buffer import play_buffer
     try:
-        # 更新歌曲播放计数
-        song = Song.query.get(song_id)
-        if song:
-            song.play_count = (song.play_count or 0) + 1
+        return play_buffer.add(user_id, song_id, duration)
+    except Exception as e:
+        print(f"记录播放错误: {e}")
+        return False
+
+
+_play_history_upsert = None  # play_history 的 (user_id, song_id) 唯一索引是否可用，首次写入时检查
+
+
+def _ensure_play_history_index():
+    """旧数据库的 play_history 表没有唯一索引时补建；已有重复记录而建不了时退回逐条更新"""
+    global _play_history_upsert
+    if _play_history_upsert is None:
+        index = next(i for i in PlayHistory.__table__.indexes if i.name == 'uq_play_history_user_song')
+        try:
+            index.create(bind=db.session.connection(), checkfirst=True)
             db.session.commit()
-            
-            # 记录播放历史
-            history = PlayHistory.query.filter_by(
-                user_id=user_id, 
-                song_id=song_id
-            ).first()
-            
-            if history:
-                history.play_count += 1
-                history.last_played = func.now()
+            _play_history_upsert = True
+        except Exception as e:
+            print(f"⚠️ 无法创建播放历史唯一索引，改为逐条更新: {e}")
+            db.session.rollback()
+            _play_history_upsert = False
+    return _play_history_upsert
+
+
+def _upsert_play_history(rows):
+    """按 (user_id, song_id) 累加播放历史，rows 为 [{user_id, song_id, play_count, total_duration, last_played}]"""
+    table = PlayHistory.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql', 'mysql') and _ensure_play_history_index():
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                play_count=table.c.play_count + stmt.inserted.play_count,
+                total_duration=func.coalesce(table.c.total_duration, 0) + stmt.inserted.total_duration,
+                last_played=stmt.inserted.last_played,
+            )
+        else:
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
             else:
-                history = PlayHistory(
-                    user_id=user_id,
-                    song_id=song_id,
-                    play_count=1,
-                    last_played=func.now()
-                )
-                db.session.add(history)
-            
-            db.session.commit()
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.song_id],
+                set_={
+                    'play_count': table.c.play_count + stmt.excluded.play_count,
+                    'total_duration': func.coalesce(table.c.total_duration, 0) + stmt.excluded.total_duration,
+                    'last_played': stmt.excluded.last_played,
+                },
+            )
+        db.session.execute(stmt, rows)
+        return
+    
+    for row in rows:
+        result = db.session.execute(
+            table.update()
+            .where(table.c.user_id == row['user_id'], table.c.song_id == row['song_id'])
+            .values(play_count=table.c.play_count + row['play_count'],
+                    total_duration=func.coalesce(table.c.total_duration, 0) + row['total_duration'],
+                    last_played=row['last_played'])
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert(), row)
+
+
+def record_plays(events):
+    """批量写入播放 [(user_id, song_id, duration, played_at, client_key)]
+    
+    一个事务内：按歌曲聚合更新 songs.play_count，按 (用户, 歌曲) upsert 播放历史，追加播放事件。
+    不存在的歌曲被忽略；client_key 重复时整个事务失败（由 uq_play_event_client_key 保证）。
+    """
+    try:
+        existing = set(db.session.scalars(
+            select(Song.id).where(Song.id.in_({event[1] for event in events}))
+        ))
+        events = [event for event in events if event[1] in existing]
+        if not events:
             return True
-        return False
+        
+        song_counts = {}
+        histories = {}
+        for user_id, song_id, duration, played_at, _ in events:
+            song_counts[song_id] = song_counts.get(song_id, 0) + 1
+            row = histories.setdefault((user_id, song_id), {
+                'user_id': user_id, 'song_id': song_id,
+                'play_count': 0, 'total_duration': 0, 'last_played': played_at,
+            })
+            row['play_count'] += 1
+            row['total_duration'] += duration
+            row['last_played'] = max(row['last_played'], played_at)
+        
+        _ensure_play_history_index()
+        songs = Song.__table__
+        db.session.execute(
+            songs.update()
+            .where(songs.c.id == bindparam('song_id_'))
+            .values(play_count=func.coalesce(songs.c.play_count, 0) + bindparam('plays_')),
+            [{'song_id_': song_id, 'plays_': count} for song_id, count in song_counts.items()]
+        )
+        _upsert_play_history(list(histories.values()))
+        db.session.execute(PlayEvent.__table__.insert(), [
+            {'user_id': user_id, 'song_id': song_id, 'duration': duration,
+             'played_at': played_at, 'client_key': client_key}
+            for user_id, song_id, duration, played_at, client_key in events
+        ])
+        db.session.commit()
     except Exception as e:
-        print(f"记录播放错误: {e}")
+        print(f"批量记录播放错误: {e}")
         db.session.rollback()
         return False
+    
+    _on_user_activity({user_id for user_id, _ in histories}, activity=len(events))
+    from database.system_stats import system_stats
+    system_stats.note_plays(len(events))
+    from database.data_versions import data_versions
+    data_versions.bump_songs(song_counts, plays=True)
+    from recommender.trending import trending_engine
+    if trending_engine.is_loaded:  # 未加载时由首次加载从 play_events 表统计
+        for _, song_id, _, played_at, _ in events:
+            trending_engine.record(song_id, played_at=played_at.replace(tzinfo=timezone.utc).timestamp())
+    return True
+
 
+def _parse_client_time(value, now):
+    """客户端时间：毫秒时间戳或 ISO 8601 字符串，转为 UTC 的 naive datetime"""
+    if value is None:
+        return now
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value / 1000.0)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
-def search_songs(query, limit=20, offset=0):
-    """搜索歌曲"""
+
+def _client_int(value, default=None):
+    """客户端的整数字段：整数、整数值的浮点数或数字字符串；布尔值和带小数的值无效"""
+    if value is None and default is not None:
+        return default
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def record_play_batch(user_id, plays):
+    """批量记录客户端上报的播放
+    
+    plays 为 [{song_id, played_at（毫秒时间戳或ISO时间）, duration（秒）, key（幂等键）}]，
+    整批校验后一次写入；已写入过的 key 计为重复，不再计数。
+    返回 {'accepted': n, 'duplicates': n, 'rejected': [{'index': i, 'reason': ...}]}，写库失败时返回None
+    """
+    from config import Config
+    now = datetime.utcnow()
+    earliest = now - timedelta(days=Config.PLAY_BATCH_MAX_AGE_DAYS)
+    latest = now + timedelta(seconds=Config.PLAY_BATCH_CLOCK_SKEW_SECONDS)
+    
+    rejected = []
+    valid = []  # (下标, song_id, duration, played_at, key)
+    for index, play in enumerate(plays):
+        if not isinstance(play, dict):
+            rejected.append({'index': index, 'reason': '格式错误'})
+            continue
+        try:
+            song_id = _client_int(play.get('song_id'))
+            duration = _client_int(play.get('duration'), default=0)
+            played_at = _parse_client_time(play.get('played_at'), now)
+        except (TypeError, ValueError, OverflowError, OSError):
+            rejected.append({'index': index, 'reason': '字段类型错误'})
+            continue
+        key = play.get('key')
+        if key is not None and (not isinstance(key, str) or not 0 < len(key) <= 64):
+            rejected.append({'index': index, 'reason': '幂等键无效'})
+        elif not 0 <= duration <= Config.PLAY_BATCH_MAX_DURATION:
+            rejected.append({'index': index, 'reason': '播放时长超出范围'})
+        elif not earliest <= played_at <= latest:
+            rejected.append({'index': index, 'reason': '播放时间超出范围'})
+        else:
+            valid.append((index, song_id, duration, played_at, key))
+    
+    try:
+        existing_songs = set(db.session.scalars(
+            select(Song.id).where(Song.id.in_({item[1] for item in valid}))
+        )) if valid else set()
+        keys = {item[4] for item in valid if item[4] is not None}
+        seen_keys = set(db.session.scalars(
+            select(PlayEvent.client_key).where(PlayEvent.user_id == user_id, PlayEvent.client_key.in_(keys))
+        )) if keys else set()
+    except Exception as e:
+        print(f"批量播放校验错误: {e}")
+        db.session.rollback()
+        return None
+    
+    events = []
+    duplicates = 0
+    for index, song_id, duration, played_at, key in valid:
+        if song_id not in existing_songs:
+            rejected.append({'index': index, 'reason': '歌曲不存在'})
+        elif key is not None and key in seen_keys:
+            duplicates += 1
+        else:
+            if key is not None:
+                seen_keys.add(key)
+            events.append((user_id, song_id, duration, played_at, key))
+    
+    if events and not record_plays(events):
+        return None
+    rejected.sort(key=lambda item: item['index'])
+    return {'accepted': len(events), 'duplicates': duplicates, 'rejected': rejected}
+
+
+def _songs_in_order(song_ids, fields):
+    """按 song_ids 的顺序取歌曲：fields 为 None 时返回 Song 对象，否则只查询这些列（见 database.song_fields）"""
+    if fields is not None:
+        return get_song_rows(song_ids, fields)
+    songs_by_id = {song.id: song for song in Song.query.filter(Song.id.in_(song_ids)).all()}
+    return [songs_by_id[song_id] for song_id in song_ids if song_id in songs_by_id]
+
+
+def search_songs(query, limit=20, offset=0, fields=None):
+    """搜索歌曲：全文索引匹配，按相关度（BM25）与播放次数排序；传 fields 时返回只含这些列的行"""
     try:
         if not query or query.strip() == "":
+            if fields is not None:
+                return db.session.execute(select(*song_columns(fields)).limit(limit).offset(offset)).all()
             return Song.query.limit(limit).offset(offset).all()
         
-        search_pattern = f"%{query}%"
-        return Song.query.filter(
-            or_(
-                Song.title.ilike(search_pattern),
-                Song.artist.ilike(search_pattern),
-                Song.album.ilike(search_pattern),
-                Song.genre.ilike(search_pattern)
-            )
-        ).limit(limit).offset(offset).all()
+        from search import song_search
+        song_ids = song_search.search(query, limit=limit, offset=offset)
+        if not song_ids:
+            return []
+        return _songs_in_order(song_ids, fields)
     except Exception as e:
         print(f"搜索歌曲错误: {e}")
         return []
 
 
+def fuzzy_search_songs(query, limit=20, fields=None):
+    """拼写容错搜索：按三元组相似度和编辑距离匹配歌名/歌手名（精确搜索没有结果时使用）；fields 同 search_songs"""
+    try:
+        if not query or query.strip() == "":
+            return []
+        
+        from search import fuzzy_index
+        song_ids = fuzzy_index.song_ids(query, limit=limit)
+        if not song_ids:
+            return []
+        return _songs_in_order(song_ids, fields)
+    except Exception as e:
+        print(f"模糊搜索歌曲错误: {e}")
+        return []
+
+
+def count_search_songs(query):
+    """搜索结果总数（一次计数查询，不取歌曲数据）"""
+    try:
+        if not query or query.strip() == "":
+            return Song.query.count()
+        
+        from search import song_search
+        return song_search.count(query)
+    except Exception as e:
+        print(f"搜索计数错误: {e}")
+        return 0
+
+
 def get_user_ratings(user_id, limit=20):
     """获取用户评分"""
     try:
@@ -259,8 +528,16 @@ def get_user_play_history(user_id, limit=20):
 
 
 def get_similar_songs(song_id, limit=5):
-    """获取相似歌曲（基于相同艺术家或流派）"""
+    """获取相似歌曲（优先用内容特征索引，模型不可用时退回相同艺术家或流派）"""
     try:
+        from recommender.content_based import content_model
+        if content_model.ensure_fitted():
+            ranked = content_model.similar_song_ids(song_id, limit)
+            if ranked:
+                ids = [sid for sid, _ in ranked]
+                songs_by_id = {s.id: s for s in Song.query.filter(Song.id.in_(ids)).all()}
+                return [songs_by_id[sid] for sid in ids if sid in songs_by_id]
+        
         song = Song.query.get(song_id)
         if not song:
             return []
@@ -280,35 +557,56 @@ def get_similar_songs(song_id, limit=5):
         return []
 
 
-def update_song_rating(song_id):
-    """更新歌曲的平均评分"""
+def add_song(song_data):
+    """添加单首歌曲"""
+    songs = batch_add_songs([song_data])
+    return songs[0] if songs else None
+
+
+def batch_add_songs(songs_data):
+    """批量添加歌曲，一次提交；新歌同步追加到内容推荐的特征索引"""
     try:
-        # 获取该歌曲的所有评分
-        ratings = Rating.query.filter_by(song_id=song_id).all()
-        
-        if not ratings:
-            # 如果没有评分，将平均评分设为0
-            song = Song.query.get(song_id)
-            if song:
-                song.avg_rating = 0.0
-                song.rating_count = 0
-                db.session.commit()
-            return
-        
-        # 计算平均分
-        total = sum(r.rating for r in ratings)
-        avg_rating = total / len(ratings)
-        
-        # 更新歌曲
-        song = Song.query.get(song_id)
-        if song:
-            song.avg_rating = round(avg_rating, 1)
-            song.rating_count = len(ratings)
-            db.session.commit()
-            
+        songs = [Song(**data) for data in songs_data]
+        db.session.add_all(songs)
+        db.session.commit()
+        
+        # 已训练的内容模型增量编码新歌，无需整库重建
+        from recommender.content_based import content_model
+        content_model.add_songs(songs)
+        # 进程内搜索索引和输入提示同步新歌（FTS5 索引由触发器同步）
+        from search import song_search, suggest_index, fuzzy_index
+        song_search.add_songs(songs)
+        suggest_index.add_songs(songs)
+        fuzzy_index.add_songs(songs)
+        from database.song_pages import song_counts
+        song_counts.invalidate()
+        from database.data_versions import data_versions
+        data_versions.bump('catalog')
+        return songs
     except Exception as e:
-        print(f"更新评分错误: {e}")
+        print(f"批量添加歌曲错误: {e}")
         db.session.rollback()
+        return []
+
+
+def _apply_rating_delta(song_id, delta_sum, delta_count):
+    """按增量更新歌曲的评分总和/评分数/平均分（O(1)，不提交）；平均分保留一位小数"""
+    songs = Song.__table__
+    new_sum = func.coalesce(songs.c.rating_sum, 0.0) + float(delta_sum)
+    new_count = func.coalesce(songs.c.rating_count, 0) + int(delta_count)
+    db.session.execute(
+        songs.update().where(songs.c.id == song_id).ordered_values(
+            # 平均分放在最前：MySQL 按从左到右的顺序赋值，后面的表达式会读到已更新的列
+            (songs.c.avg_rating, case((new_count > 0, func.round(new_sum / new_count, 1)), else_=0.0)),
+            (songs.c.rating_sum, new_sum),
+            (songs.c.rating_count, new_count),
+        )
+    )
+
+
+def update_song_rating(song_id):
+    """按评分表重新计算单首歌曲的评分统计（日常由 add_rating/delete_rating 增量维护，这里用于修复）"""
+    update_all_song_ratings(song_ids=[song_id])
 
 
 def create_user(username, email, password):
@@ -352,80 +650,178 @@ def authenticate_user(username, password):
 
 
 def get_similar_users(user_id, limit=5):
-    """获取相似用户（基于评分相似度）"""
+    """获取相似用户（基于去均值评分矩阵的皮尔逊相似度）"""
     try:
-        # 获取当前用户的评分
-        current_ratings = Rating.query.filter_by(user_id=user_id).all()
-        if not current_ratings:
+        from recommender.user_neighborhood import user_neighborhood
+        
+        if not user_neighborhood.ensure_fitted():
             return []
         
-        # 获取所有其他用户
-        all_users = User.query.filter(User.id != user_id).all()
-        similar_users = []
+        neighbors = user_neighborhood.similar_users(user_id, limit)
+        if not neighbors:
+            return []
         
-        for user in all_users:
-            user_ratings = Rating.query.filter_by(user_id=user.id).all()
-            if not user_ratings:
-                continue
-            
-            # 计算评分相似度
-            common_songs = 0
-            rating_diff_sum = 0
-            
-            for rating1 in current_ratings:
-                for rating2 in user_ratings:
-                    if rating1.song_id == rating2.song_id:
-                        common_songs += 1
-                        rating_diff_sum += abs(rating1.rating - rating2.rating)
-            
-            if common_songs > 0:
-                avg_diff = rating_diff_sum / common_songs
-                similarity = max(0, 5 - avg_diff) / 5  # 归一化到0-1
-                
-                if similarity > 0.3:
-                    similar_users.append({
-                        'user': user,
-                        'similarity': similarity,
-                        'common_songs': common_songs
-                    })
-        
-        # 按相似度排序
-        similar_users.sort(key=lambda x: x['similarity'], reverse=True)
-        return similar_users[:limit]
+        # 一次查询取回全部相似用户
+        neighbor_ids = [uid for uid, _, _ in neighbors]
+        users = {u.id: u for u in User.query.filter(User.id.in_(neighbor_ids)).all()}
+        
+        return [
+            {
+                'user': users[uid],
+                'similarity': similarity,
+                'common_songs': common_songs
+            }
+            for uid, similarity, common_songs in neighbors
+            if uid in users
+        ]
     except Exception as e:
         print(f"获取相似用户错误: {e}")
         return []
 
 
-def update_all_song_ratings():
-    """更新所有歌曲的评分统计"""
+def add_rating(user_id, song_id, rating):
+    """添加或更新用户评分（歌曲的评分统计按增量更新，与评分在同一事务中提交）"""
     try:
-        songs = Song.query.all()
-        updated_count = 0
-        
-        for song in songs:
-            # 获取该歌曲的所有评分
-            ratings = Rating.query.filter_by(song_id=song.id).all()
-            
-            if ratings:
-                # 计算平均分
-                total = sum(r.rating for r in ratings)
-                avg_rating = total / len(ratings)
-                
-                # 更新歌曲
-                song.avg_rating = round(avg_rating, 1)
-                song.rating_count = len(ratings)
-                updated_count += 1
-            else:
-                # 如果没有评分
-                song.avg_rating = 0.0
-                song.rating_count = 0
+        rating = float(rating)
+        existing = Rating.query.filter_by(user_id=user_id, song_id=song_id).first()
+        if existing:
+            delta_sum, delta_count = rating - existing.rating, 0
+            existing.rating = rating
+            existing.created_at = func.now()
+        else:
+            delta_sum, delta_count = rating, 1
+            db.session.add(Rating(user_id=user_id, song_id=song_id, rating=rating))
+        db.session.flush()
+        _apply_rating_delta(song_id, delta_sum, delta_count)
+        db.session.commit()
         
+        from database.system_stats import system_stats
+        system_stats.note_rating(delta_sum, delta_count)
+        from database.data_versions import data_versions
+        data_versions.bump_songs([song_id])
+        
+        # 评分变化后，该用户的相似用户缓存失效
+        from recommender.user_neighborhood import user_neighborhood
+        user_neighborhood.invalidate(user_id)
+        _on_user_activity([user_id])
+        return True
+    except Exception as e:
+        print(f"添加评分错误: {e}")
+        db.session.rollback()
+        return False
+
+
+def delete_rating(user_id, song_id):
+    """删除用户评分，返回是否删除了评分"""
+    try:
+        existing = Rating.query.filter_by(user_id=user_id, song_id=song_id).first()
+        if not existing:
+            return False
+        old_rating = existing.rating
+        db.session.delete(existing)
+        db.session.flush()
+        _apply_rating_delta(song_id, -old_rating, -1)
         db.session.commit()
-        print(f"✅ 已更新{updated_count}首歌曲的评分统计")
+        
+        from database.system_stats import system_stats
+        system_stats.note_rating(-old_rating, -1)
+        from database.data_versions import data_versions
+        data_versions.bump_songs([song_id])
+        
+        from recommender.user_neighborhood import user_neighborhood
+        user_neighborhood.invalidate(user_id)
+        _on_user_activity([user_id])
+        return True
+    except Exception as e:
+        print(f"删除评分错误: {e}")
+        db.session.rollback()
+        return False
+
+
+def update_all_song_ratings(song_ids=None):
+    """按评分表重建歌曲的评分统计：一次 GROUP BY 聚合后联表更新（song_ids 为空时重建全部歌曲）
+    平均分与增量维护（_apply_rating_delta）一致，保留一位小数"""
+    try:
+        songs, ratings = Song.__table__, Rating.__table__
+        totals = select(
+            ratings.c.song_id,
+            func.count().label('rating_count'),
+            func.sum(ratings.c.rating).label('rating_sum'),
+        ).group_by(ratings.c.song_id)
+        reset = songs.update().values(avg_rating=0.0, rating_sum=0.0, rating_count=0)
+        if song_ids is not None:
+            totals = totals.where(ratings.c.song_id.in_(song_ids))
+            reset = reset.where(songs.c.id.in_(song_ids))
+        totals = totals.subquery()
+        
+        db.session.execute(reset)
+        updated_count = db.session.execute(
+            songs.update().where(songs.c.id == totals.c.song_id).values(
+                rating_count=totals.c.rating_count,
+                rating_sum=totals.c.rating_sum,
+                avg_rating=func.round(totals.c.rating_sum * 1.0 / totals.c.rating_count, 1),
+            )
+        ).rowcount
+        db.session.commit()
+        from database.data_versions import data_versions
+        if song_ids is not None:
+            data_versions.bump_songs(song_ids)
+        else:
+            data_versions.bump('catalog')
+            print(f"✅ 已更新{updated_count}首歌曲的评分统计")
         return updated_count
         
     except Exception as e:
         db.session.rollback()
         print(f"更新评分统计错误: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+
+def update_all_song_play_counts():
+    """按播放历史重建歌曲的播放次数：一次 GROUP BY 聚合后联表更新"""
+    try:
+        songs, history = Song.__table__, PlayHistory.__table__
+        totals = select(
+            history.c.song_id,
+            func.sum(history.c.play_count).label('play_count'),
+        ).group_by(history.c.song_id).subquery()
+        
+        db.session.execute(songs.update().values(play_count=0))
+        updated_count = db.session.execute(
+            songs.update().where(songs.c.id == totals.c.song_id).values(play_count=totals.c.play_count)
+        ).rowcount
+        db.session.commit()
+        from database.data_versions import data_versions
+        data_versions.bump('catalog', 'plays')
+        print(f"✅ 已更新{updated_count}首歌曲的播放次数")
+        return updated_count
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"更新播放次数错误: {e}")
+        return 0
+
+
+def upgrade_schema():
+    """为旧数据库补充后来新增的列（create_all 不会修改已存在的表），需要在应用上下文中调用"""
+    from sqlalchemy import inspect, text
+    columns = {column['name'] for column in inspect(db.engine).get_columns(Song.__tablename__)}
+    if 'rating_sum' not in columns:
+        print("🔧 为 songs 表添加 rating_sum 列并重建评分统计")
+        with db.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {Song.__tablename__} ADD COLUMN rating_sum FLOAT DEFAULT 0"))
+        update_all_song_ratings()
+    
+    # 后来新增的索引（已存在时跳过；播放历史的唯一索引由 _ensure_play_history_index 处理）
+    for model in (Song, Rating, PlayHistory):
+        for index in model.__table__.indexes:
+            if index.unique:
+                continue
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                print(f"⚠️ 创建索引 {index.name} 失败: {e}")
+    
+    # SQLite 上建立 FTS5 全文索引和同步触发器（已存在时跳过）
+    from search import song_search
+    song_search.ensure_index()
@@ -7,7 +7,7 @@ import sys
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database.models import db, User, Song, Rating, PlayHistory, UserPreference
+from database.models import db, User, Song, Rating, PlayHistory, PlayEvent, UserPreference
 from app import app
 import random
 from datetime import datetime, timedelta
@@ -39,6 +39,7 @@ def init_database():
             print(f"  歌曲数: {Song.query.count()}")
             print(f"  评分记录: {Rating.query.count()}")
             print(f"  播放历史: {PlayHistory.query.count()}")
+            print(f"  播放事件: {PlayEvent.query.count()}")
             print("=" * 50)
             
         except Exception as e:
@@ -203,6 +204,20 @@ def create_test_data():
     db.session.commit()
     print(f"✅ 创建了 {len(play_histories)} 个播放历史记录")
     
+    # 播放事件：每条播放历史拆成 play_count 次播放，最后一次为 last_played，其余分布在之前的时间
+    play_events = []
+    for history in play_histories:
+        duration = history.total_duration // history.play_count
+        play_events.append({'user_id': history.user_id, 'song_id': history.song_id,
+                            'played_at': history.last_played, 'duration': duration})
+        for _ in range(history.play_count - 1):
+            played_at = history.last_played - timedelta(seconds=random.randint(0, 30 * 86400))
+            play_events.append({'user_id': history.user_id, 'song_id': history.song_id,
+                                'played_at': played_at, 'duration': duration})
+    db.session.execute(PlayEvent.__table__.insert(), play_events)
+    db.session.commit()
+    print(f"✅ 创建了 {len(play_events)} 个播放事件")
+    
     # 6. 更新歌曲播放次数
     update_song_play_counts()
     
@@ -241,46 +256,14 @@ def create_test_data():
     print(f"✅ 创建了 {len(preferences)} 个用户偏好记录")
 
 def update_song_ratings():
-    """更新歌曲平均评分"""
-    from sqlalchemy import func
-    
-    songs = Song.query.all()
-    updated_count = 0
-    
-    for song in songs:
-        avg_result = db.session.query(func.avg(Rating.rating)).filter(
-            Rating.song_id == song.id
-        ).first()
-        
-        avg_rating = avg_result[0] if avg_result[0] is not None else 0.0
-        
-        if song.avg_rating != avg_rating:
-            song.avg_rating = round(avg_rating, 1) if avg_rating else 0.0
-            updated_count += 1
-    
-    db.session.commit()
-    print(f"✅ 更新了 {updated_count} 首歌曲的平均评分")
+    """更新歌曲评分统计（一次 GROUP BY 联表更新）"""
+    from database.db_operations import update_all_song_ratings
+    update_all_song_ratings()
 
 def update_song_play_counts():
-    """更新歌曲播放次数"""
-    from sqlalchemy import func
-    
-    songs = Song.query.all()
-    updated_count = 0
-    
-    for song in songs:
-        sum_result = db.session.query(func.sum(PlayHistory.play_count)).filter(
-            PlayHistory.song_id == song.id
-        ).first()
-        
-        total_plays = sum_result[0] if sum_result[0] is not None else 0
-        
-        if song.play_count != total_plays:
-            song.play_count = total_plays
-            updated_count += 1
-    
-    db.session.commit()
-    print(f"✅ 更新了 {updated_count} 首歌曲的播放次数")
+    """更新歌曲播放次数（一次 GROUP BY 联表更新）"""
+    from database.db_operations import update_all_song_play_counts
+    update_all_song_play_counts()
 
 if __name__ == '__main__':
     print("=" * 50)
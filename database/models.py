@@ -2,8 +2,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from database.storage import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # 读写分离见 database.storage
 
 class User(UserMixin, db.Model):
     """用户表"""
@@ -46,6 +47,7 @@ class Song(db.Model):
     play_count = db.Column(db.Integer, default=0)
     avg_rating = db.Column(db.Float, default=0.0)
     rating_count = db.Column(db.Integer, default=0)
+    rating_sum = db.Column(db.Float, default=0.0)  # 评分总和，avg_rating = rating_sum / rating_count
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # 音频特征（JSON格式存储）
@@ -55,6 +57,18 @@ class Song(db.Model):
     ratings = db.relationship('Rating', backref='song', lazy=True, cascade='all, delete-orphan')
     play_history = db.relationship('PlayHistory', backref='song', lazy=True)
     
+    # 歌曲列表的三种排序（见 database.song_pages）：按 (排序键, id) 翻页时直接在索引上定位；
+    # 按流派筛选时三种排序都有对应索引，按歌手筛选（每位歌手的歌曲不多）只覆盖默认的播放次数排序
+    __table_args__ = (
+        db.Index('ix_songs_play_count_id', 'play_count', 'id'),
+        db.Index('ix_songs_avg_rating_id', 'avg_rating', 'id'),
+        db.Index('ix_songs_created_at_id', 'created_at', 'id'),
+        db.Index('ix_songs_genre_play_count_id', 'genre', 'play_count', 'id'),
+        db.Index('ix_songs_genre_avg_rating_id', 'genre', 'avg_rating', 'id'),
+        db.Index('ix_songs_genre_created_at_id', 'genre', 'created_at', 'id'),
+        db.Index('ix_songs_artist_play_count_id', 'artist', 'play_count', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Song {self.title} - {self.artist}>'
 
@@ -68,8 +82,12 @@ class Rating(db.Model):
     rating = db.Column(db.Float, nullable=False)  # 1-5分
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # 唯一约束：一个用户对一首歌只能评分一次
-    __table_args__ = (db.UniqueConstraint('user_id', 'song_id', name='unique_user_song_rating'),)
+    # 唯一约束：一个用户对一首歌只能评分一次；用户的评分按时间倒序列出，按歌曲汇总评分统计
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'song_id', name='unique_user_song_rating'),
+        db.Index('ix_ratings_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_ratings_song_rating', 'song_id', 'rating'),
+    )
     
     def __repr__(self):
         return f'<Rating user:{self.user_id} song:{self.song_id} rating:{self.rating}>'
@@ -85,9 +103,32 @@ class PlayHistory(db.Model):
     last_played = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     total_duration = db.Column(db.Integer, default=0)  # 总播放时长（秒）
     
+    # 每个用户每首歌只有一条记录，批量写入时按该索引 upsert；用户的播放历史按最近播放列出，按歌曲汇总播放次数
+    __table_args__ = (
+        db.Index('uq_play_history_user_song', 'user_id', 'song_id', unique=True),
+        db.Index('ix_play_history_user_last_played', 'user_id', 'last_played'),
+        db.Index('ix_play_history_song_play_count', 'song_id', 'play_count'),
+    )
+    
     def __repr__(self):
         return f'<PlayHistory user:{self.user_id} song:{self.song_id} count:{self.play_count}>'
 
+class PlayEvent(db.Model):
+    """播放事件表（只追加，不修改），用于按时间窗口统计热度"""
+    __tablename__ = 'play_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False, index=True)
+    played_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    duration = db.Column(db.Integer, default=0)  # 本次播放时长（秒）
+    client_key = db.Column(db.String(64))  # 客户端生成的幂等键，重试时不重复计数
+    
+    __table_args__ = (db.Index('uq_play_event_client_key', 'user_id', 'client_key', unique=True),)
+    
+    def __repr__(self):
+        return f'<PlayEvent user:{self.user_id} song:{self.song_id} at:{self.played_at}>'
+
 class UserPreference(db.Model):
     """用户偏好表"""
     __tablename__ = 'user_preferences'
@@ -104,3 +145,16 @@ class UserPreference(db.Model):
     
     def __repr__(self):
         return f'<UserPreference user:{self.user_id}>'
+
+
+class UserRecommendation(db.Model):
+    """离线预计算的推荐列表（每个用户每种算法一行）"""
+    __tablename__ = 'user_recommendations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    rec_type = db.Column(db.String(20), primary_key=True)  # collaborative, als, content
+    items = db.Column(db.JSON, nullable=False)  # [[song_id, score], ...] 按分数降序
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserRecommendation user:{self.user_id} type:{self.rec_type}>'
@@ -0,0 +1,225 @@
+"""
+播放记录写缓冲（write-behind）
+
+record_play 只把 (user_id, song_id, duration, played_at, client_key) 放进内存队列，后台线程每隔
+Config.PLAY_BUFFER_FLUSH_SECONDS 秒或攒够 Config.PLAY_BUFFER_MAX_EVENTS 条时批量写库：
+一个事务内按歌曲聚合 play_count 增量、按 (用户, 歌曲) upsert 播放历史、追加播放事件，
+热门歌曲在一个批次里只更新一次。
+
+Config.PLAY_BUFFER_DURABILITY 控制持久性:
+  async  请求立即返回；进程崩溃时可能丢失最近一个刷新周期内的播放
+  group  请求等待其所在批次提交后返回（组提交）：有播放即刷新，上一次提交期间到达的播放合并为一批
+  sync   每次播放在请求线程中立即单独提交
+进程正常退出时（atexit）会写入队列中剩余的播放。没有调用 init_app() 时（如脚本）按 sync 处理。
+
+写库失败的批次单独重试，不阻塞也不并入之后的播放，重试间隔按指数增长（最长 Config.PLAY_BUFFER_MAX_BACKOFF 秒）：
+先整批重试，失败 Config.PLAY_BUFFER_MAX_RETRIES 次后逐条重试，能写入的写入，逐条也失败同样次数的播放
+（如用户已删除导致外键错误）记录日志并放入死信（内存中保留最近 Config.PLAY_BUFFER_DEAD_LETTERS 条）。
+重试期间新的播放在队列中等待，队列超过 Config.PLAY_BUFFER_MAX_PENDING 条时拒绝新的播放。
+"""
+import atexit
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from config import Config
+
+DURABILITY_MODES = ('async', 'group', 'sync')
+
+
+class PlayBuffer:
+    """播放记录写缓冲（线程安全）"""
+
+    def __init__(self, flush_interval=None, max_events=None, durability=None):
+        self.flush_interval = flush_interval or Config.PLAY_BUFFER_FLUSH_SECONDS
+        self.max_events = max_events or Config.PLAY_BUFFER_MAX_EVENTS
+        self.durability = durability or Config.PLAY_BUFFER_DURABILITY
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"未知的持久性设置: {self.durability}")
+
+        self.max_pending = Config.PLAY_BUFFER_MAX_PENDING
+        self.max_retries = Config.PLAY_BUFFER_MAX_RETRIES
+
+        self._app = None
+        self._events = []           # 待写入的播放
+        self._retry = []            # 写库失败、等待重试的批次
+        self._retry_batch = 0       # 该批次的批次号
+        self._attempts = 0          # 该批次已尝试的次数
+        self._batch = 0             # 当前正在收集的批次号
+        self._committed = 0         # 已提交批次号之前的全部播放都已写库
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+        self.flushes = 0
+        self.flushed_events = 0
+        self.failed_flushes = 0
+        self.dropped_events = 0     # 队列已满被拒绝的播放
+        self.dead_letters = deque(maxlen=Config.PLAY_BUFFER_DEAD_LETTERS)
+        self.dead_lettered = 0
+        self.last_flush_ms = 0.0
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['play_buffer'] = self
+        atexit.register(self.close)
+
+    def add(self, user_id, song_id, duration=0):
+        """记录一次播放，返回是否已写入（async 模式下为是否已入队）"""
+        event = (int(user_id), int(song_id), int(duration or 0), datetime.utcnow(), None)
+        if self._app is None or self.durability == 'sync':
+            return self._write([event])
+
+        with self._cond:
+            if not self._stopped:
+                if len(self._events) >= self.max_pending:
+                    self.dropped_events += 1
+                    if self.dropped_events % 1000 == 1:
+                        print(f"⚠️ 播放写缓冲已满（{len(self._events)} 条待写入），拒绝新的播放")
+                    return False
+                self._events.append(event)
+                batch = self._batch
+                if self.durability == 'group' or len(self._events) >= self.max_events:
+                    self._cond.notify_all()
+                self._start()
+                if self.durability == 'async':
+                    return True
+                # 组提交：等待包含本次播放的批次提交（失败的批次在后台重试）
+                return self._cond.wait_for(lambda: self._committed > batch,
+                                           timeout=max(1.0, 5 * self.flush_interval))
+        # 已关闭（进程退出中）时直接写库
+        return self._write([event])
+
+    def _start(self):
+        """按需启动后台刷新线程（调用方持有 self._cond）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='play-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or self._flush_due(), timeout=self.flush_interval)
+                if self._stopped:
+                    return
+                failed = self.failed_flushes
+            self.flush()
+            with self._cond:
+                if self.failed_flushes > failed:
+                    # 写库失败时稍后重试，间隔按失败次数指数增长
+                    delay = min(self.flush_interval * 2 ** (self._attempts - 1), Config.PLAY_BUFFER_MAX_BACKOFF)
+                    self._cond.wait_for(lambda: self._stopped, timeout=delay)
+
+    def _flush_due(self):
+        """group 模式下有播放即刷新（上一次提交期间到达的播放自然合并为一批），否则攒够 max_events 条"""
+        if self.durability == 'group':
+            return bool(self._events)
+        return len(self._events) >= self.max_events
+
+    def flush(self):
+        """把队列中的播放写入数据库（一个事务），返回写入的条数；有失败的批次时只重试该批次"""
+        with self._flush_lock:
+            if self._retry:
+                return self._flush_retry()
+            with self._cond:
+                events, self._events = self._events, []
+                batch = self._batch
+                self._batch += 1
+            if not events:
+                with self._cond:
+                    self._committed = batch + 1
+                    self._cond.notify_all()
+                return 0
+
+            start = time.perf_counter()
+            ok = self._write(events)
+            with self._cond:
+                if ok:
+                    self._committed = batch + 1
+                    self.flushes += 1
+                    self.flushed_events += len(events)
+                    self.last_flush_ms = (time.perf_counter() - start) * 1000
+                else:
+                    self.failed_flushes += 1
+                    self._retry, self._retry_batch, self._attempts = events, batch, 1
+                self._cond.notify_all()
+            return len(events) if ok else 0
+
+    def _flush_retry(self):
+        """重试失败的批次：先整批，max_retries 次后逐条，逐条也失败 max_retries 次的进入死信（持有 _flush_lock）"""
+        events = self._retry
+        start = time.perf_counter()
+        if self._attempts < self.max_retries:
+            failed = [] if self._write(events) else events
+        else:
+            failed = [event for event in events if not self._write([event])]
+        written = len(events) - len(failed)
+        with self._cond:
+            self._attempts += 1
+            if written:
+                self.flushes += 1
+                self.flushed_events += written
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+            if failed and self._attempts >= 2 * self.max_retries:
+                self._dead_letter(failed)
+                failed = []
+            if failed:
+                self.failed_flushes += 1
+                self._retry = failed
+            else:
+                self._retry, self._attempts = [], 0
+                self._committed = max(self._committed, self._retry_batch + 1)
+            self._cond.notify_all()
+        return written
+
+    def _dead_letter(self, events):
+        """无法写入的播放记录日志并放入死信（调用方持有 self._cond）"""
+        self.dead_letters.extend(events)
+        self.dead_lettered += len(events)
+        print(f"❌ {len(events)} 条播放重试 {self._attempts} 次仍无法写入，已放入死信: {events[:5]}")
+
+    def _write(self, events):
+        from flask import has_app_context
+        from database.db_operations import record_plays
+        if has_app_context() or self._app is None:
+            return record_plays(events)
+        with self._app.app_context():
+            return record_plays(events)
+
+    def close(self):
+        """停止后台线程并写入剩余的播放（进程退出时调用）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        pending = len(self._events) + len(self._retry)
+        if pending:
+            print(f"💾 写入缓冲中剩余的 {pending} 条播放记录")
+            for _ in range(2):  # 失败的批次和队列各一次
+                if self._events or self._retry:
+                    self.flush()
+            pending = len(self._events) + len(self._retry)
+            if pending:
+                print(f"❌ {pending} 条播放记录未能写入")
+
+    def stats(self):
+        with self._cond:
+            return {
+                'durability': self.durability,
+                'pending': len(self._events),
+                'retrying': len(self._retry),
+                'retry_attempts': self._attempts,
+                'dropped_events': self.dropped_events,
+                'dead_lettered': self.dead_lettered,
+                'flushes': self.flushes,
+                'flushed_events': self.flushed_events,
+                'failed_flushes': self.failed_flushes,
+                'last_flush_ms': round(self.last_flush_ms, 2),
+            }
+
+
+# 全进程共享的播放写缓冲
+play_buffer = PlayBuffer()
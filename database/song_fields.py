@@ -0,0 +1,86 @@
+"""
+歌曲的字段投影与序列化
+
+接口返回的歌曲字典统一由 song_to_dict 生成，查询只取需要的列（select(列...)，返回轻量的行而不是 ORM 对象，
+不经过会话的标识映射，也不读取 audio_features 这样的大字段）：
+- SONG_FIELDS 为可以返回的字段，DEFAULT_SONG_FIELDS 为接口默认返回的字段
+- 接口的 fields= 参数（逗号分隔）经 parse_fields 校验后传给查询函数，只查询这些列，id 总是包含
+- song_to_dict 接受任何有这些属性的对象（投影行、榜单快照行、ORM 对象）
+"""
+import json
+from sqlalchemy import select
+from database.models import db, Song
+
+# 字段名 -> 列
+SONG_FIELDS = {
+    'id': Song.id,
+    'title': Song.title,
+    'artist': Song.artist,
+    'album': Song.album,
+    'genre': Song.genre,
+    'duration': Song.duration,
+    'release_year': Song.release_year,
+    'play_count': Song.play_count,
+    'avg_rating': Song.avg_rating,
+    'rating_count': Song.rating_count,
+    'created_at': Song.created_at,
+    'audio_features': Song.audio_features,
+}
+DEFAULT_SONG_FIELDS = ('id', 'title', 'artist', 'album', 'genre', 'duration', 'release_year',
+                       'play_count', 'avg_rating')
+# 排行榜的歌曲来自榜单快照，只有快照中的列
+CHART_FIELDS = tuple(name for name in DEFAULT_SONG_FIELDS if name != 'release_year')
+CHART_FIELDS_ALLOWED = {name for name in SONG_FIELDS if name != 'audio_features'}
+
+
+def parse_fields(value, default=DEFAULT_SONG_FIELDS, allowed=None):
+    """解析 fields= 参数（逗号分隔的字段名），为空时返回 default；有未知字段时抛出 ValueError"""
+    if not value:
+        return tuple(default)
+    allowed = SONG_FIELDS if allowed is None else allowed
+    fields = ['id']
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise ValueError(f'未知的字段: {name}')
+        if name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+def song_columns(fields, *extra):
+    """fields 对应的列，再加上 extra 中还没有的列（例如分页需要的排序键）"""
+    columns = [SONG_FIELDS[name] for name in fields]
+    columns += [column for column in extra if column.key not in fields]
+    return columns
+
+
+def _value(name, value):
+    if name == 'avg_rating':
+        return float(value) if value else 0.0
+    if name == 'created_at':
+        return value.isoformat() if value else None
+    if name == 'audio_features' and isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def song_to_dict(song, fields=DEFAULT_SONG_FIELDS):
+    """歌曲转为可序列化为JSON的字典，只包含 fields 中的字段"""
+    return {name: _value(name, getattr(song, name)) for name in fields}
+
+
+def get_song_rows(song_ids, fields=DEFAULT_SONG_FIELDS):
+    """按ID批量取歌曲，只查询 fields 对应的列，按 song_ids 的顺序返回行（不存在的歌曲被跳过）"""
+    if not song_ids:
+        return []
+    rows = db.session.execute(
+        select(*song_columns(fields, Song.id)).where(Song.id.in_(list(song_ids)))
+    ).all()
+    rows_by_id = {row.id: row for row in rows}
+    return [rows_by_id[song_id] for song_id in song_ids if song_id in rows_by_id]
@@ -0,0 +1,168 @@
+"""
+歌曲列表分页（GET /api/songs）
+
+列表按 (排序键 降序, id 降序) 排列，排序键为 NULL 的歌曲排在最后（与 SQLite/MySQL 的降序一致）。
+游标分页：每页返回下一页的游标（不透明的 base64 字符串，内容为 [排序方式, 最后一首的排序键, 最后一首的id]），
+下一页从游标处在 (排序键, id) 索引上直接定位，第5000页与第1页的开销相同。
+定位拆成几段各自能走索引的查询：同一排序键中 id 更小的、排序键更小的、排序键为 NULL 的，取满一页为止
+（行值比较 (排序键, id) < (?, ?) 在 SQLite 上只按排序键定位，同分歌曲很多时会逐行跳过）。
+
+旧的 page/per_page 参数仍然可用：OFFSET 只在覆盖索引上跳过歌曲ID，再按ID取整行；同时返回下一页的游标。
+总数只在需要时计算，按 (流派, 歌手) 缓存 Config.SONG_COUNT_TTL 秒。
+传 fields 时只查询这些列（见 database.song_fields），返回轻量的行而不是 Song 对象。
+"""
+import json
+import time
+import base64
+import threading
+from datetime import datetime
+from sqlalchemy import select, func
+from config import Config
+from database.models import db, Song
+from database.song_fields import song_columns
+
+SONG_SORTS = ('play_count', 'rating', 'new')
+
+
+def _sort_column(sort_by):
+    if sort_by == 'rating':
+        return Song.avg_rating
+    if sort_by == 'new':
+        return Song.created_at
+    return Song.play_count
+
+
+def encode_cursor(sort_by, value, song_id):
+    """最后一首歌曲的 (排序键, id) 编码为游标"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort_by, value, song_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by):
+    """游标解码为 (排序键, id)；游标无效或不是该排序方式的游标时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, song_id = json.loads(raw)
+        if cursor_sort != sort_by or type(song_id) is not int:
+            raise ValueError
+        if value is not None and sort_by == 'new':
+            value = datetime.fromisoformat(value)
+        elif value is not None and not isinstance(value, (int, float)):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError('无效的分页游标')
+    return value, song_id
+
+
+def _filtered(statement, genre, artist):
+    if genre:
+        statement = statement.where(Song.genre == genre)
+    if artist:
+        statement = statement.where(Song.artist == artist)
+    return statement
+
+
+def _rows(statement, columns):
+    """columns 为 None 时返回 Song 对象，否则 statement 已只选这些列，返回行"""
+    if columns is None:
+        return db.session.scalars(statement).all()
+    return db.session.execute(statement).all()
+
+
+def _seek(sort_by, genre, artist, after, limit, columns=None):
+    """游标 after=(排序键, id) 之后的 limit 首歌曲（after 为 None 时从头开始）"""
+    column = _sort_column(sort_by)
+    selected = select(Song) if columns is None else select(*columns)
+    order = (column.desc(), Song.id.desc())
+    if after is None:
+        phases = [(column.is_not(None),), (column.is_(None),)]
+    elif after[0] is None:
+        phases = [(column.is_(None), Song.id < after[1])]
+    else:
+        phases = [(column == after[0], Song.id < after[1]), (column < after[0],), (column.is_(None),)]
+
+    songs = []
+    for conditions in phases:
+        statement = _filtered(selected, genre, artist).where(*conditions)
+        songs += _rows(statement.order_by(*order).limit(limit - len(songs)), columns)
+        if len(songs) >= limit:
+            break
+    return songs
+
+
+def _offset(sort_by, genre, artist, offset, limit, columns=None):
+    """旧的 page/per_page：在 (排序键, id) 覆盖索引上跳过 offset 个ID，再按ID取这一页的歌曲"""
+    column = _sort_column(sort_by)
+    statement = _filtered(select(Song.id), genre, artist)
+    ids = db.session.scalars(
+        statement.order_by(column.desc(), Song.id.desc()).offset(offset).limit(limit)
+    ).all()
+    if not ids:
+        return []
+    selected = select(Song) if columns is None else select(*columns)
+    songs = {song.id: song for song in _rows(selected.where(Song.id.in_(ids)), columns)}
+    return [songs[song_id] for song_id in ids if song_id in songs]
+
+
+class SongCountCache:
+    """按 (流派, 歌手) 缓存歌曲总数（线程安全）"""
+
+    def __init__(self, ttl=None, max_entries=1024):
+        self.ttl = Config.SONG_COUNT_TTL if ttl is None else ttl
+        self.max_entries = max_entries
+        self._counts = {}  # (genre, artist) -> (总数, 统计时间)
+        self._lock = threading.Lock()
+
+    def get(self, genre='', artist=''):
+        key = (genre or '', artist or '')
+        with self._lock:
+            cached = self._counts.get(key)
+        if cached is not None and time.time() - cached[1] < self.ttl:
+            return cached[0]
+
+        count = db.session.scalar(_filtered(select(func.count(Song.id)), genre, artist))
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                self._counts.clear()
+            self._counts[key] = (count, time.time())
+        return count
+
+    def invalidate(self):
+        """新增或删除歌曲后调用"""
+        with self._lock:
+            self._counts.clear()
+
+
+# 全进程共享的歌曲总数缓存
+song_counts = SongCountCache()
+
+
+def get_song_page(sort_by='play_count', genre='', artist='', limit=20, cursor=None, page=None, with_total=False,
+                  fields=None):
+    """一页歌曲列表
+
+    传 cursor 时从游标处继续（page 被忽略），否则按 page（从1开始）用 OFFSET 取页。
+    返回 {'songs': [Song], 'next_cursor': 下一页游标或 None, 'has_more': bool, 'total': 总数或 None}；
+    传 fields 时 songs 为只含这些列（以及 id 和排序键）的行。cursor 无效时抛出 ValueError。
+    """
+    sort_by = sort_by if sort_by in SONG_SORTS else 'play_count'
+    columns = None if fields is None else song_columns(fields, Song.id, _sort_column(sort_by))
+    if cursor:
+        songs = _seek(sort_by, genre, artist, decode_cursor(cursor, sort_by), limit + 1, columns)
+    else:
+        songs = _offset(sort_by, genre, artist, (max(page or 1, 1) - 1) * limit, limit + 1, columns)
+
+    has_more = len(songs) > limit
+    songs = songs[:limit]
+    next_cursor = None
+    if has_more:
+        last = songs[-1]
+        next_cursor = encode_cursor(sort_by, getattr(last, _sort_column(sort_by).key), last.id)
+    return {
+        'songs': songs,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'total': song_counts.get(genre, artist) if with_total else None,
+    }
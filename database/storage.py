@@ -0,0 +1,106 @@
+"""
+SQLite 存储模式
+
+Config.SQLITE_STORAGE_MODE:
+  default     SQLAlchemy 默认设置（回滚日志，读写共用一个连接池）；写入提交时读请求要等待
+  concurrent  生产环境：每个连接都设置 Config.SQLITE_PRAGMAS（WAL、synchronous=NORMAL、mmap_size、cache_size 等），
+              读写分离为两个连接池——读连接池（Config.SQLITE_READER_POOL_SIZE 个连接，PRAGMA query_only）
+              和只有一个连接的写连接池，所有写入在这一个连接上串行执行。WAL 模式下读不阻塞写、写不阻塞读，
+              record_play 等写入提交时读请求照常执行。
+
+读写路由由 RoutingSession 完成：SELECT 使用读连接池；事务中一旦有写入（flush、UPDATE/INSERT/DELETE、
+DDL 或直接取连接），该事务之后的语句都使用写连接，保证读到自己尚未提交的修改，提交或回滚后恢复。
+读连接没有使用 mode=ro 打开：只读连接在写连接全部关闭、WAL 的共享内存文件被删除后无法重新打开数据库。
+
+init_storage(app) 代替 db.init_app(app) 调用（连接池参数需要在 Flask-SQLAlchemy 创建引擎之前设置）。
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select, CompoundSelect, TextClause
+from flask_sqlalchemy.session import Session
+from config import Config
+
+STORAGE_MODES = ('default', 'concurrent')
+READER_BIND = 'sqlite_reader'
+WRITE_PRAGMAS = ('journal_mode', 'synchronous')  # 只在写连接上设置
+_WRITING = 'storage_writing'
+
+
+def _is_read(clause):
+    if isinstance(clause, (Select, CompoundSelect)):
+        return True
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == 'SELECT'
+    return False
+
+
+class RoutingSession(Session):
+    """有读连接池时，事务中写入之前的 SELECT 使用读连接池，其余语句使用写连接"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            reader = self._db.engines.get(READER_BIND)
+            if reader is not None:
+                if not self._flushing and not self.info.get(_WRITING) and _is_read(clause):
+                    return reader
+                self.info[_WRITING] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _end_writing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_WRITING, None)
+
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def _is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def init_storage(app):
+    """按 Config.SQLITE_STORAGE_MODE 初始化数据库（代替 db.init_app(app)），返回实际使用的存储模式"""
+    from database.models import db
+    mode = app.config.get('SQLITE_STORAGE_MODE', Config.SQLITE_STORAGE_MODE)
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"未知的存储模式: {mode}")
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if mode == 'concurrent' and not _is_sqlite_file(uri):
+        print("⚠️ 并发存储模式只适用于 SQLite 数据库文件，使用默认设置")
+        mode = 'default'
+
+    if mode == 'concurrent':
+        # 写连接池只有一个连接，写入排队等待（最多 SQLITE_WRITER_TIMEOUT 秒）
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        options.update(pool_size=1, max_overflow=0, pool_timeout=Config.SQLITE_WRITER_TIMEOUT)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[READER_BIND] = {'url': uri, 'pool_size': Config.SQLITE_READER_POOL_SIZE,
+                              'max_overflow': Config.SQLITE_READER_POOL_SIZE}
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+    db.init_app(app)
+    if mode == 'concurrent':
+        with app.app_context():
+            event.listen(db.engine, 'connect', _set_pragmas(Config.SQLITE_PRAGMAS))
+            reader_pragmas = {name: value for name, value in Config.SQLITE_PRAGMAS.items()
+                              if name not in WRITE_PRAGMAS}
+            reader_pragmas['query_only'] = 'ON'
+            event.listen(db.engines[READER_BIND], 'connect', _set_pragmas(reader_pragmas))
+            # 先打开写连接切换到 WAL（持久设置），之后打开的读连接都在 WAL 模式下
+            with db.engine.connect():
+                pass
+        print(f"✅ SQLite 并发存储模式: WAL, 读连接池 {Config.SQLITE_READER_POOL_SIZE} 个连接, 单一写连接")
+    app.extensions['storage_mode'] = mode
+    return mode
@@ -0,0 +1,105 @@
+"""
+系统统计信息缓存
+
+在内存中保存 get_system_stats() 的结果，页面模板、/api/stats 和 /system_status 直接读取，不查询数据库。
+播放和评分写入后按增量更新播放总数、评分总数和平均分；其余字段（歌曲数、用户数、有评分的歌曲数）
+以及增量可能带来的误差，在超过 Config.SYSTEM_STATS_TTL 秒后由后台线程重新统计修正，刷新期间继续返回旧值。
+返回的统计中 updated_at/age_seconds/stale 表示数据库统计的时间和是否已过期。
+"""
+import time
+import threading
+from datetime import datetime
+from config import Config
+from database.background import BackgroundRefresher
+
+EMPTY_STATS = {
+    'total_songs': 0,
+    'total_users': 0,
+    'total_ratings': 0,
+    'total_plays': 0,
+    'rated_songs': 0,
+    'rating_sum': 0.0,
+    'avg_system_rating': 0.0,
+    'top_rated_song': None,
+    'most_played_song': None,
+}
+
+
+def _song_summary(rows):
+    """榜单快照的第一行转为可直接序列化为JSON的字典"""
+    if not rows:
+        return None
+    song = rows[0]
+    return {
+        'id': song.id,
+        'title': song.title,
+        'artist': song.artist,
+        'avg_rating': float(song.avg_rating or 0.0),
+        'play_count': song.play_count or 0,
+    }
+
+
+class SystemStats:
+    """系统统计信息缓存（线程安全）"""
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.SYSTEM_STATS_TTL if ttl is None else ttl
+        self._stats = None          # 整体替换，读取方不修改
+        self.updated_at = None
+        self._refresher = BackgroundRefresher('system-stats', '系统统计')
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def refresh(self):
+        """同步重新统计（一次聚合查询），失败时保留旧值"""
+        from database.db_operations import get_system_stats
+        from recommender.popularity_snapshot import popularity_snapshot
+        with self._build_lock:
+            stats = get_system_stats()
+            if stats is None:
+                return False
+            stats['top_rated_song'] = _song_summary(popularity_snapshot.get('high_rated', 1))
+            stats['most_played_song'] = _song_summary(popularity_snapshot.get('popular', 1))
+            with self._lock:
+                self._stats = stats
+                self.updated_at = time.time()
+            return True
+
+    def get(self):
+        """返回统计信息字典（含 updated_at/age_seconds/stale）"""
+        if self._stats is None:
+            self.refresh()
+        elif time.time() - self.updated_at >= self.ttl:
+            self._refresher.trigger(self.refresh)
+
+        with self._lock:
+            stats = dict(self._stats or EMPTY_STATS)
+            updated_at = self.updated_at
+        age = time.time() - updated_at if updated_at else None
+        stats['updated_at'] = datetime.utcfromtimestamp(updated_at).isoformat() + 'Z' if updated_at else None
+        stats['age_seconds'] = round(age, 1) if age is not None else None
+        stats['stale'] = age is None or age >= self.ttl
+        return stats
+
+    def _apply(self, **deltas):
+        with self._lock:
+            if self._stats is None:
+                return
+            stats = dict(self._stats)
+            for key, delta in deltas.items():
+                stats[key] += delta
+            stats['avg_system_rating'] = (round(stats['rating_sum'] / stats['total_ratings'], 1)
+                                          if stats['total_ratings'] > 0 else 0.0)
+            self._stats = stats
+
+    def note_plays(self, count):
+        """记录新增的播放次数"""
+        self._apply(total_plays=count)
+
+    def note_rating(self, delta_sum, delta_count):
+        """记录评分变化：新增 (rating, 1)，修改 (新-旧, 0)，删除 (-rating, -1)"""
+        self._apply(rating_sum=delta_sum, total_ratings=delta_count)
+
+
+# 全进程共享的系统统计缓存
+system_stats = SystemStats()
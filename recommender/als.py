@@ -0,0 +1,230 @@
+"""
+隐式反馈矩阵分解（Implicit ALS, Hu/Koren/Volinsky 2008）
+
+置信度 c_ui = 1 + alpha * w_ui，w_ui 由播放次数、播放时长和评分共同决定；
+偏好 p_ui = 1（有交互）或 0（无交互）。每轮交替求解用户向量和歌曲向量，
+同一侧的行按交互数分批、补齐后用批量矩阵乘法构造方程组并用 np.linalg.solve 一次求解，
+多个批次在线程池中并行。
+
+交互矩阵、用户向量、歌曲向量和近似索引保存在一个 ALSModelState 中一起替换；过期后在后台重新训练
+（见 FittedRecommender）。在线训练只用 Config.ALS_WORKERS 个线程，并把BLAS库限制为
+Config.ALS_BLAS_THREADS 个线程（安装了 threadpoolctl 时），不和请求线程争抢CPU。
+"""
+import os
+import time
+import numpy as np
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from scipy import sparse
+from typing import List, Dict, Any, Tuple
+from config import Config
+from recommender.base_recommender import FittedRecommender
+from recommender.interactions import InteractionMatrix, load_interactions, top_n_indices
+from recommender.ann_index import IVFIndex
+
+try:
+    from threadpoolctl import threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except ImportError:
+    THREADPOOLCTL_AVAILABLE = False
+
+# 矩阵分解模型的一个版本（整体替换，不修改）
+ALSModelState = namedtuple('ALSModelState', 'interactions user_factors item_factors index')
+
+
+def confidence_weights(data: Dict[str, np.ndarray]):
+    """交互强度：log(1+播放次数) + log(1+播放分钟数) + 评分高于2.5分的部分"""
+    rating_w = np.clip(data['ratings'] - 2.5, 0.0, None)
+    play_w = np.log1p(data['play_counts']) + np.log1p(data['play_durations'] / 60.0)
+    return rating_w, play_w
+
+
+def _degree_batches(indptr: np.ndarray, budget: int) -> List[np.ndarray]:
+    """把非空行按交互数排序后分批，同一批补齐到相同长度，每批 行数×长度 不超过budget"""
+    counts = np.diff(indptr)
+    order = np.flatnonzero(counts)
+    order = order[np.argsort(counts[order], kind='stable')]
+
+    batches, start = [], 0
+    while start < len(order):
+        # 行已按长度升序排列，批内最长的行在末尾
+        end = start + 1
+        while end < len(order) and (end - start + 1) * counts[order[end]] <= budget:
+            end += 1
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+def _solve_batch(conf: sparse.csr_matrix, factors: np.ndarray, gram: np.ndarray,
+                 rows: np.ndarray) -> np.ndarray:
+    """批量求解 (YᵀY + Yᵀ(C_u - I)Y + λI) x_u = Yᵀ C_u p_u"""
+    starts = conf.indptr[rows]
+    counts = conf.indptr[rows + 1] - starts
+    width = int(counts.max())
+
+    # 补齐为 (批大小, 最大长度) 的下标矩阵，补齐位置权重为0
+    offsets = np.arange(width)
+    mask = offsets[None, :] < counts[:, None]
+    positions = np.where(mask, starts[:, None] + offsets[None, :], 0)
+    weights = np.where(mask, conf.data[positions], 0.0).astype(np.float32)
+
+    items = factors[conf.indices[positions]]                     # (B, L, f)
+    lhs = np.matmul(items.transpose(0, 2, 1) * weights[:, None, :], items) + gram
+    rhs = np.matmul(((1.0 + weights) * mask)[:, None, :], items)[:, 0, :]
+    return np.linalg.solve(lhs, rhs[..., None])[..., 0]
+
+
+def als_half_step(conf: sparse.csr_matrix, factors: np.ndarray, regularization: float,
+                  executor: ThreadPoolExecutor, budget: int = 65536) -> np.ndarray:
+    """固定一侧向量，求解另一侧全部向量（没有交互的行保持为0向量）"""
+    n_factors = factors.shape[1]
+    gram = (factors.T @ factors + regularization * np.eye(n_factors)).astype(np.float32)
+    out = np.zeros((conf.shape[0], n_factors), dtype=np.float32)
+
+    batches = _degree_batches(conf.indptr, budget)
+    solved = executor.map(lambda rows: _solve_batch(conf, factors, gram, rows), batches)
+    for rows, values in zip(batches, solved):
+        out[rows] = values
+    return out
+
+
+def _blas_limit(threads):
+    """限制BLAS库线程数的上下文（未安装 threadpoolctl 或 threads 为 None 时不限制）"""
+    if threads is None or not THREADPOOLCTL_AVAILABLE:
+        return nullcontext()
+    return threadpool_limits(limits=threads, user_api='blas')
+
+
+class ImplicitALSRecommender(FittedRecommender):
+    """隐式反馈ALS矩阵分解推荐"""
+
+    refit_name = 'als'
+
+    def __init__(self, top_n=10, factors=None, iterations=None, regularization=None,
+                 alpha=None, workers=None, blas_threads=None):
+        super().__init__(top_n=top_n)
+        self.factors = factors or Config.ALS_FACTORS
+        self.iterations = iterations or Config.ALS_ITERATIONS
+        self.regularization = Config.ALS_REGULARIZATION if regularization is None else regularization
+        self.alpha = Config.ALS_ALPHA if alpha is None else alpha
+        self.workers = workers or Config.ALS_WORKERS or os.cpu_count() or 1
+        self.blas_threads = Config.ALS_BLAS_THREADS if blas_threads is None else blas_threads
+
+    # 单独读取某一项时使用；需要同时读取多项时应先取一次 self.state
+    @property
+    def interactions(self):
+        return self.state.interactions if self.state is not None else None
+
+    @property
+    def user_factors(self):
+        return self.state.user_factors if self.state is not None else None
+
+    @property
+    def item_factors(self):
+        return self.state.item_factors if self.state is not None else None
+
+    @property
+    def index(self):
+        return self.state.index if self.state is not None else None
+
+    def fit(self, user_id=None, **kwargs):
+        """从数据库读取交互数据并训练"""
+        try:
+            start = time.time()
+            interactions = InteractionMatrix.from_data(load_interactions(), weights=confidence_weights)
+            self.fit_matrix(interactions)
+            print(f"🔧 ImplicitALSRecommender.fit() - {interactions.shape[0]}用户 × "
+                  f"{interactions.shape[1]}歌曲, 耗时 {time.time() - start:.2f}s")
+            return True
+        except Exception as e:
+            print(f"❌ ImplicitALSRecommender训练错误: {e}")
+            return False
+
+    def fit_matrix(self, interactions: InteractionMatrix, seed: int = 42, workers: int = None):
+        """在给定交互矩阵上训练（workers 为求解线程数，默认 self.workers）"""
+        # 矩阵中存放 c_ui - 1 = alpha * w_ui
+        user_conf = (interactions.matrix * self.alpha).astype(np.float32).tocsr()
+        item_conf = user_conf.T.tocsr()
+        n_users, n_items = user_conf.shape
+
+        rng = np.random.default_rng(seed)
+        user_factors = np.zeros((n_users, self.factors), dtype=np.float32)
+        item_factors = (rng.standard_normal((n_items, self.factors)) * 0.01).astype(np.float32)
+
+        with _blas_limit(self.blas_threads), \
+                ThreadPoolExecutor(max_workers=workers or self.workers) as executor:
+            for _ in range(self.iterations):
+                user_factors = als_half_step(user_conf, item_factors, self.regularization, executor)
+                item_factors = als_half_step(item_conf, user_factors, self.regularization, executor)
+
+            index = None
+            if n_items >= Config.ANN_MIN_ITEMS:
+                index = IVFIndex().build(interactions.song_ids, item_factors)
+
+        # 一次赋值替换，保证并发请求读到的是同一版本的模型
+        self._publish(ALSModelState(interactions, user_factors, item_factors, index))
+        return self
+
+    @staticmethod
+    def _score(state, user_id):
+        interactions, user_factors, item_factors, _ = state
+        idx = interactions.user_index.get(int(user_id))
+        if idx is None:
+            return None
+        scores = item_factors @ user_factors[idx]
+        scores[interactions.seen_columns(user_id)] = -np.inf
+        return scores
+
+    def score_user(self, user_id: int):
+        """用户向量 × 歌曲矩阵，得到对全部歌曲的得分"""
+        state = self.state
+        if state is None:
+            return None
+        return self._score(state, user_id)
+
+    def recommend_ids(self, user_id: int, n: int = None) -> List[Tuple[int, float]]:
+        """返回 [(song_id, score), ...]，不访问数据库"""
+        n = n or self.top_n
+        state = self.state
+        if state is None:
+            return []
+        interactions, user_factors, _, index = state
+        if index is not None:
+            idx = interactions.user_index.get(int(user_id))
+            if idx is None:
+                return []
+            seen = interactions.song_ids[interactions.seen_columns(user_id)]
+            ids, scores = index.search(user_factors[idx], n, exclude=seen)
+            return [(int(i), float(s)) for i, s in zip(ids, scores) if s > 0]
+
+        scores = self._score(state, user_id)
+        if scores is None:
+            return []
+        top = top_n_indices(scores, n)
+        top = top[np.isfinite(scores[top]) & (scores[top] > 0)]
+        song_ids = interactions.song_ids
+        return [(int(song_ids[i]), float(scores[i])) for i in top]
+
+    def recommend(self, user_id=None, **kwargs) -> List[Dict[str, Any]]:
+        """生成推荐"""
+        if user_id is None or not self.ensure_fitted():
+            return []
+
+        ranked = self.recommend_ids(user_id, self.top_n)
+        if not ranked:
+            return []
+
+        from database.db_operations import get_song_summaries
+        songs_by_id = get_song_summaries([song_id for song_id, _ in ranked])
+        songs, scores = [], []
+        for song_id, score in ranked:
+            if song_id in songs_by_id:
+                songs.append(songs_by_id[song_id])
+                scores.append(score)
+        return self.format_recommendations(songs, scores)
+
+
+# 各推荐器共享的矩阵分解模型
+als_model = ImplicitALSRecommender(top_n=50)
@@ -0,0 +1,147 @@
+"""
+近似最近邻索引（IVF 倒排文件，纯NumPy实现）
+
+build() 用 k-means 把向量划分为 n_lists 个簇，向量按簇连续存放；
+search() 只扫描与查询最接近的 n_probe 个簇。n_probe 越大召回率越高、延迟越大，
+n_probe = n_lists 时等价于精确搜索。
+add() 支持增量插入：新向量分配到最近的簇，先放在待合并区，积累到一定数量后再并入主存储。
+"""
+import threading
+import numpy as np
+from typing import Tuple
+from config import Config
+
+
+def kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10,
+           seed: int = 42, batch_size: int = 65536) -> np.ndarray:
+    """简单的 Lloyd k-means，返回簇中心"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign_nearest(vectors, centroids, batch_size)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            # 空簇重新随机选点
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def assign_nearest(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    """按L2距离分配到最近的簇中心"""
+    half_norms = 0.5 * np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start:start + batch_size]
+        labels[start:start + batch_size] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+class IVFIndex:
+    """基于内积打分的IVF近似最近邻索引"""
+
+    def __init__(self, n_lists=None, n_probe=None, kmeans_iterations=10,
+                 train_sample=None, merge_threshold=None):
+        self.n_lists = n_lists
+        self.n_probe = n_probe or Config.ANN_N_PROBE
+        self.kmeans_iterations = kmeans_iterations
+        self.train_sample = train_sample or Config.ANN_TRAIN_SAMPLE
+        self.merge_threshold = merge_threshold or Config.ANN_MERGE_THRESHOLD
+
+        self.centroids = None
+        self._ids = None          # 按簇排序后的ID
+        self._vectors = None      # 按簇排序后的向量
+        self._offsets = None      # 第c个簇位于 [offsets[c], offsets[c+1])
+        self._pending_ids = []
+        self._pending_vectors = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        main = 0 if self._ids is None else len(self._ids)
+        return main + sum(len(ids) for ids in self._pending_ids)
+
+    def build(self, ids, vectors: np.ndarray, seed: int = 42):
+        """训练簇中心并建立索引"""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors)) * Config.ANN_LISTS_FACTOR))
+
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > self.train_sample:
+            sample = vectors[rng.choice(len(vectors), self.train_sample, replace=False)]
+        centroids = kmeans(sample, n_lists, self.kmeans_iterations, seed)
+
+        with self._lock:
+            self.centroids = centroids
+            self._pending_ids, self._pending_vectors = [], []
+            self._store(ids, vectors, assign_nearest(vectors, centroids))
+        return self
+
+    def _store(self, ids, vectors, labels):
+        order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=len(self.centroids))
+        self._ids = ids[order]
+        self._vectors = vectors[order]
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def add(self, ids, vectors: np.ndarray):
+        """增量插入；待合并区超过阈值时并入主存储"""
+        if self.centroids is None:
+            return self.build(ids, vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._pending_ids.append(ids)
+            self._pending_vectors.append(vectors)
+            if sum(len(p) for p in self._pending_ids) >= self.merge_threshold:
+                self._merge_pending()
+        return self
+
+    def _merge_pending(self):
+        ids = np.concatenate([self._ids] + self._pending_ids)
+        vectors = np.vstack([self._vectors] + self._pending_vectors)
+        labels = assign_nearest(vectors, self.centroids)
+        self._pending_ids, self._pending_vectors = [], []
+        self._store(ids, vectors, labels)
+
+    def search(self, query: np.ndarray, k: int, n_probe=None, exclude=None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回内积最大的k个 (ids, scores)，exclude 为需要排除的ID集合"""
+        if self.centroids is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+
+        with self._lock:
+            ids, vectors, offsets = self._ids, self._vectors, self._offsets
+            pending_ids, pending_vectors = list(self._pending_ids), list(self._pending_vectors)
+
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        cand_ids = [ids[offsets[c]:offsets[c + 1]] for c in probes] + pending_ids
+        cand_scores = [vectors[offsets[c]:offsets[c + 1]] @ query for c in probes] + \
+            [v @ query for v in pending_vectors]
+        cand_ids = np.concatenate(cand_ids) if cand_ids else np.empty(0, dtype=np.int64)
+        cand_scores = np.concatenate(cand_scores) if cand_scores else np.empty(0, dtype=np.float32)
+
+        if exclude is not None and len(exclude):
+            keep = ~np.isin(cand_ids, np.asarray(list(exclude), dtype=np.int64))
+            cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+
+        k = min(k, len(cand_ids))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-cand_scores, k - 1)[:k]
+        top = top[np.argsort(-cand_scores[top], kind='stable')]
+        return cand_ids[top], cand_scores[top]
+
+    def search_exact(self, query: np.ndarray, k: int, exclude=None) -> Tuple[np.ndarray, np.ndarray]:
+        """扫描全部簇的精确搜索（用于评估召回率）"""
+        return self.search(query, k, n_probe=len(self.centroids), exclude=exclude)
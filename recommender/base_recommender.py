@@ -1,10 +1,18 @@
 """
 基础推荐类
 """
+import time
+import threading
 from abc import ABC, abstractmethod
 import numpy as np
 from typing import List, Dict, Any
+from config import Config
 from database.models import Song
+from database.song_fields import song_to_dict
+from database.background import BackgroundRefresher
+
+# 推荐结果中歌曲的字段（见 database.song_fields）
+RECOMMENDATION_FIELDS = ('id', 'title', 'artist', 'album', 'genre', 'duration', 'play_count', 'avg_rating')
 
 class BaseRecommender(ABC):
     """推荐算法的基类"""
@@ -41,24 +49,15 @@ class BaseRecommender(ABC):
         return filtered
     
     def format_recommendations(self, songs: List[Song], scores: List[float] = None) -> List[Dict[str, Any]]:
-        """格式化推荐结果"""
+        """格式化推荐结果（songs 可以是 get_song_summaries 返回的投影行）"""
         recommendations = []
         
         for i, song in enumerate(songs):
             if i >= self.top_n:
                 break
                 
-            rec = {
-                'id': song.id,
-                'title': song.title,
-                'artist': song.artist,
-                'album': song.album,
-                'genre': song.genre,
-                'duration': song.duration,
-                'play_count': song.play_count,
-                'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0,
-                'score': float(scores[i]) if scores else 1.0 - (i * 0.01)
-            }
+            rec = song_to_dict(song, RECOMMENDATION_FIELDS)
+            rec['score'] = float(scores[i]) if scores else 1.0 - (i * 0.01)
             recommendations.append(rec)
         
         return recommendations
@@ -82,4 +81,58 @@ class BaseRecommender(ABC):
     def time_decay_factor(self, days_ago: float, half_life: float = 30.0) -> float:
         """计算时间衰减因子"""
         import math
-        return math.exp(-math.log(2) * days_ago / half_life)
\ No newline at end of file
+        return math.exp(-math.log(2) * days_ago / half_life)
+
+
+class FittedRecommender(BaseRecommender):
+    """训练后常驻内存的模型（协同过滤、矩阵分解、内容推荐）
+
+    模型状态保存在一个不可变的 self.state 中（namedtuple），fit() 构建完新状态后由 _publish 一次赋值替换；
+    读取方先取一次 self.state，之后只用这一份，不会读到一半新一半旧的模型。
+    只有第一次训练同步进行；过期后由一个后台线程重新训练（同一时间最多一个），期间请求继续使用旧状态。
+    """
+
+    refit_name = 'model'  # 后台训练线程名
+
+    def __init__(self, top_n=10):
+        super().__init__(top_n=top_n)
+        self.state = None
+        self.fitted_at = None
+        self._fit_lock = threading.Lock()
+        self._refresher = BackgroundRefresher(f'{self.refit_name}-refit', f'{self.__class__.__name__}训练')
+
+    @property
+    def is_fitted(self):
+        return self.state is not None
+
+    @property
+    def is_refitting(self):
+        return self._refresher.is_running
+
+    def _publish(self, state):
+        """替换模型状态（先记时间，读取方看到新状态时 fitted_at 一定已经更新）"""
+        self.fitted_at = time.time()
+        self.state = state
+
+    def _is_fresh(self, max_age):
+        return self.is_fitted and time.time() - self.fitted_at < max_age
+
+    def _refit(self, max_age):
+        with self._fit_lock:
+            return self._is_fresh(max_age) or self.fit()
+
+    def ensure_fitted(self, max_age=None, wait=True):
+        """返回模型是否可用
+
+        已训练时总是立即返回 True，过期则触发后台重新训练；
+        从未训练时 wait=True 同步训练，wait=False 在后台开始训练并返回 False（线程池中的任务使用）。
+        """
+        max_age = Config.MODEL_REFRESH_SECONDS if max_age is None else max_age
+        if self.is_fitted:
+            if not self._is_fresh(max_age):
+                self._refresher.trigger(self._refit, max_age)
+            return True
+        if not wait:
+            self._refresher.trigger(self._refit, max_age)
+            return False
+        return self._refit(max_age)
@@ -0,0 +1,177 @@
+"""
+离线批量预计算推荐
+
+为每个有交互记录的用户一次性生成协同过滤、矩阵分解和内容推荐列表，写入 user_recommendations 表，
+Web 请求按主键读取，只有新用户才走实时计算。
+
+得分按用户分块计算（一块用户一次矩阵乘法），用户按下标区间切分后交给进程池；
+子进程通过 fork 继承父进程中已训练好的模型，只做纯NumPy计算，结果由父进程统一写库。
+不支持 fork 的平台（如 Windows）在当前进程内串行执行。
+"""
+import os
+import time
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from config import Config
+from recommender.interactions import InteractionMatrix, load_interactions, default_weights, top_n_rows
+
+PRECOMPUTED_TYPES = ('collaborative', 'als', 'content')
+
+# rec_type -> (user_ids, song_ids, score_block)；在fork之前设置，子进程直接继承
+_SCORERS = {}
+
+
+def _mask_seen(scores, seen_block, columns=None):
+    """把已交互的歌曲得分置为 -inf"""
+    rows, cols = seen_block.nonzero()
+    if columns is not None:
+        cols = columns[cols]
+    scores[rows, cols] = -np.inf
+    return scores
+
+
+def collaborative_scorer(model):
+    """物品协同过滤：X[块] · W"""
+    interactions, neighbors = model.state
+    matrix = interactions.matrix
+
+    def score_block(start, end):
+        block = matrix[start:end]
+        scores = (block @ neighbors).toarray()
+        return _mask_seen(scores, block)
+
+    return interactions.user_ids, interactions.song_ids, score_block
+
+
+def als_scorer(model):
+    """矩阵分解：U[块] · Vᵀ"""
+    interactions, user_factors, item_factors, _ = model.state
+    matrix = interactions.matrix
+
+    def score_block(start, end):
+        scores = user_factors[start:end] @ item_factors.T
+        return _mask_seen(scores, matrix[start:end])
+
+    return interactions.user_ids, interactions.song_ids, score_block
+
+
+def content_scorer(model, data):
+    """内容推荐：用户画像 = 交互权重 · 歌曲特征，得分 = 画像 · 特征ᵀ"""
+    weights = InteractionMatrix.from_data(data, weights=default_weights)
+
+    # 交互矩阵的列映射到内容模型的特征行，丢弃不在曲库中的歌曲（映射和特征取自同一版本的模型状态）
+    state = model.state
+    columns = np.array([state.song_index.get(int(sid), -1) for sid in weights.song_ids], dtype=np.int64)
+    keep = columns >= 0
+    matrix = weights.matrix[:, np.flatnonzero(keep)].tocsr()
+    columns = columns[keep]
+    features = state.features
+    history_features = features[columns]
+
+    def score_block(start, end):
+        block = matrix[start:end]
+        profiles = np.asarray(block @ history_features, dtype=np.float32)
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        np.divide(profiles, norms, out=profiles, where=norms > 0)
+        scores = profiles @ features.T
+        return _mask_seen(scores, block, columns)
+
+    return weights.user_ids, state.song_ids, score_block
+
+
+def _score_range(rec_type, start, end, top_n, block_size):
+    """在 [start, end) 用户下标区间内分块打分，返回 (用户ID, 歌曲ID矩阵, 得分矩阵)"""
+    user_ids, song_ids, score_block = _SCORERS[rec_type]
+    ids, scores = [], []
+    for block_start in range(start, end, block_size):
+        block_end = min(block_start + block_size, end)
+        top, top_scores = top_n_rows(score_block(block_start, block_end), top_n)
+        ids.append(song_ids[top])
+        scores.append(top_scores.astype(np.float32))
+    return user_ids[start:end], np.vstack(ids), np.vstack(scores)
+
+
+def _user_ranges(n_users, parts):
+    """把用户下标切成 parts 段连续区间"""
+    bounds = np.linspace(0, n_users, parts + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _save(rec_type, results, generated_at):
+    """整体替换某种算法的预计算结果（一个事务）"""
+    from database.models import db, UserRecommendation
+    table = UserRecommendation.__table__
+
+    rows = []
+    for user_ids, ids, scores in results:
+        for user_id, song_row, score_row in zip(user_ids, ids, scores):
+            valid = np.isfinite(score_row) & (score_row > 0)
+            if not valid.any():
+                continue
+            rows.append({
+                'user_id': int(user_id),
+                'rec_type': rec_type,
+                'items': [[int(s), round(float(v), 6)] for s, v in zip(song_row[valid], score_row[valid])],
+                'generated_at': generated_at,
+            })
+
+    db.session.execute(table.delete().where(table.c.rec_type == rec_type))
+    for start in range(0, len(rows), 5000):
+        db.session.execute(table.insert(), rows[start:start + 5000])
+    db.session.commit()
+    return len(rows)
+
+
+def precompute_recommendations(rec_types=PRECOMPUTED_TYPES, top_n=None, workers=None, block_size=None):
+    """训练模型并为全部用户预计算推荐（需要在应用上下文中调用），返回写入的行数"""
+    from database.models import db, UserRecommendation
+    from recommender.collaborative import item_cf
+    from recommender.als import als_model, confidence_weights
+    from recommender.content_based import content_model
+
+    top_n = top_n or Config.PRECOMPUTE_TOP_N
+    block_size = block_size or Config.PRECOMPUTE_BLOCK_SIZE
+    workers = workers or Config.PRECOMPUTE_WORKERS or os.cpu_count() or 1
+    UserRecommendation.__table__.create(db.engine, checkfirst=True)
+
+    start = time.time()
+    data = load_interactions()
+    _SCORERS.clear()
+    if 'collaborative' in rec_types:
+        item_cf.fit_matrix(InteractionMatrix.from_data(data))
+        _SCORERS['collaborative'] = collaborative_scorer(item_cf)
+    if 'als' in rec_types:
+        als_model.fit_matrix(InteractionMatrix.from_data(data, weights=confidence_weights), workers=workers)
+        _SCORERS['als'] = als_scorer(als_model)
+    if 'content' in rec_types and content_model.fit():
+        _SCORERS['content'] = content_scorer(content_model, data)
+    print(f"🔧 预计算: 模型训练完成, 耗时 {time.time() - start:.2f}s")
+
+    use_pool = workers > 1 and 'fork' in multiprocessing.get_all_start_methods()
+    executor = None
+    if use_pool:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+
+    total = 0
+    generated_at = datetime.utcnow()
+    try:
+        for rec_type, (user_ids, _, _) in _SCORERS.items():
+            type_start = time.time()
+            ranges = _user_ranges(len(user_ids), workers * 4 if use_pool else 1)
+            if executor is not None:
+                futures = [executor.submit(_score_range, rec_type, a, b, top_n, block_size) for a, b in ranges]
+                results = [future.result() for future in futures]
+            else:
+                results = [_score_range(rec_type, a, b, top_n, block_size) for a, b in ranges]
+            count = _save(rec_type, results, generated_at)
+            total += count
+            print(f"✅ 预计算 {rec_type}: {count}个用户, 耗时 {time.time() - type_start:.2f}s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        _SCORERS.clear()
+
+    print(f"🎉 预计算完成: 共写入{total}条推荐列表, 总耗时 {time.time() - start:.2f}s")
+    return total
@@ -0,0 +1,207 @@
+"""
+混合推荐的候选生成器
+
+每个候选来源是一个 CandidateSource，在共享线程池中并行执行，各有自己的截止时间，
+整次请求不超过 Config.HYBRID_LATENCY_BUDGET。超时或出错的来源改用该来源最近一次成功的结果
+（没有则丢弃）。超时的任务无法中断，会在后台跑完，并用其结果刷新后备缓存。
+各来源的耗时和超时次数记录在 source_timings 中。
+"""
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import numpy as np
+from config import Config
+
+
+class CandidateSource:
+    """候选来源基类：generate() 在线程池中执行（已进入应用上下文）"""
+
+    name = 'base'
+    needs_activity = False  # 是否需要用户活动快照
+
+    def __init__(self, deadline=None, cache_size=10000):
+        self.deadline = deadline or Config.HYBRID_SOURCE_DEADLINES.get(self.name, Config.HYBRID_LATENCY_BUDGET)
+        self.cache_size = cache_size
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_key(self, user_id, top_n):
+        return user_id, top_n
+
+    def generate(self, user_id, top_n, activity):
+        raise NotImplementedError
+
+    def run(self, user_id, top_n, activity):
+        """生成结果并记为该来源的后备结果"""
+        result = self.generate(user_id, top_n, activity)
+        if result:
+            key = self.cache_key(user_id, top_n)
+            with self._lock:
+                self._last[key] = result
+                self._last.move_to_end(key)
+                while len(self._last) > self.cache_size:
+                    self._last.popitem(last=False)
+        return result
+
+    def fallback(self, user_id, top_n):
+        """超时或出错时的替代结果，None 表示丢弃该来源"""
+        with self._lock:
+            return self._last.get(self.cache_key(user_id, top_n))
+
+
+class ChartSource(CandidateSource):
+    """热门/高评分/新歌榜单（内存快照），与用户无关"""
+
+    name = 'charts'
+
+    def cache_key(self, user_id, top_n):
+        return top_n
+
+    def generate(self, user_id, top_n, activity):
+        from recommender.popularity_snapshot import popularity_snapshot
+        return {
+            'popular': popularity_snapshot.get('popular', top_n * 3),
+            'high_rated': popularity_snapshot.get('high_rated', top_n),
+            'new': popularity_snapshot.get('new', top_n),
+        }
+
+
+class ModelSource(CandidateSource):
+    """基于模型的来源：优先用离线预计算列表，没有时用内存中的模型实时计算，返回 [(song_id, score)]
+
+    预计算列表在播放/评分后不删除（保留到下一次离线批量计算），读取时去掉用户此后播放或评分过的歌曲；
+    去掉后不足 top_n 首（而原列表足够）时才改用实时计算。
+    模型的训练和重新训练都在模型自己的后台线程中进行（见 FittedRecommender），不占用候选线程池。
+    """
+
+    needs_activity = True
+
+    def __init__(self, name, model, deadline=None):
+        self.name = name
+        self.model = model
+        super().__init__(deadline)
+
+    def generate(self, user_id, top_n, activity):
+        ranked = activity['precomputed'].get(self.name)
+        if ranked is not None:
+            seen = activity['plays'].keys() | activity['ratings'].keys()
+            fresh = [item for item in ranked if item[0] not in seen]
+            ranked = fresh if len(fresh) >= min(top_n, len(ranked)) else None
+        if ranked is None:
+            # 线程池中的任务不训练模型：未训练时在后台开始训练，本次用该来源之前的结果
+            if not self.model.ensure_fitted(wait=False):
+                return self.fallback(user_id, top_n) or []
+            if hasattr(self.model, 'history_weights'):
+                weights = self.model.history_weights(activity['plays'].items(), activity['ratings'].items())
+                ranked = self.model.recommend_ids(user_id, top_n, weighted_songs=weights)
+            else:
+                ranked = self.model.recommend_ids(user_id, top_n)
+        return (ranked or [])[:top_n]
+
+
+class SourceTimings:
+    """各来源最近若干次的耗时（毫秒）与超时/错误次数"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._latencies = {}
+        self._timeouts = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed_ms):
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=self.window)).append(elapsed_ms)
+
+    def record_timeout(self, name):
+        with self._lock:
+            self._timeouts[name] = self._timeouts.get(name, 0) + 1
+
+    def record_error(self, name):
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for name in set(self._latencies) | set(self._timeouts) | set(self._errors):
+                arr = np.fromiter(self._latencies.get(name, ()), dtype=np.float64)
+                entry = {
+                    'count': len(arr),
+                    'timeouts': self._timeouts.get(name, 0),
+                    'errors': self._errors.get(name, 0),
+                }
+                if len(arr):
+                    entry.update({
+                        'p50_ms': round(float(np.percentile(arr, 50)), 2),
+                        'p95_ms': round(float(np.percentile(arr, 95)), 2),
+                        'p99_ms': round(float(np.percentile(arr, 99)), 2),
+                        'max_ms': round(float(arr.max()), 2),
+                    })
+                result[name] = entry
+            return result
+
+
+source_timings = SourceTimings()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.HYBRID_WORKERS,
+                                               thread_name_prefix='candidates')
+    return _executor
+
+
+def run_sources(sources, user_id, top_n, load_activity=None, budget=None):
+    """并行执行各来源，返回 {name: 结果}；超时或出错的来源取 fallback()，仍为None则不出现在结果中
+
+    不依赖用户数据的来源先提交，随后在当前线程读取用户活动快照，再提交依赖它的来源，
+    线程池中的任务之间没有相互等待。
+    """
+    from flask import current_app
+    app = current_app._get_current_object()
+    budget = Config.HYBRID_LATENCY_BUDGET if budget is None else budget
+    started = time.perf_counter()
+    executor = _get_executor()
+
+    def timed(source, activity):
+        start = time.perf_counter()
+        with app.app_context():
+            try:
+                return source.run(user_id, top_n, activity)
+            finally:
+                source_timings.record(source.name, (time.perf_counter() - start) * 1000)
+
+    futures = [(source, executor.submit(timed, source, None))
+               for source in sources if not source.needs_activity]
+
+    dependent = [source for source in sources if source.needs_activity]
+    if dependent and load_activity is not None:
+        start = time.perf_counter()
+        activity = load_activity()
+        source_timings.record('activity', (time.perf_counter() - start) * 1000)
+        futures += [(source, executor.submit(timed, source, activity)) for source in dependent]
+
+    results = {}
+    for source, future in futures:
+        remaining = started + min(source.deadline, budget) - time.perf_counter()
+        try:
+            results[source.name] = future.result(timeout=max(remaining, 0))
+            continue
+        except FutureTimeout:
+            print(f"    ⏱️ 候选来源 {source.name} 超时，使用后备结果")
+            source_timings.record_timeout(source.name)
+        except Exception as e:
+            print(f"    ❌ 候选来源 {source.name} 错误: {e}")
+            source_timings.record_error(source.name)
+        fallback = source.fallback(user_id, top_n)
+        if fallback is not None:
+            results[source.name] = fallback
+    return results
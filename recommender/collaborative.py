@@ -1,16 +1,156 @@
-﻿# recommender/collaborative.py
-
-class CollaborativeFiltering:
-    def __init__(self, top_n=10):
-        self.top_n = top_n
-    
-    def fit(self, **kwargs):
-        """训练模型"""
-        print("🔧 CollaborativeFiltering.fit()")
-        return True
-    
-    def recommend(self, user_id=None):
+# recommender/collaborative.py
+"""
+基于物品的协同过滤（Item-Item CF）
+
+fit() 从 Rating 和 PlayHistory 构建用户×歌曲稀疏矩阵，计算歌曲间余弦相似度，
+每首歌只保留最相似的K个邻居，得到稀疏邻居表 W（歌曲×歌曲）。
+recommend() 只需一次稀疏向量乘法 x_u · W 加一次 argpartition。
+
+交互矩阵和邻居表保存在一个 ItemCFState 中一起替换；过期后在后台重新训练（见 FittedRecommender）。
+"""
+import time
+import numpy as np
+from collections import namedtuple
+from scipy import sparse
+from typing import List, Dict, Any, Tuple
+from config import Config
+from recommender.base_recommender import FittedRecommender
+from recommender.interactions import InteractionMatrix, load_interactions, top_n_indices
+
+# 协同过滤模型的一个版本（整体替换，不修改）
+ItemCFState = namedtuple('ItemCFState', 'interactions neighbors')
+
+
+def build_item_neighbors(matrix: sparse.csr_matrix, k: int = 50,
+                         block_size: int = 2048) -> sparse.csr_matrix:
+    """计算剪枝后的物品相似度表：每行只保留余弦相似度最高的k个邻居（不含自身）"""
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    n_items = matrix.shape[1]
+
+    # 列归一化后，Xn^T · Xn 即为余弦相似度
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = (matrix @ sparse.diags(inv_norms.astype(np.float32))).tocsc()
+    normalized_t = normalized.T.tocsr()
+
+    rows_out, cols_out, vals_out = [], [], []
+    for start in range(0, n_items, block_size):
+        end = min(start + block_size, n_items)
+        block = (normalized_t[start:end] @ normalized).tocoo()
+
+        row, col, val = block.row, block.col, block.data
+        keep = (row + start != col) & (val > 0)
+        row, col, val = row[keep], col[keep], val[keep]
+        if len(val) == 0:
+            continue
+
+        # 每行按相似度降序排列，保留前k个
+        order = np.lexsort((-val, row))
+        row, col, val = row[order], col[order], val[order]
+        row_starts = np.searchsorted(row, np.arange(end - start))
+        rank = np.arange(len(row)) - row_starts[row]
+        keep = rank < k
+
+        rows_out.append(row[keep] + start)
+        cols_out.append(col[keep])
+        vals_out.append(val[keep])
+
+    if not vals_out:
+        return sparse.csr_matrix((n_items, n_items), dtype=np.float32)
+
+    return sparse.csr_matrix(
+        (np.concatenate(vals_out), (np.concatenate(rows_out), np.concatenate(cols_out))),
+        shape=(n_items, n_items), dtype=np.float32
+    )
+
+
+class CollaborativeFiltering(FittedRecommender):
+    """基于物品的协同过滤推荐"""
+
+    refit_name = 'item-cf'
+
+    def __init__(self, top_n=10, k_neighbors=None):
+        super().__init__(top_n=top_n)
+        self.k_neighbors = k_neighbors or Config.ITEM_NEIGHBORS
+
+    # 单独读取某一项时使用；需要同时读取多项时应先取一次 self.state
+    @property
+    def interactions(self):
+        return self.state.interactions if self.state is not None else None
+
+    @property
+    def neighbors(self):
+        return self.state.neighbors if self.state is not None else None
+
+    def fit(self, user_id=None, **kwargs):
+        """从数据库读取交互数据并训练模型"""
+        try:
+            start = time.time()
+            interactions = InteractionMatrix.from_data(load_interactions())
+            self.fit_matrix(interactions)
+            print(f"🔧 CollaborativeFiltering.fit() - {interactions.shape[0]}用户 × "
+                  f"{interactions.shape[1]}歌曲, 耗时 {time.time() - start:.2f}s")
+            return True
+        except Exception as e:
+            print(f"❌ CollaborativeFiltering训练错误: {e}")
+            return False
+
+    def fit_matrix(self, interactions: InteractionMatrix):
+        """直接使用给定的交互矩阵训练（基准测试和离线任务使用）"""
+        neighbors = build_item_neighbors(interactions.matrix, k=self.k_neighbors)
+        # 一次赋值替换，保证并发请求读到的是同一版本的模型
+        self._publish(ItemCFState(interactions, neighbors))
+        return self
+
+    @staticmethod
+    def _score(state, user_id):
+        interactions, neighbors = state
+        row = interactions.user_row(user_id)
+        if row is None or row.nnz == 0:
+            return None
+        scores = (row @ neighbors).toarray().ravel()
+        scores[interactions.seen_columns(user_id)] = -np.inf
+        return scores
+
+    def score_user(self, user_id: int):
+        """计算用户对全部歌曲的得分，未知用户返回None"""
+        state = self.state
+        if state is None:
+            return None
+        return self._score(state, user_id)
+
+    def recommend_ids(self, user_id: int, n: int = None) -> List[Tuple[int, float]]:
+        """返回 [(song_id, score), ...]，不访问数据库"""
+        n = n or self.top_n
+        state = self.state
+        if state is None:
+            return []
+        scores = self._score(state, user_id)
+        if scores is None:
+            return []
+        top = top_n_indices(scores, n)
+        top = top[scores[top] > 0]
+        song_ids = state.interactions.song_ids
+        return [(int(song_ids[i]), float(scores[i])) for i in top]
+
+    def recommend(self, user_id=None, **kwargs) -> List[Dict[str, Any]]:
         """生成推荐"""
-        print(f"🔧 CollaborativeFiltering.recommend() - 用户ID: {user_id}")
-        # 这里返回空列表，让HybridRecommender处理
-        return []
+        if user_id is None or not self.ensure_fitted():
+            return []
+
+        ranked = self.recommend_ids(user_id, self.top_n)
+        if not ranked:
+            return []
+
+        from database.db_operations import get_song_summaries
+        songs_by_id = get_song_summaries([song_id for song_id, _ in ranked])
+        songs, scores = [], []
+        for song_id, score in ranked:
+            if song_id in songs_by_id:
+                songs.append(songs_by_id[song_id])
+                scores.append(score)
+        return self.format_recommendations(songs, scores)
+
+
+# 各推荐器共享的协同过滤模型
+item_cf = CollaborativeFiltering(top_n=50)
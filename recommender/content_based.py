@@ -1,16 +1,345 @@
-﻿# recommender/content_based.py
+# recommender/content_based.py
+"""
+基于内容的推荐
+
+fit() 把每首歌的流派、艺术家、发行年份、时长以及 audio_features 中的数值字段
+编码成一行 float32 特征（各部分按权重缩放后整行L2归一化），整个曲库只构建一次。
+用户画像是其播放/评分过的歌曲特征的加权平均，推荐时对全曲库做一次矩阵-向量乘法。
+
+模型状态（编码器、歌曲ID、特征矩阵、ID到行号的映射、近似索引）保存在一个不可变的 ContentModelState 中，
+训练和增量追加新歌都先构建新的状态再一次赋值替换；读取方先取一次 self.state，之后只用这一份，
+不会出现映射已更新而特征矩阵还是旧的情况。
+过期后在后台重新训练（见 FittedRecommender），期间继续使用旧状态；训练期间 add_songs 追加的新歌
+在新状态替换时补上，不会因为训练读取的是追加之前的曲库而丢失。
+"""
+import json
+import time
+import zlib
+import threading
+import numpy as np
+from collections import namedtuple
+from typing import List, Dict, Any, Tuple
+from config import Config
+from recommender.base_recommender import FittedRecommender
+from recommender.interactions import top_n_indices
+from recommender.ann_index import IVFIndex
+
+# 内容模型的一个版本（整体替换，不修改）
+ContentModelState = namedtuple('ContentModelState', 'encoder song_ids features song_index index')
+# 编码需要的歌曲列（训练期间记下的新歌只保留这些值，与 ORM 对象和会话无关）
+SongFeatureRow = namedtuple('SongFeatureRow', 'id genre artist release_year duration audio_features')
+
+# 各类特征的权重（相对重要性）
+FEATURE_WEIGHTS = {
+    'genre': 1.0,
+    'artist': 0.8,
+    'release_year': 0.3,
+    'duration': 0.2,
+    'audio': 0.6,
+}
+
+
+def _parse_audio_features(value):
+    """audio_features 可能是dict，也可能是JSON字符串"""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+class SongFeatureEncoder:
+    """把歌曲字段编码为定长特征向量；fit后可对新歌增量编码"""
+
+    def __init__(self, artist_buckets=None):
+        self.artist_buckets = artist_buckets or Config.CONTENT_ARTIST_BUCKETS
+        self.genre_index = {}
+        self.audio_keys = []
+        self.numeric_stats = {}
+
+    @property
+    def dimension(self):
+        return len(self.genre_index) + self.artist_buckets + 2 + len(self.audio_keys)
+
+    def fit(self, rows):
+        """根据全部歌曲确定流派词表、音频字段和数值字段的均值/标准差"""
+        genres = sorted({row.genre for row in rows if row.genre})
+        self.genre_index = {genre: i for i, genre in enumerate(genres)}
+
+        audio = [_parse_audio_features(row.audio_features) for row in rows]
+        keys = set()
+        for features in audio:
+            keys.update(k for k, v in features.items()
+                        if isinstance(v, (int, float)) and not isinstance(v, bool))
+        self.audio_keys = sorted(keys)
+
+        columns = {
+            'release_year': [row.release_year for row in rows],
+            'duration': [row.duration for row in rows],
+        }
+        for key in self.audio_keys:
+            columns[key] = [features.get(key) for features in audio]
+
+        for name, values in columns.items():
+            arr = np.array([v for v in values if isinstance(v, (int, float))], dtype=np.float64)
+            mean = float(arr.mean()) if len(arr) else 0.0
+            std = float(arr.std()) if len(arr) else 1.0
+            self.numeric_stats[name] = (mean, std if std > 1e-6 else 1.0)
+        return self
+
+    def _standardize(self, name, values):
+        mean, std = self.numeric_stats[name]
+        arr = np.array([v if isinstance(v, (int, float)) else mean for v in values], dtype=np.float32)
+        return (arr - mean) / std
+
+    def transform(self, rows) -> np.ndarray:
+        """编码为 (len(rows), dimension) 的L2归一化float32矩阵"""
+        n = len(rows)
+        n_genres = len(self.genre_index)
+        features = np.zeros((n, self.dimension), dtype=np.float32)
+        row_index = np.arange(n)
+
+        genre_cols = np.array([self.genre_index.get(row.genre, -1) for row in rows], dtype=np.int64)
+        has_genre = genre_cols >= 0
+        features[row_index[has_genre], genre_cols[has_genre]] = np.sqrt(FEATURE_WEIGHTS['genre'])
+
+        # 艺术家做特征哈希，固定维度
+        artist_cols = np.array(
+            [zlib.crc32((row.artist or '').encode('utf-8')) % self.artist_buckets for row in rows],
+            dtype=np.int64
+        )
+        features[row_index, n_genres + artist_cols] = np.sqrt(FEATURE_WEIGHTS['artist'])
+
+        offset = n_genres + self.artist_buckets
+        features[:, offset] = self._standardize('release_year', [row.release_year for row in rows]) \
+            * np.sqrt(FEATURE_WEIGHTS['release_year'])
+        features[:, offset + 1] = self._standardize('duration', [row.duration for row in rows]) \
+            * np.sqrt(FEATURE_WEIGHTS['duration'])
+
+        if self.audio_keys:
+            audio = [_parse_audio_features(row.audio_features) for row in rows]
+            audio_weight = np.sqrt(FEATURE_WEIGHTS['audio'] / len(self.audio_keys))
+            for j, key in enumerate(self.audio_keys):
+                features[:, offset + 2 + j] = self._standardize(
+                    key, [a.get(key) for a in audio]) * audio_weight
+
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        np.divide(features, norms, out=features, where=norms > 0)
+        return features
+
+
+class ContentBasedRecommender(FittedRecommender):
+    """基于歌曲特征矩阵的内容推荐"""
+
+    refit_name = 'content'
 
-class ContentBasedRecommender:
     def __init__(self, top_n=10):
-        self.top_n = top_n
-    
-    def fit(self, **kwargs):
-        """训练模型"""
-        print("🔧 ContentBasedRecommender.fit()")
-        return True
-    
-    def recommend(self, user_id=None):
+        super().__init__(top_n=top_n)
+        self._pending = None        # 训练期间 add_songs 收到的歌曲行，训练完成后补上
+        self._lock = threading.Lock()
+
+    # 单独读取某一项时使用；需要同时读取多项时应先取一次 self.state
+    @property
+    def encoder(self):
+        return self.state.encoder if self.state is not None else None
+
+    @property
+    def features(self):
+        return self.state.features if self.state is not None else None
+
+    @property
+    def song_ids(self):
+        return self.state.song_ids if self.state is not None else None
+
+    @property
+    def song_index(self):
+        return self.state.song_index if self.state is not None else {}
+
+    @property
+    def index(self):
+        return self.state.index if self.state is not None else None
+
+    @staticmethod
+    def _load_song_rows(song_ids=None):
+        """只查询编码需要的列"""
+        from database.models import db, Song
+        query = db.session.query(
+            Song.id, Song.genre, Song.artist, Song.release_year, Song.duration, Song.audio_features
+        )
+        if song_ids is not None:
+            query = query.filter(Song.id.in_(song_ids))
+        return query.order_by(Song.id).all()
+
+    def fit(self, user_id=None, **kwargs):
+        """构建全曲库特征矩阵"""
+        try:
+            start = time.time()
+            with self._lock:
+                self._pending = []
+            rows = self._load_song_rows()
+            self.fit_rows(rows)
+            print(f"🔧 ContentBasedRecommender.fit() - {len(rows)}首歌曲, "
+                  f"{self.encoder.dimension}维特征, 耗时 {time.time() - start:.2f}s")
+            return True
+        except Exception as e:
+            print(f"❌ ContentBasedRecommender训练错误: {e}")
+            with self._lock:
+                self._pending = None
+            return False
+
+    def fit_rows(self, rows):
+        """在给定的歌曲行上训练（行需要有 id/genre/artist/release_year/duration/audio_features 属性）"""
+        encoder = SongFeatureEncoder().fit(rows)
+        features = encoder.transform(rows)
+        song_ids = np.array([row.id for row in rows], dtype=np.int64)
+
+        index = None
+        if len(rows) >= Config.ANN_MIN_ITEMS:
+            index = IVFIndex().build(song_ids, features)
+
+        state = ContentModelState(encoder, song_ids, features,
+                                  {int(sid): i for i, sid in enumerate(song_ids)}, index)
+        with self._lock:
+            # 补上训练期间追加的新歌（已在 rows 中的会被跳过），再一次赋值替换
+            pending, self._pending = self._pending, None
+            if pending:
+                state = self._append(state, pending)[0]
+            self._publish(state)
+        return self
+
+    @staticmethod
+    def _append(state, rows):
+        """在 state 的副本上追加新歌，返回 (新状态, 追加的歌曲数)；读者手中的旧状态保持完整有效"""
+        rows = [row for row in rows if int(row.id) not in state.song_index]
+        if not rows:
+            return state, 0
+        new_features = state.encoder.transform(rows)
+        new_ids = np.array([row.id for row in rows], dtype=np.int64)
+        offset = len(state.song_ids)
+
+        song_ids = np.concatenate([state.song_ids, new_ids])
+        features = np.vstack([state.features, new_features])
+        song_index = dict(state.song_index)
+        song_index.update({int(sid): offset + i for i, sid in enumerate(new_ids)})
+        index = state.index
+        if index is not None:
+            index.add(new_ids, new_features)  # 近似索引按ID返回结果，自带锁
+        elif len(song_ids) >= Config.ANN_MIN_ITEMS:
+            index = IVFIndex().build(song_ids, features)
+        return ContentModelState(state.encoder, song_ids, features, song_index, index), len(rows)
+
+    def add_songs(self, rows):
+        """新歌入库后增量编码并追加到特征矩阵和近似索引，无需重新训练"""
+        if not rows:
+            return 0
+        rows = [SongFeatureRow(row.id, row.genre, row.artist, row.release_year, row.duration, row.audio_features)
+                for row in rows]
+        with self._lock:
+            if self._pending is not None:  # 正在训练：训练完成后在新状态上再追加一次
+                self._pending.extend(rows)
+            if self.state is None:
+                return 0
+            self.state, added = self._append(self.state, rows)
+        return added
+
+    @staticmethod
+    def _search(state, query, n, exclude_rows):
+        """在近似索引（若有）或全曲库上取内积最大的n首（exclude_rows 为 state 中的行号）"""
+        if state.index is not None:
+            exclude = state.song_ids[exclude_rows] if len(exclude_rows) else None
+            ids, scores = state.index.search(query, n, exclude=exclude)
+            return [(int(i), float(s)) for i, s in zip(ids, scores) if s > 0]
+
+        features, song_ids = state.features, state.song_ids
+        scores = features @ query
+        scores[exclude_rows] = -np.inf
+        top = top_n_indices(scores, n)
+        top = top[scores[top] > 0]
+        return [(int(song_ids[i]), float(scores[i])) for i in top]
+
+    def similar_song_ids(self, song_id: int, n: int = 5) -> List[Tuple[int, float]]:
+        """与给定歌曲特征最相似的歌曲 [(song_id, score), ...]"""
+        state = self.state
+        if state is None:
+            return []
+        idx = state.song_index.get(int(song_id))
+        if idx is None:
+            return []
+        return self._search(state, state.features[idx], n, np.array([idx]))
+
+    def user_profile(self, weighted_songs: Dict[int, float], state=None):
+        """用户画像：已播放歌曲特征的加权平均（L2归一化），返回 (画像, state 中的行号)"""
+        state = state or self.state
+        rows, weights = [], []
+        for song_id, weight in weighted_songs.items():
+            idx = state.song_index.get(int(song_id))
+            if idx is not None and weight > 0:
+                rows.append(idx)
+                weights.append(weight)
+        if not rows:
+            return None, np.empty(0, dtype=np.int64)
+
+        rows = np.array(rows, dtype=np.int64)
+        profile = np.asarray(weights, dtype=np.float32) @ state.features[rows]
+        norm = np.linalg.norm(profile)
+        if norm == 0:
+            return None, rows
+        return profile / norm, rows
+
+    @staticmethod
+    def history_weights(plays, ratings):
+        """用户交互权重：log(1+播放次数) + 评分高于2分的部分"""
+        weights = {}
+        for song_id, play_count in plays:
+            weights[song_id] = weights.get(song_id, 0.0) + float(np.log1p(play_count or 0))
+        for song_id, rating in ratings:
+            weights[song_id] = weights.get(song_id, 0.0) + max(rating - 2.0, 0.0)
+        return weights
+
+    @classmethod
+    def _load_user_weights(cls, user_id):
+        from database.models import db, Rating, PlayHistory
+        plays = db.session.query(PlayHistory.song_id, PlayHistory.play_count).filter(
+            PlayHistory.user_id == user_id).all()
+        ratings = db.session.query(Rating.song_id, Rating.rating).filter(
+            Rating.user_id == user_id).all()
+        return cls.history_weights(plays, ratings)
+
+    def recommend_ids(self, user_id: int, n: int = None, weighted_songs=None) -> List[Tuple[int, float]]:
+        """返回 [(song_id, score), ...]；weighted_songs 为空时从数据库读取用户历史"""
+        n = n or self.top_n
+        state = self.state
+        if state is None:
+            return []
+        if weighted_songs is None:
+            weighted_songs = self._load_user_weights(user_id)
+
+        profile, seen = self.user_profile(weighted_songs, state)
+        if profile is None:
+            return []
+        return self._search(state, profile, n, seen)
+
+    def recommend(self, user_id=None, **kwargs) -> List[Dict[str, Any]]:
         """生成推荐"""
-        print(f"🔧 ContentBasedRecommender.recommend() - 用户ID: {user_id}")
-        # 这里返回空列表，让HybridRecommender处理
-        return []
+        if user_id is None or not self.ensure_fitted():
+            return []
+
+        ranked = self.recommend_ids(user_id, self.top_n)
+        if not ranked:
+            return []
+
+        from database.db_operations import get_song_summaries
+        songs_by_id = get_song_summaries([song_id for song_id, _ in ranked])
+        songs, scores = [], []
+        for song_id, score in ranked:
+            if song_id in songs_by_id:
+                songs.append(songs_by_id[song_id])
+                scores.append(score)
+        return self.format_recommendations(songs, scores)
+
+
+# 各推荐器共享的内容推荐模型
+content_model = ContentBasedRecommender(top_n=50)
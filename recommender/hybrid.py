@@ -1,8 +1,31 @@
 ﻿# recommender/hybrid.py
-from database.db_operations import get_top_songs, get_new_songs, get_high_rated_songs, get_similar_songs
-from database.models import Rating, Song, PlayHistory
-from sqlalchemy import func
-import random
+"""
+混合推荐
+
+一次请求最多两次数据库往返，与用户历史长短无关：
+1. 用户活动快照：评分、播放次数和预计算推荐（一次 UNION ALL）
+2. 按ID批量补全模型推荐歌曲的标题和艺术家
+热门/高评分/新歌榜单来自内存中的榜单快照（见 recommender/popularity_snapshot.py），热门多取一些用于补齐。
+榜单和各模型作为候选来源在线程池中并行执行（见 recommender/candidates.py），
+超过截止时间的来源使用后备结果。
+"""
+from database.db_operations import get_user_activity_snapshot, get_song_summaries
+from database.song_fields import song_to_dict
+from recommender.collaborative import item_cf
+from recommender.als import als_model
+from recommender.content_based import content_model
+from recommender.result_cache import recommendation_cache
+from recommender.candidates import ChartSource, ModelSource, run_sources
+
+# 候选来源（模型来源按结果中的先后顺序）
+CHART_SOURCE = ChartSource()
+MODEL_SOURCES = {
+    'collaborative': ModelSource('collaborative', item_cf),
+    'als': ModelSource('als', als_model),
+    'content': ModelSource('content', content_model),
+}
+EMPTY_CHARTS = {'popular': [], 'high_rated': [], 'new': []}
+
 
 class HybridRecommender:
     def __init__(self, top_n=10):
@@ -15,149 +38,88 @@ class HybridRecommender:
         print(f"🔧 HybridRecommender.train() - 用户ID: {user_id}")
         return True
     
+    @staticmethod
+    def _format(song, rec_type, score):
+        rec = song_to_dict(song, ('id', 'title', 'artist'))
+        rec.update(song_id=song.id, type=rec_type, score=score)
+        return rec
+    
+    def _ranked_to_recommendations(self, ranked, rec_type, songs_by_id):
+        """把模型输出的 [(song_id, score)] 转为推荐结果，得分线性映射到 (0.6, 0.95]"""
+        max_score = ranked[0][1]
+        return [
+            self._format(songs_by_id[song_id], rec_type, 0.6 + 0.35 * model_score / max_score)
+            for song_id, model_score in ranked if song_id in songs_by_id
+        ]
+    
     def recommend_by_type(self, user_id, rec_type):
+        """根据类型生成推荐（先查结果缓存）"""
+        cached = recommendation_cache.get(user_id, rec_type, self.top_n)
+        if cached is not None:
+            return cached
+        
+        recommendations = self._generate_by_type(user_id, rec_type)
+        if recommendations:
+            recommendation_cache.set(user_id, rec_type, self.top_n, recommendations)
+        return recommendations
+    
+    def _generate_by_type(self, user_id, rec_type):
         """根据类型生成推荐"""
         try:
             print(f"🔧 HybridRecommender.recommend_by_type() - 用户: {user_id}, 类型: {rec_type}")
             
+            def wanted(name):
+                return rec_type == name or rec_type == 'hybrid'
+            
+            # 榜单与各模型并行生成候选（模型来源先读用户活动快照）
+            model_types = [name for name in MODEL_SOURCES if wanted(name)]
+            results = run_sources(
+                [CHART_SOURCE] + [MODEL_SOURCES[name] for name in model_types],
+                user_id, self.top_n,
+                load_activity=lambda: get_user_activity_snapshot(user_id)
+            )
+            ranked_by_type = {name: results.get(name) or [] for name in model_types}
+            
+            # 没有评分数据时高评分榜用热门代替
+            lists = results.get(CHART_SOURCE.name) or EMPTY_CHARTS
+            popular = lists['popular']
+            high_rated = lists['high_rated'] or popular[:self.top_n]
+            songs_by_id = {song.id: song for rows in lists.values() for song in rows}
+            
+            # 补全榜单中没有的模型推荐歌曲
+            missing = {song_id for ranked in ranked_by_type.values()
+                       for song_id, _ in ranked if song_id not in songs_by_id}
+            songs_by_id.update(get_song_summaries(missing))
+            
             recommendations = []
             
-            if rec_type == 'popular' or rec_type == 'hybrid':
-                # 热门歌曲
-                songs = get_top_songs(limit=self.top_n)
-                for i, song in enumerate(songs):
-                    recommendations.append({
-                        'song_id': song.id,
-                        'id': song.id,
-                        'title': song.title,
-                        'artist': song.artist,
-                        'type': 'popular',
-                        'score': 0.8 * (self.top_n - i) / self.top_n
-                    })
+            if wanted('popular'):
+                for i, song in enumerate(popular[:self.top_n]):
+                    recommendations.append(self._format(song, 'popular', 0.8 * (self.top_n - i) / self.top_n))
             
-            if rec_type == 'high_rated' or rec_type == 'hybrid':
-                # 高评分歌曲
-                songs = get_high_rated_songs(limit=self.top_n)
-                for i, song in enumerate(songs):
+            if wanted('high_rated'):
+                for song in high_rated:
                     score = 0.9 * (song.avg_rating or 0) / 5.0
-                    recommendations.append({
-                        'song_id': song.id,
-                        'id': song.id,
-                        'title': song.title,
-                        'artist': song.artist,
-                        'type': 'high_rated',
-                        'score': score if score > 0 else 0.5
-                    })
-            
-            if rec_type == 'new' or rec_type == 'hybrid':
-                # 新歌
-                songs = get_new_songs(limit=self.top_n)
-                for i, song in enumerate(songs):
-                    recommendations.append({
-                        'song_id': song.id,
-                        'id': song.id,
-                        'title': song.title,
-                        'artist': song.artist,
-                        'type': 'new',
-                        'score': 0.7 * (self.top_n - i) / self.top_n
-                    })
+                    recommendations.append(self._format(song, 'high_rated', score if score > 0 else 0.5))
             
-            if rec_type == 'collaborative' or rec_type == 'hybrid':
-                # 协同过滤（增强版）
-                try:
-                    print(f"  🔄 尝试协同过滤推荐...")
-                    
-                    # 获取用户评分过的歌曲
-                    user_ratings = Rating.query.filter_by(user_id=user_id).all()
-                    print(f"    用户评分记录: {len(user_ratings)} 条")
-                    
-                    if user_ratings:
-                        # 获取用户喜欢的歌曲（评分>=4）
-                        liked_songs = [r.song_id for r in user_ratings if r.rating >= 4]
-                        print(f"    用户喜欢(评分>=4)的歌曲: {len(liked_songs)} 首")
-                        
-                        if liked_songs:
-                            for song_id in liked_songs[:3]:  # 取前3首喜欢的
-                                similar = get_similar_songs(song_id, limit=3)
-                                for song in similar:
-                                    recommendations.append({
-                                        'song_id': song.id,
-                                        'id': song.id,
-                                        'title': song.title,
-                                        'artist': song.artist,
-                                        'type': 'collaborative',
-                                        'score': 0.85
-                                    })
-                            print(f"    生成 {len([r for r in recommendations if r['type'] == 'collaborative'])} 条协同过滤推荐")
-                        else:
-                            print(f"    ⚠️ 用户没有评分>=4的歌曲，使用高评分歌曲替代")
-                            # 如果没有喜欢的歌曲，使用高评分歌曲
-                            high_songs = get_high_rated_songs(limit=3)
-                            for song in high_songs:
-                                recommendations.append({
-                                    'song_id': song.id,
-                                    'id': song.id,
-                                    'title': song.title,
-                                    'artist': song.artist,
-                                    'type': 'collaborative_fallback',
-                                    'score': 0.75
-                                })
-                    else:
-                        print(f"    ⚠️ 用户没有评分记录，使用高评分歌曲替代")
-                        # 如果没有评分记录，使用高评分歌曲
-                        high_songs = get_high_rated_songs(limit=3)
-                        for song in high_songs:
-                            recommendations.append({
-                                'song_id': song.id,
-                                'id': song.id,
-                                'title': song.title,
-                                'artist': song.artist,
-                                'type': 'collaborative_fallback',
-                                'score': 0.7
-                            })
-                except Exception as e:
-                    print(f"    ❌ 协同过滤错误: {e}")
+            if wanted('new'):
+                for i, song in enumerate(lists['new']):
+                    recommendations.append(self._format(song, 'new', 0.7 * (self.top_n - i) / self.top_n))
             
-            if rec_type == 'content' or rec_type == 'hybrid':
-                # 基于内容的推荐（增强版）
-                try:
-                    print(f"  🔄 尝试内容推荐...")
-                    
-                    # 获取用户播放历史中的歌曲
-                    history = PlayHistory.query.filter_by(user_id=user_id).order_by(
-                        PlayHistory.last_played.desc()
-                    ).limit(3).all()
-                    
-                    print(f"    用户播放历史: {len(history)} 条")
-                    
-                    if history:
-                        for h in history:
-                            similar = get_similar_songs(h.song_id, limit=2)
-                            for song in similar:
-                                recommendations.append({
-                                    'song_id': song.id,
-                                    'id': song.id,
-                                    'title': song.title,
-                                    'artist': song.artist,
-                                    'type': 'content',
-                                    'score': 0.75
-                                })
-                        print(f"    生成 {len([r for r in recommendations if r['type'] == 'content'])} 条内容推荐")
-                    else:
-                        print(f"    ⚠️ 用户没有播放历史，使用热门歌曲替代")
-                        # 如果没有播放历史，使用热门歌曲
-                        pop_songs = get_top_songs(limit=3)
-                        for song in pop_songs:
-                            recommendations.append({
-                                'song_id': song.id,
-                                'id': song.id,
-                                'title': song.title,
-                                'artist': song.artist,
-                                'type': 'content_fallback',
-                                'score': 0.65
-                            })
-                except Exception as e:
-                    print(f"    ❌ 内容推荐错误: {e}")
+            for name, ranked in ranked_by_type.items():
+                if ranked:
+                    recommendations.extend(self._ranked_to_recommendations(ranked, name, songs_by_id))
+                    print(f"    生成 {len([r for r in recommendations if r['type'] == name])} 条{name}推荐")
+                elif name == 'collaborative':
+                    print(f"    ⚠️ 用户没有交互记录，使用高评分歌曲替代")
+                    for song in high_rated[:3]:
+                        recommendations.append(self._format(song, 'collaborative_fallback', 0.7))
+                elif name == 'content':
+                    print(f"    ⚠️ 用户没有播放历史，使用热门歌曲替代")
+                    for song in popular[:3]:
+                        recommendations.append(self._format(song, 'content_fallback', 0.65))
+                else:
+                    print(f"    ⚠️ 用户没有交互记录，跳过{name}推荐")
             
             # 去重并排序
             seen = set()
@@ -172,20 +134,12 @@ class HybridRecommender:
             
             print(f"🔧 生成 {len(unique_recs)} 条推荐（去重后）")
             
-            # 如果推荐太少，补充一些随机歌曲
+            # 如果推荐太少，用热门榜中未出现的歌曲补齐
             if len(unique_recs) < self.top_n:
-                print(f"  🔄 推荐不足，补充随机歌曲...")
-                all_songs = Song.query.order_by(func.random()).limit(self.top_n * 2).all()
-                for song in all_songs:
+                print(f"  🔄 推荐不足，用热门歌曲补齐...")
+                for song in popular:
                     if song.id not in seen and len(unique_recs) < self.top_n:
-                        unique_recs.append({
-                            'song_id': song.id,
-                            'id': song.id,
-                            'title': song.title,
-                            'artist': song.artist,
-                            'type': 'random',
-                            'score': 0.5
-                        })
+                        unique_recs.append(self._format(song, 'popular_fill', 0.5))
                         seen.add(song.id)
             
             print(f"🔧 最终推荐数量: {len(unique_recs[:self.top_n])}")
@@ -0,0 +1,131 @@
+"""
+用户-歌曲交互矩阵
+"""
+import numpy as np
+from scipy import sparse
+from typing import Dict, Optional
+from database.models import db, Song, Rating, PlayHistory
+
+
+def load_interactions() -> Dict[str, np.ndarray]:
+    """一次性读取评分和播放历史（只查询需要的列，不构造ORM对象）"""
+    song_ids = np.array([row[0] for row in db.session.query(Song.id).all()], dtype=np.int64)
+
+    rating_users, rating_songs, ratings = load_ratings()
+    plays = db.session.query(
+        PlayHistory.user_id, PlayHistory.song_id,
+        PlayHistory.play_count, PlayHistory.total_duration
+    ).all()
+
+    play_arr = np.array(
+        [(u, s, c or 0, d or 0) for u, s, c, d in plays], dtype=np.float64
+    ).reshape(-1, 4)
+
+    return {
+        'song_ids': song_ids,
+        'rating_users': rating_users,
+        'rating_songs': rating_songs,
+        'ratings': ratings,
+        'play_users': play_arr[:, 0].astype(np.int64),
+        'play_songs': play_arr[:, 1].astype(np.int64),
+        'play_counts': play_arr[:, 2].astype(np.float32),
+        'play_durations': play_arr[:, 3].astype(np.float32),
+    }
+
+
+def load_ratings():
+    """只读取评分三元组，返回 (user_ids, song_ids, ratings) 三个数组"""
+    ratings = db.session.query(Rating.user_id, Rating.song_id, Rating.rating).all()
+    arr = np.array(ratings, dtype=np.float64).reshape(-1, 3)
+    return arr[:, 0].astype(np.int64), arr[:, 1].astype(np.int64), arr[:, 2].astype(np.float32)
+
+
+def default_weights(data: Dict[str, np.ndarray]):
+    """默认交互强度：评分高于2分的部分 + log(1 + 播放次数)"""
+    rating_w = np.clip(data['ratings'] - 2.0, 0.0, None)
+    play_w = np.log1p(data['play_counts'])
+    return rating_w, play_w
+
+
+class InteractionMatrix:
+    """用户×歌曲稀疏矩阵（CSR, float32）及ID映射"""
+
+    def __init__(self, matrix, user_ids, song_ids):
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+        self.matrix.sum_duplicates()
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.song_ids = np.asarray(song_ids, dtype=np.int64)
+        self.user_index = {int(uid): i for i, uid in enumerate(self.user_ids)}
+        self.song_index = {int(sid): i for i, sid in enumerate(self.song_ids)}
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @classmethod
+    def from_triples(cls, users, songs, values, song_ids=None):
+        """由 (user_id, song_id, value) 三元组构建矩阵，重复项累加"""
+        users = np.asarray(users, dtype=np.int64)
+        songs = np.asarray(songs, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+
+        keep = values > 0
+        users, songs, values = users[keep], songs[keep], values[keep]
+
+        user_ids = np.unique(users)
+        if song_ids is None:
+            song_ids = np.unique(songs)
+        else:
+            song_ids = np.unique(np.concatenate([np.asarray(song_ids, dtype=np.int64), songs]))
+
+        rows = np.searchsorted(user_ids, users)
+        cols = np.searchsorted(song_ids, songs)
+        matrix = sparse.coo_matrix(
+            (values, (rows, cols)), shape=(len(user_ids), len(song_ids))
+        ).tocsr()
+        return cls(matrix, user_ids, song_ids)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, np.ndarray], weights=default_weights):
+        """由 load_interactions() 的结果构建矩阵"""
+        rating_w, play_w = weights(data)
+        users = np.concatenate([data['rating_users'], data['play_users']])
+        songs = np.concatenate([data['rating_songs'], data['play_songs']])
+        values = np.concatenate([rating_w, play_w])
+        return cls.from_triples(users, songs, values, song_ids=data['song_ids'])
+
+    def user_row(self, user_id: int) -> Optional[sparse.csr_matrix]:
+        """返回用户对应的 1×n 行，用户不存在时返回None"""
+        idx = self.user_index.get(int(user_id))
+        if idx is None:
+            return None
+        return self.matrix[idx]
+
+    def seen_columns(self, user_id: int) -> np.ndarray:
+        """用户已交互过的歌曲列下标"""
+        idx = self.user_index.get(int(user_id))
+        if idx is None:
+            return np.empty(0, dtype=np.int32)
+        start, end = self.matrix.indptr[idx], self.matrix.indptr[idx + 1]
+        return self.matrix.indices[start:end]
+
+
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """argpartition 取最大的n个下标，并按分数降序排列"""
+    n = min(n, scores.shape[-1])
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, n - 1)[:n]
+    return part[np.argsort(-scores[part], kind='stable')]
+
+
+def top_n_rows(scores: np.ndarray, n: int):
+    """对二维得分矩阵逐行取最大的n个，返回 (下标, 分数)，每行按分数降序"""
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
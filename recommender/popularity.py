@@ -1,9 +1,10 @@
 ﻿# recommender/popularity.py
-from database.db_operations import get_top_songs, get_new_songs, get_high_rated_songs
+from recommender.popularity_snapshot import popularity_snapshot
 
 class PopularityRecommender:
     def __init__(self, top_n=10):
         self.top_n = top_n
+        self.rec_type = 'popular'
     
     def fit(self, user_id=None, type='popular'):
         """根据类型准备数据"""
@@ -11,26 +12,15 @@ class PopularityRecommender:
         print(f"🔧 PopularityRecommender.fit() - 类型: {type}")
         return True
     
-    def recommend(self, user_id=None):
-        """生成推荐"""
+    def recommend(self, user_id=None, type=None):
+        """生成推荐（从内存中的榜单快照切片，不查询数据库）"""
         try:
-            print(f"🔧 PopularityRecommender.recommend() - 类型: {self.rec_type}")
+            rec_type = type or self.rec_type
+            print(f"🔧 PopularityRecommender.recommend() - 类型: {rec_type}")
             
-            if self.rec_type == 'popular':
-                # 热门歌曲
-                songs = get_top_songs(limit=self.top_n)
-                print(f"🔧 获取到 {len(songs)} 首热门歌曲")
-                
-            elif self.rec_type == 'new':
-                # 新歌
-                songs = get_new_songs(limit=self.top_n)
-                print(f"🔧 获取到 {len(songs)} 首新歌")
-                
-            elif self.rec_type == 'high_rated':
-                # 高评分歌曲
-                songs = get_high_rated_songs(limit=self.top_n)
-                print(f"🔧 获取到 {len(songs)} 首高评分歌曲")
-                
+            if rec_type in ('popular', 'trending', 'new', 'high_rated'):
+                songs = popularity_snapshot.get(rec_type, limit=self.top_n)
+                print(f"🔧 获取到 {len(songs)} 首{rec_type}歌曲")
             else:
                 songs = []
             
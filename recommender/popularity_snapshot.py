@@ -0,0 +1,92 @@
+"""
+非个性化榜单快照
+
+在内存中保存热门/新歌/高评分三个榜单的有序歌曲行（只含展示所需的列），任意 limit 都直接切片返回，
+不访问数据库。容量取历史上请求过的最大 limit（不超过 Config.POPULARITY_SNAPSHOT_MAX_SIZE）；
+请求更长的榜单时同步扩容一次。
+快照超过 Config.POPULARITY_REFRESH_SECONDS 或累计 Config.POPULARITY_REFRESH_PLAYS 次播放/评分后，
+在后台线程中刷新，刷新期间继续返回旧快照。
+'trending'（时间衰减热度榜）由 recommender.trending 的增量热度引擎提供。
+"""
+import time
+import threading
+from config import Config
+from database.background import BackgroundRefresher
+
+LIST_TYPES = ('popular', 'new', 'high_rated')
+
+
+class PopularitySnapshot:
+    """榜单快照服务（线程安全）"""
+
+    def __init__(self, capacity=None, refresh_seconds=None, refresh_plays=None):
+        self.capacity = capacity or Config.POPULARITY_SNAPSHOT_SIZE
+        self.refresh_seconds = refresh_seconds or Config.POPULARITY_REFRESH_SECONDS
+        self.refresh_plays = refresh_plays or Config.POPULARITY_REFRESH_PLAYS
+
+        self._lists = None          # {list_type: tuple(行)}，整体替换
+        self.built_at = None
+        self.version = 0            # 每次刷新后加一（整页缓存据此判断页面是否变化）
+        self._activity = 0          # 上次刷新后的播放/评分次数
+        self._refresher = BackgroundRefresher('popularity-snapshot', '榜单快照')
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def refresh(self, capacity=None):
+        """同步重建快照（一次 UNION ALL 查询）"""
+        from database.db_operations import get_song_lists_snapshot
+        with self._build_lock:
+            capacity = max(capacity or 0, self.capacity)
+            activity = self._activity
+            lists = get_song_lists_snapshot(limit=capacity)
+            if not any(lists.values()) and self._lists is not None:
+                return False
+            with self._lock:
+                self._lists = {name: tuple(lists.get(name, ())) for name in LIST_TYPES}
+                self.capacity = capacity
+                self.built_at = time.time()
+                self.version += 1
+                self._activity -= activity
+            return True
+
+    def _is_stale(self):
+        return (time.time() - self.built_at >= self.refresh_seconds
+                or self._activity >= self.refresh_plays)
+
+    def current_version(self):
+        """当前快照的版本号；与 get() 一样，还没有快照时同步建立，过期时触发后台刷新"""
+        if self._lists is None:
+            self.refresh()
+        elif self._is_stale():
+            self._refresher.trigger(self.refresh)
+        return self.version
+
+    def get(self, list_type, limit=10):
+        """返回榜单前 limit 首歌曲的行（有 id/title/artist/album/genre/... 属性）"""
+        limit = max(0, min(int(limit), Config.POPULARITY_SNAPSHOT_MAX_SIZE))
+        if list_type == 'trending':
+            from recommender.trending import trending_engine
+            return trending_engine.top(limit)
+        if self._lists is None or limit > self.capacity:
+            self.refresh(capacity=limit)
+        elif self._is_stale():
+            self._refresher.trigger(self.refresh)
+
+        lists = self._lists or {}
+        rows = lists.get(list_type, ())
+        if list_type == 'high_rated' and not rows:
+            # 还没有评分数据时用热门榜代替
+            rows = lists.get('popular', ())
+        return list(rows[:limit])
+
+    def note_activity(self, count=1):
+        """记录播放/评分；累计到阈值后触发后台刷新"""
+        with self._lock:
+            self._activity += count
+            stale = self._lists is not None and self._activity >= self.refresh_plays
+        if stale:
+            self._refresher.trigger(self.refresh)
+
+
+# 所有非个性化榜单共享的快照
+popularity_snapshot = PopularitySnapshot()
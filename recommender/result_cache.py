@@ -0,0 +1,93 @@
+"""
+推荐结果缓存
+
+按 (user_id, rec_type, top_n) 缓存最终推荐列表：条目超过 TTL 即失效，
+条目总数超过上限时按 LRU 淘汰最久未访问的条目。
+用户有新的播放或评分时，调用 invalidate_user() 清除该用户的全部条目。
+"""
+import time
+import threading
+from collections import OrderedDict
+from config import Config
+
+
+class RecommendationCache:
+    """带TTL和LRU淘汰的推荐结果缓存（线程安全）"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or Config.RECOMMENDATION_CACHE_SIZE
+        self.ttl = Config.RECOMMENDATION_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()   # key -> (过期时间, 推荐列表)
+        self._user_keys = {}            # user_id -> 该用户的key集合，用于按用户失效
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id, rec_type, top_n):
+        """命中返回推荐列表的副本，未命中或已过期返回None"""
+        key = (user_id, rec_type, top_n)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [dict(rec) for rec in entry[1]]
+
+    def set(self, user_id, rec_type, top_n, recommendations):
+        if self.ttl <= 0:
+            return
+        key = (user_id, rec_type, top_n)
+        value = [dict(rec) for rec in recommendations]
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def invalidate_user(self, user_id):
+        """用户产生新的播放/评分后清除其全部缓存条目"""
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def stats(self):
+        """命中率等统计，用于确定缓存容量"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# 所有推荐入口共享的结果缓存
+recommendation_cache = RecommendationCache()
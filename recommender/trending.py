@@ -0,0 +1,197 @@
+"""
+按时间衰减的热度榜
+
+每首歌保存一个指数衰减的热度分：一次播放的贡献为 2^(-距今天数 / 半衰期)，
+热度分即全部播放贡献之和。为避免每次更新都衰减全部歌曲，分数以基准时间 anchor 为参照保存：
+t 时刻的播放累加 exp(λ·(t - anchor))，读取时统一乘以 exp(-λ·(now - anchor))；
+指数过大时把基准时间前移并整体缩放一次。这样每次播放只是 O(1) 的数组累加，
+取榜单为一次 argpartition，与 play_events 表的大小无关。
+
+启动时用一次 GROUP BY (歌曲, 日期) 查询从 play_events 表重建 Config.POPULARITY_DAYS 天内的热度分
+（表为空时用 play_history 的最后播放时间近似），之后由 record_play 增量更新；
+每隔 Config.TRENDING_RELOAD_SECONDS 从数据库重建一次，以合并其他进程写入的播放。
+"""
+import math
+import time
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from config import Config
+from recommender.interactions import top_n_indices
+
+SECONDS_PER_DAY = 86400.0
+MAX_EXPONENT = 30.0  # 超过后重新选取基准时间，避免浮点溢出
+
+
+class TrendingEngine:
+    """增量维护的时间衰减热度分（线程安全）"""
+
+    def __init__(self, half_life_days=None, window_days=None):
+        self.half_life_days = half_life_days or Config.TRENDING_HALF_LIFE_DAYS
+        self.window_days = window_days or Config.POPULARITY_DAYS
+        self.decay_rate = math.log(2) / (self.half_life_days * SECONDS_PER_DAY)  # λ，每秒
+
+        self._anchor = time.time()
+        self._scores = np.zeros(0, dtype=np.float64)
+        self._song_ids = np.zeros(0, dtype=np.int64)
+        self._index = {}            # song_id -> 数组下标
+        self._size = 0
+        self.loaded_at = None
+        self._top = None            # (过期时间, 容量, 歌曲行列表)
+        self.top_version = 0        # 热度榜内容变化后加一（整页缓存据此判断页面是否变化）
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    def _rebase(self, anchor):
+        """把基准时间移到 anchor，已有分数同步缩放"""
+        self._scores[:self._size] *= math.exp(-self.decay_rate * (anchor - self._anchor))
+        self._anchor = anchor
+
+    def _slot(self, song_id):
+        """取歌曲的数组下标，不存在时追加（容量不足时翻倍）"""
+        idx = self._index.get(song_id)
+        if idx is None:
+            idx = self._size
+            if idx == len(self._scores):
+                capacity = max(1024, 2 * len(self._scores))
+                self._scores = np.resize(self._scores, capacity)
+                self._scores[idx:] = 0.0
+                self._song_ids = np.resize(self._song_ids, capacity)
+            self._song_ids[idx] = song_id
+            self._index[song_id] = idx
+            self._size += 1
+        return idx
+
+    def record(self, song_id, played_at=None, weight=1.0):
+        """累加一次播放（played_at 为 Unix 时间戳，默认当前时间）"""
+        played_at = time.time() if played_at is None else played_at
+        with self._lock:
+            exponent = self.decay_rate * (played_at - self._anchor)
+            if exponent > MAX_EXPONENT:
+                self._rebase(played_at)
+                exponent = 0.0
+            idx = self._slot(int(song_id))  # 可能扩容替换 self._scores，需先取下标
+            self._scores[idx] += weight * math.exp(exponent)
+
+    def load(self):
+        """从数据库重建全部热度分（一次聚合查询）"""
+        with self._load_lock:
+            return self._load()
+
+    def _load(self):
+        now = time.time()
+        song_ids, days, counts = self._load_daily_counts(now)
+        if song_ids is None:
+            return False
+
+        # 同一天的播放按当天中午（不晚于现在）计算衰减
+        ages = np.maximum(now - (days + 0.5 * SECONDS_PER_DAY), 0.0)
+        contributions = counts * np.exp(-self.decay_rate * ages)
+        unique_ids, inverse = np.unique(song_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions, minlength=len(unique_ids))
+
+        capacity = max(1024, len(unique_ids))
+        new_scores = np.zeros(capacity, dtype=np.float64)
+        new_scores[:len(unique_ids)] = scores
+        new_ids = np.zeros(capacity, dtype=np.int64)
+        new_ids[:len(unique_ids)] = unique_ids
+
+        with self._lock:
+            self._anchor = now
+            self._scores = new_scores
+            self._song_ids = new_ids
+            self._index = {int(sid): i for i, sid in enumerate(unique_ids)}
+            self._size = len(unique_ids)
+            self.loaded_at = now
+            self._top = None
+        print(f"✅ 热度榜加载完成: {len(unique_ids)}首歌曲, {int(counts.sum())}次播放")
+        return True
+
+    def _load_daily_counts(self, now):
+        """按 (歌曲, 日期) 聚合窗口内的播放次数，返回 (歌曲ID数组, 当天0点时间戳数组, 次数数组)"""
+        from database.models import db, PlayEvent, PlayHistory
+        from sqlalchemy import func
+        try:
+            since = datetime.utcfromtimestamp(now) - timedelta(days=self.window_days)
+            day = func.date(PlayEvent.played_at)
+            rows = db.session.query(
+                PlayEvent.song_id, day, func.count(PlayEvent.id)
+            ).filter(PlayEvent.played_at >= since).group_by(PlayEvent.song_id, day).all()
+
+            if not rows and not db.session.query(PlayEvent.id).limit(1).first():
+                # 还没有播放事件（旧数据），用播放历史的最后播放时间近似
+                day = func.date(PlayHistory.last_played)
+                rows = db.session.query(
+                    PlayHistory.song_id, day, func.sum(PlayHistory.play_count)
+                ).filter(PlayHistory.last_played >= since).group_by(PlayHistory.song_id, day).all()
+
+            epoch = datetime(1970, 1, 1)
+            song_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            days = np.array([(_as_date(row[1]) - epoch).total_seconds() for row in rows], dtype=np.float64)
+            counts = np.array([row[2] or 0 for row in rows], dtype=np.float64)
+            return song_ids, days, counts
+        except Exception as e:
+            print(f"❌ 热度榜加载错误: {e}")
+            db.session.rollback()
+            return None, None, None
+
+    def ensure_loaded(self, max_age=None):
+        """未加载或超过 max_age 秒时从数据库重建"""
+        max_age = Config.TRENDING_RELOAD_SECONDS if max_age is None else max_age
+        if self.is_loaded and time.time() - self.loaded_at < max_age:
+            return True
+        with self._load_lock:
+            if self.is_loaded and time.time() - self.loaded_at < max_age:
+                return True
+            return self._load()
+
+    def top_ids(self, n):
+        """返回当前热度最高的 [(song_id, 热度分)]，热度分折算为“等效的现在播放次数”"""
+        with self._lock:
+            size = self._size
+            scores = self._scores[:size].copy()
+            song_ids = self._song_ids[:size].copy()
+            scale = math.exp(-self.decay_rate * (time.time() - self._anchor))
+        top = top_n_indices(scores, n)
+        return [(int(song_ids[i]), float(scores[i] * scale)) for i in top if scores[i] > 0]
+
+    def score(self, song_id):
+        """单首歌曲当前的热度分"""
+        with self._lock:
+            idx = self._index.get(song_id)
+            if idx is None:
+                return 0.0
+            return float(self._scores[idx] * math.exp(-self.decay_rate * (time.time() - self._anchor)))
+
+    def top(self, limit=10):
+        """热度榜前 limit 首歌曲的行；结果缓存 Config.TRENDING_CACHE_SECONDS 秒"""
+        from database.db_operations import get_song_summaries
+        if not self.ensure_loaded():
+            return []
+        cached = self._top
+        if cached is not None and cached[0] > time.time() and cached[1] >= limit:
+            return list(cached[2][:limit])
+
+        capacity = max(limit, Config.POPULARITY_SNAPSHOT_SIZE)
+        ranked = self.top_ids(capacity)
+        songs_by_id = get_song_summaries([song_id for song_id, _ in ranked])
+        rows = [songs_by_id[song_id] for song_id, _ in ranked if song_id in songs_by_id]
+        if cached is None or cached[2] != rows:
+            self.top_version += 1
+        self._top = (time.time() + Config.TRENDING_CACHE_SECONDS, capacity, rows)
+        return rows[:limit]
+
+
+def _as_date(value):
+    """func.date() 在 SQLite 上返回字符串，其他数据库返回 date"""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d')
+    return datetime(value.year, value.month, value.day)
+
+
+# 所有榜单共享的热度引擎
+trending_engine = TrendingEngine()
@@ -0,0 +1,170 @@
+"""
+用户邻域（User-User 相似度）
+
+基于去均值的稀疏评分矩阵计算皮尔逊相关（或余弦相似度），
+相似度按行分块用一次稀疏矩阵乘法得到，超过 Config.SIMILARITY_THRESHOLD
+的邻居按用户缓存，评分变化时失效。
+"""
+import time
+import threading
+import numpy as np
+from scipy import sparse
+from typing import List, Tuple
+from config import Config
+from recommender.interactions import load_ratings, top_n_indices
+
+
+class UserNeighborhood:
+    """用户邻域模型"""
+
+    def __init__(self, method='pearson', threshold=None, max_neighbors=50, block_size=1024):
+        self.method = method
+        self.threshold = Config.SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.max_neighbors = max_neighbors
+        self.block_size = block_size
+
+        # (user_ids, user_index, 归一化评分矩阵, 其转置, 0/1评分矩阵, 其转置)
+        self._state = None
+        self.fitted_at = None
+        self._dirty = False
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._fit_lock = threading.Lock()
+
+    @property
+    def is_fitted(self):
+        return self._state is not None
+
+    def fit(self):
+        """读取评分并构建归一化矩阵"""
+        try:
+            users, songs, ratings = load_ratings()
+            self.fit_arrays(users, songs, ratings)
+            return True
+        except Exception as e:
+            print(f"❌ UserNeighborhood训练错误: {e}")
+            return False
+
+    def fit_arrays(self, users, songs, ratings):
+        """由评分三元组构建模型"""
+        users = np.asarray(users, dtype=np.int64)
+        songs = np.asarray(songs, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float32)
+
+        user_ids, rows = np.unique(users, return_inverse=True)
+        _, cols = np.unique(songs, return_inverse=True)
+        shape = (len(user_ids), int(cols.max()) + 1 if len(cols) else 0)
+
+        values = ratings.copy()
+        if self.method == 'pearson' and len(values):
+            # 按用户去均值（只对已评分项）
+            sums = np.bincount(rows, weights=values, minlength=len(user_ids))
+            counts = np.bincount(rows, minlength=len(user_ids))
+            values = values - (sums / np.maximum(counts, 1))[rows]
+
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=shape, dtype=np.float32)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 1e-6)
+        normalized = sparse.diags(inv_norms.astype(np.float32)) @ matrix
+
+        rated = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape
+        )
+
+        normalized = normalized.tocsr()
+        with self._lock:
+            # 一次性替换，保证并发查询读到同一版本
+            user_index = {int(uid): i for i, uid in enumerate(user_ids)}
+            self._state = (user_ids, user_index, normalized, normalized.T.tocsr(),
+                           rated, rated.T.tocsr())
+            self.fitted_at = time.time()
+            self._dirty = False
+            self._cache = {}
+        return self
+
+    def ensure_fitted(self):
+        """未训练、过期或有评分变化（且距上次训练超过最小间隔）时重新训练"""
+        if self._is_fresh():
+            return True
+        with self._fit_lock:
+            if self._is_fresh():
+                return True
+            return self.fit()
+
+    def _is_fresh(self):
+        if not self.is_fitted:
+            return False
+        age = time.time() - self.fitted_at
+        if self._dirty and age >= Config.MODEL_MIN_REFIT_SECONDS:
+            return False
+        return age < Config.MODEL_REFRESH_SECONDS
+
+    def invalidate(self, user_id: int):
+        """用户评分发生变化：清除该用户的缓存，并标记模型需要重新训练"""
+        with self._lock:
+            self._cache.pop(int(user_id), None)
+            self._dirty = True
+
+    def _compute_block(self, state, rows: np.ndarray) -> List[List[Tuple[int, float, int]]]:
+        """对一批用户做一次稀疏矩阵乘法，得到与全部用户的相似度和共同评分数"""
+        user_ids, _, normalized, normalized_t, rated, rated_t = state
+        sims = (normalized[rows] @ normalized_t).tocsr()
+        commons = (rated[rows] @ rated_t).tocsr()
+        sims.sort_indices()
+        commons.sort_indices()
+
+        results = []
+        for i, row in enumerate(rows):
+            cols = sims.indices[sims.indptr[i]:sims.indptr[i + 1]]
+            vals = sims.data[sims.indptr[i]:sims.indptr[i + 1]]
+            keep = (vals >= self.threshold) & (cols != row)
+            cols, vals = cols[keep], vals[keep]
+            if len(cols) == 0:
+                results.append([])
+                continue
+
+            top = top_n_indices(vals, self.max_neighbors)
+            common_cols = commons.indices[commons.indptr[i]:commons.indptr[i + 1]]
+            common_vals = commons.data[commons.indptr[i]:commons.indptr[i + 1]]
+            common = common_vals[np.searchsorted(common_cols, cols[top])]
+            results.append([
+                (int(user_ids[c]), float(v), int(n))
+                for c, v, n in zip(cols[top], vals[top], common)
+            ])
+        return results
+
+    def precompute(self):
+        """分块为所有用户计算并缓存邻居；计算期间模型被重新训练时丢弃结果（缓存已随新模型清空）"""
+        state = self._state
+        if state is None:
+            return 0
+        user_ids = state[0]
+        cache = {}
+        for start in range(0, len(user_ids), self.block_size):
+            rows = np.arange(start, min(start + self.block_size, len(user_ids)))
+            for row, neighbors in zip(rows, self._compute_block(state, rows)):
+                cache[int(user_ids[row])] = neighbors
+        with self._lock:
+            if self._state is not state:
+                return 0
+            self._cache.update(cache)
+        return len(cache)
+
+    def similar_users(self, user_id: int, limit: int = 5) -> List[Tuple[int, float, int]]:
+        """返回 [(user_id, similarity, common_songs), ...]，按相似度降序"""
+        user_id = int(user_id)
+        cached = self._cache.get(user_id)
+        if cached is None:
+            state = self._state
+            row = state[1].get(user_id) if state else None
+            if row is None:
+                return []
+            cached = self._compute_block(state, np.array([row]))[0]
+            with self._lock:
+                if self._state is state:
+                    self._cache[user_id] = cached
+        return cached[:limit]
+
+
+# 全局共享的用户邻域模型
+user_neighborhood = UserNeighborhood()
@@ -6,16 +6,25 @@ from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from database.models import db, Song, Rating, PlayHistory, User
 from database.db_operations import (
-    get_song_by_id, search_songs, add_rating, record_play,
-    get_user_play_history, get_system_stats
+    get_song_by_id, search_songs, fuzzy_search_songs, add_rating, delete_rating, record_play, record_play_batch,
+    get_user_play_history
 )
+from database.system_stats import system_stats
+from database.song_pages import get_song_page
+from database.song_fields import (
+    DEFAULT_SONG_FIELDS, CHART_FIELDS, CHART_FIELDS_ALLOWED, parse_fields, song_to_dict
+)
+from web.conditional import conditional_get, song_version, genres_version, artists_version, charts_version
+from web.json_response import json_response
+from config import Config
 from recommender.hybrid import HybridRecommender
 from recommender.popularity import PopularityRecommender
 from utils.validators import Validators
-import json
-
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# 歌曲详情默认返回的字段
+SONG_DETAIL_FIELDS = DEFAULT_SONG_FIELDS + ('created_at', 'audio_features')
+
 # 初始化推荐器
 hybrid_recommender = HybridRecommender(top_n=10)
 popularity_recommender = PopularityRecommender(top_n=10)
@@ -47,60 +56,51 @@ def test_db():
 
 @api_bp.route('/songs')
 def get_songs():
-    """获取歌曲列表"""
+    """获取歌曲列表
+    
+    翻页用上一页返回的 next_cursor（?cursor=...），深翻页与第一页开销相同；旧的 page/per_page 仍然可用。
+    include_total=1 时返回（缓存的）总数，page 方式默认返回。fields=id,title,... 只查询并返回这些字段。
+    """
     try:
         # 获取查询参数
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        per_page = min(max(per_page, 1), Config.SONGS_PAGE_MAX)
+        cursor = request.args.get('cursor', '')
         genre = request.args.get('genre', '')
         artist = request.args.get('artist', '')
         sort_by = request.args.get('sort_by', 'play_count')  # play_count, rating, new
+        include_total = request.args.get('include_total', '0' if cursor else '1') in ('1', 'true')
         
-        # 构建查询
-        query = Song.query
-        
-        if genre:
-            query = query.filter(Song.genre == genre)
-        
-        if artist:
-            query = query.filter(Song.artist == artist)
-        
-        # 排序
-        if sort_by == 'rating':
-            query = query.order_by(Song.avg_rating.desc())
-        elif sort_by == 'new':
-            query = query.order_by(Song.created_at.desc())
-        else:  # play_count
-            query = query.order_by(Song.play_count.desc())
-        
-        # 分页
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        songs = pagination.items
+        try:
+            fields = parse_fields(request.args.get('fields', ''))
+            result = get_song_page(sort_by=sort_by, genre=genre, artist=artist, limit=per_page,
+                                   cursor=cursor or None, page=page, with_total=include_total, fields=fields)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
         
         # 准备响应数据
-        songs_data = []
-        for song in songs:
-            songs_data.append({
-                'id': song.id,
-                'title': song.title,
-                'artist': song.artist,
-                'album': song.album,
-                'genre': song.genre,
-                'duration': song.duration,
-                'release_year': song.release_year,
-                'play_count': song.play_count,
-                'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0
-            })
+        songs_data = [song_to_dict(song, fields) for song in result['songs']]
         
-        return jsonify({
+        total = result['total']
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': result['next_cursor'],
+            'has_more': result['has_more'],
+        }
+        if not cursor:
+            pagination['page'] = page
+        if total is not None:
+            pagination['total'] = total
+            pagination['pages'] = (total + per_page - 1) // per_page
+        
+        return json_response({
             'status': 'success',
             'data': songs_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages
-            }
+            'pagination': pagination
         })
         
     except Exception as e:
@@ -110,10 +110,19 @@ def get_songs():
         }), 500
 
 @api_bp.route('/songs/<int:song_id>')
+@conditional_get(song_version)
 def get_song(song_id):
-    """获取单个歌曲详情"""
+    """获取单个歌曲详情（默认包含创建时间和音频特征，fields= 只查询并返回这些字段）"""
     try:
-        song = get_song_by_id(song_id)
+        try:
+            fields = parse_fields(request.args.get('fields', ''), default=SONG_DETAIL_FIELDS)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        song = get_song_by_id(song_id, fields=fields)
         
         if not song:
             return jsonify({
@@ -121,28 +130,12 @@ def get_song(song_id):
                 'message': '歌曲不存在'
             }), 404
         
-        # 准备响应数据
-        song_data = {
-            'id': song.id,
-            'title': song.title,
-            'artist': song.artist,
-            'album': song.album,
-            'genre': song.genre,
-            'duration': song.duration,
-            'release_year': song.release_year,
-            'play_count': song.play_count,
-            'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0,
-            'created_at': song.created_at.isoformat() if song.created_at else None
-        }
+        song_data = song_to_dict(song, fields)
+        # 没有音频特征时不包含
+        if song_data.get('audio_features') is None:
+            song_data.pop('audio_features', None)
         
-        # 如果有音频特征，也包含
-        if song.audio_features:
-            try:
-                song_data['audio_features'] = json.loads(song.audio_features)
-            except:
-                pass
-        
-        return jsonify({
+        return json_response({
             'status': 'success',
             'data': song_data
         })
@@ -153,6 +146,22 @@ def get_song(song_id):
             'message': f'获取歌曲详情失败: {str(e)}'
         }), 500
 
+@api_bp.route('/suggest')
+def suggest():
+    """搜索框输入提示：标题/歌手/专辑/流派的前缀补全，按热度排序"""
+    from search import suggest_index
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', Config.SUGGEST_LIMIT, type=int)
+    if limit < 1:
+        return jsonify({'status': 'error', 'message': 'limit 必须大于0'}), 400
+    response = jsonify({
+        'status': 'success',
+        'query': query,
+        'data': suggest_index.suggest(query, limit=limit)
+    })
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
 @api_bp.route('/songs/search')
 def search_songs_api():
     """搜索歌曲"""
@@ -173,29 +182,30 @@ def search_songs_api():
                 'message': msg
             }), 400
         
-        # 执行搜索
-        songs = search_songs(query, limit=50)
+        try:
+            fields = parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # 执行搜索，没有结果时按拼写容错匹配歌名/歌手名
+        songs = search_songs(query, limit=50, fields=fields)
+        fuzzy = False
+        if not songs:
+            songs = fuzzy_search_songs(query, limit=50, fields=fields)
+            fuzzy = bool(songs)
         
         # 准备响应数据
-        songs_data = []
-        for song in songs:
-            songs_data.append({
-                'id': song.id,
-                'title': song.title,
-                'artist': song.artist,
-                'album': song.album,
-                'genre': song.genre,
-                'duration': song.duration,
-                'release_year': song.release_year,
-                'play_count': song.play_count,
-                'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0
-            })
+        songs_data = [song_to_dict(song, fields) for song in songs]
         
-        return jsonify({
+        return json_response({
             'status': 'success',
             'data': songs_data,
             'query': query,
-            'count': len(songs_data)
+            'count': len(songs_data),
+            'fuzzy': fuzzy
         })
         
     except Exception as e:
@@ -254,6 +264,33 @@ def rate_song(song_id):
             'message': f'评分失败: {str(e)}'
         }), 500
 
+@api_bp.route('/songs/<int:song_id>/rate', methods=['DELETE'])
+@login_required
+def unrate_song(song_id):
+    """删除对歌曲的评分"""
+    try:
+        if not delete_rating(current_user.id, song_id):
+            return jsonify({
+                'status': 'error',
+                'message': '没有找到评分'
+            }), 404
+        
+        song = get_song_by_id(song_id)
+        return jsonify({
+            'status': 'success',
+            'message': '评分已删除',
+            'data': {
+                'song_id': song_id,
+                'new_avg_rating': float(song.avg_rating) if song and song.avg_rating else 0.0
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'删除评分失败: {str(e)}'
+        }), 500
+
 @api_bp.route('/songs/<int:song_id>/play', methods=['POST'])
 @login_required
 def play_song(song_id):
@@ -270,8 +307,12 @@ def play_song(song_id):
                 'message': '歌曲不存在'
             }), 404
         
-        # 记录播放历史
-        record_play(current_user.id, song_id, duration)
+        # 记录播放历史（写缓冲已满或写库失败时返回 False）
+        if not record_play(current_user.id, song_id, duration):
+            return jsonify({
+                'status': 'error',
+                'message': '保存播放记录失败，请重试'
+            }), 503
         
         return jsonify({
             'status': 'success',
@@ -288,15 +329,52 @@ def play_song(song_id):
             'message': f'记录播放失败: {str(e)}'
         }), 500
 
+@api_bp.route('/plays/batch', methods=['POST'])
+@login_required
+def play_batch():
+    """批量上报播放 {"plays": [{song_id, played_at, duration, key}, ...]}，按 key 去重"""
+    try:
+        data = request.get_json(silent=True)
+        plays = data.get('plays') if isinstance(data, dict) else data
+        if not isinstance(plays, list):
+            return jsonify({
+                'status': 'error',
+                'message': '缺少播放数据'
+            }), 400
+        if len(plays) > Config.PLAY_BATCH_MAX_SIZE:
+            return jsonify({
+                'status': 'error',
+                'message': f'单次最多上报{Config.PLAY_BATCH_MAX_SIZE}条播放'
+            }), 413
+        
+        result = record_play_batch(current_user.id, plays)
+        if result is None:
+            return jsonify({
+                'status': 'error',
+                'message': '保存播放记录失败，请重试'
+            }), 503
+        
+        return jsonify({
+            'status': 'success',
+            'message': '播放记录已保存',
+            'data': result
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'记录播放失败: {str(e)}'
+        }), 500
+
 @api_bp.route('/recommendations')
 @login_required
 def get_recommendations():
     """获取个性化推荐"""
     try:
         # 获取推荐类型
-        rec_type = request.args.get('type', 'hybrid')  # hybrid, collaborative, content, popular, new, high_rated
+        rec_type = request.args.get('type', 'hybrid')  # hybrid, collaborative, als, content, popular, new, high_rated
         
-        if rec_type in ['collaborative', 'content', 'hybrid']:
+        if rec_type in ['collaborative', 'als', 'content', 'hybrid']:
             # 使用混合推荐器
             hybrid_recommender.train(current_user.id)
             recommendations = hybrid_recommender.recommend_by_type(current_user.id, rec_type)
@@ -318,6 +396,24 @@ def get_recommendations():
             'message': f'获取推荐失败: {str(e)}'
         }), 500
 
+@api_bp.route('/recommendations/cache_stats')
+def get_recommendation_cache_stats():
+    """推荐结果缓存的命中/未命中统计"""
+    from recommender.result_cache import recommendation_cache
+    return jsonify({
+        'status': 'success',
+        'data': recommendation_cache.stats()
+    })
+
+@api_bp.route('/recommendations/source_stats')
+def get_recommendation_source_stats():
+    """混合推荐各候选来源的耗时分位数与超时次数"""
+    from recommender.candidates import source_timings
+    return jsonify({
+        'status': 'success',
+        'data': source_timings.stats()
+    })
+
 @api_bp.route('/recommendations/non_personalized')
 def get_non_personalized_recommendations():
     """获取非个性化推荐"""
@@ -413,7 +509,7 @@ def get_user_ratings():
 def get_stats():
     """获取系统统计信息"""
     try:
-        stats = get_system_stats()
+        stats = system_stats.get()
         
         return jsonify({
             'status': 'success',
@@ -427,6 +523,7 @@ def get_stats():
         }), 500
 
 @api_bp.route('/genres')
+@conditional_get(genres_version)
 def get_genres():
     """获取所有流派"""
     try:
@@ -450,6 +547,7 @@ def get_genres():
         }), 500
 
 @api_bp.route('/artists')
+@conditional_get(artists_version)
 def get_artists():
     """获取所有艺术家"""
     try:
@@ -486,40 +584,45 @@ def get_artists():
         }), 500
 
 @api_bp.route('/charts')
+@conditional_get(charts_version)
 def get_charts():
     """获取排行榜"""
     try:
         chart_type = request.args.get('type', 'popular')  # popular, new, high_rated
+        mode = request.args.get('mode', 'total')  # 热门榜: total（累计）或 trending（时间衰减）
         limit = request.args.get('limit', 20, type=int)
+        try:
+            fields = parse_fields(request.args.get('fields', ''), default=CHART_FIELDS, allowed=CHART_FIELDS_ALLOWED)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
         
+        # 从内存榜单快照切片，不查询数据库
+        from recommender.popularity_snapshot import popularity_snapshot
         if chart_type == 'new':
-            songs = Song.query.order_by(Song.created_at.desc()).limit(limit).all()
+            songs = popularity_snapshot.get('new', limit)
         elif chart_type == 'high_rated':
-            # 获取高评分歌曲
-            songs = Song.query.filter(
-                Song.avg_rating >= 4.0
-            ).order_by(Song.avg_rating.desc()).limit(limit).all()
+            # 获取4分以上的高评分歌曲（快照已按评分降序）
+            songs = [s for s in popularity_snapshot.get('high_rated', limit) if (s.avg_rating or 0) >= 4.0]
+        elif mode == 'trending':  # popular 的时间衰减模式
+            songs = popularity_snapshot.get('trending', limit)
         else:  # popular
-            songs = Song.query.order_by(Song.play_count.desc()).limit(limit).all()
+            songs = popularity_snapshot.get('popular', limit)
         
         # 准备响应数据
         songs_data = []
         for i, song in enumerate(songs):
-            songs_data.append({
-                'rank': i + 1,
-                'id': song.id,
-                'title': song.title,
-                'artist': song.artist,
-                'album': song.album,
-                'genre': song.genre,
-                'duration': song.duration,
-                'play_count': song.play_count,
-                'avg_rating': float(song.avg_rating) if song.avg_rating else 0.0
-            })
+            songs_data.append({'rank': i + 1, **song_to_dict(song, fields)})
+            if mode == 'trending' and chart_type == 'popular':
+                from recommender.trending import trending_engine
+                songs_data[-1]['trend_score'] = round(trending_engine.score(song.id), 4)
         
-        return jsonify({
+        return json_response({
             'status': 'success',
             'type': chart_type,
+            'mode': mode,
             'data': songs_data,
             'count': len(songs_data)
         })
@@ -4,7 +4,9 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
 from database.models import Song, Rating, PlayHistory
-from database.db_operations import get_system_stats, search_songs, get_top_songs
+from database.db_operations import search_songs, count_search_songs
+from database.system_stats import system_stats
+from recommender.popularity_snapshot import popularity_snapshot
 from utils.validators import Validators
 
 main_bp = Blueprint('main', __name__)
@@ -13,10 +15,10 @@ main_bp = Blueprint('main', __name__)
 def index():
     """首页"""
     # 获取热门歌曲（用于展示）
-    hot_songs = get_top_songs(limit=10)
+    hot_songs = popularity_snapshot.get('popular', limit=10)
     
-    # 获取系统统计
-    stats = get_system_stats()
+    # 获取系统统计（内存缓存）
+    stats = system_stats.get()
     
     return render_template('index.html', 
                          hot_songs=hot_songs,
@@ -36,7 +38,7 @@ def dashboard():
     ).limit(10).all()
     
     # 获取推荐（这里简单实现，实际应该使用推荐算法）
-    recommended_songs = get_top_songs(limit=10)
+    recommended_songs = popularity_snapshot.get('popular', limit=10)
     
     return render_template('dashboard.html',
                          recent_plays=recent_plays,
@@ -132,12 +134,12 @@ def search():
     return render_template('search.html',
                          query=query,
                          results=results,
-                         result_count=len(results))
+                         result_count=count_search_songs(query))
 
 @main_bp.route('/song/<int:song_id>')
 def song_detail(song_id):
     """歌曲详情页"""
-    from database.db_operations import get_song_by_id
+    from database.db_operations import get_song_by_id, get_similar_songs
     
     song = get_song_by_id(song_id)
     
@@ -145,11 +147,8 @@ def song_detail(song_id):
         flash('歌曲不存在', 'danger')
         return redirect(url_for('main.explore'))
     
-    # 获取相似歌曲（基于相同流派）
-    similar_songs = Song.query.filter(
-        Song.genre == song.genre,
-        Song.id != song.id
-    ).order_by(Song.play_count.desc()).limit(10).all()
+    # 获取相似歌曲（基于内容特征索引）
+    similar_songs = get_similar_songs(song.id, limit=10)
     
     # 获取用户评分（如果已登录）
     user_rating = None
@@ -277,7 +276,7 @@ def api_test():
 @main_bp.route('/system_status')
 def system_status():
     """系统状态页面"""
-    stats = get_system_stats()
+    stats = system_stats.get()
     
     return render_template('system_status.html', stats=stats)
 
@@ -33,6 +33,7 @@ def personalized_recommendations():
         recommendations = {
             'hybrid': hybrid_recommender.recommend_by_type(current_user.id, 'hybrid'),
             'collaborative': hybrid_recommender.recommend_by_type(current_user.id, 'collaborative'),
+            'als': hybrid_recommender.recommend_by_type(current_user.id, 'als'),
             'content': hybrid_recommender.recommend_by_type(current_user.id, 'content')
         }
         
@@ -131,7 +132,7 @@ def compare_recommendations():
         hybrid_recommender.train(current_user.id)
         
         # 获取各种算法的推荐结果
-        algorithms = ['hybrid', 'collaborative', 'content', 'popular', 'new', 'high_rated']
+        algorithms = ['hybrid', 'collaborative', 'als', 'content', 'popular', 'new', 'high_rated']
         
         results = {}
         for algo in algorithms:
@@ -0,0 +1,11 @@
+"""
+歌曲搜索模块初始化
+"""
+from search.song_search import SongSearch, song_search
+from search.fts import FTS5SongIndex
+from search.memory_index import MemorySongIndex
+from search.suggest import SuggestIndex, suggest_index
+from search.fuzzy import FuzzyIndex, fuzzy_index
+
+__all__ = ['SongSearch', 'song_search', 'FTS5SongIndex', 'MemorySongIndex', 'SuggestIndex', 'suggest_index',
+           'FuzzyIndex', 'fuzzy_index']
@@ -0,0 +1,146 @@
+"""
+SQLite FTS5 歌曲全文索引
+
+songs_fts 是以 songs 表为内容表（external content）的 FTS5 虚拟表，使用 trigram 分词器，
+词在字段中作为子串出现即可匹配（含中文），不区分大小写。songs 表上的 INSERT/DELETE 触发器和只监听
+title/artist/album/genre 的 UPDATE 触发器让索引随歌曲增删改同步；更新播放次数、评分不会触碰索引。
+索引和触发器在第一次使用时（或 upgrade_schema 中）创建，并从 songs 表重建一次。
+
+排序为 BM25（各字段权重见 Config.SEARCH_FIELD_WEIGHTS）乘以播放次数加成
+1 + w · play_count / (play_count + pivot)，总数为一次只扫描命中行的 COUNT 查询。
+少于3个字符的词无法使用三元组索引，只作为附加的 LIKE 条件；查询只含短词时退化为扫描 songs 表，
+按播放次数排序（SongSearch 会把这类查询交给进程内 n-gram 索引）。
+"""
+import threading
+from config import Config
+from search.tokenize import GRAM_SIZE
+
+FTS_TABLE = 'songs_fts'
+SEARCH_FIELDS = ('title', 'artist', 'album', 'genre')
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _index_ddl(songs):
+    """建立 FTS5 表和同步触发器的语句（均可重复执行）"""
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+    delete_old = (f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old_values});")
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='{songs}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {songs} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {songs} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {songs} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+class FTS5SongIndex:
+    """基于 SQLite FTS5 的歌曲搜索"""
+
+    name = 'fts5'
+
+    def __init__(self, field_weights=None, popularity_weight=None, popularity_pivot=None):
+        weights = field_weights or Config.SEARCH_FIELD_WEIGHTS
+        self.field_weights = [float(weights.get(field, 1.0)) for field in SEARCH_FIELDS]
+        self.popularity_weight = float(Config.SEARCH_POPULARITY_WEIGHT if popularity_weight is None
+                                       else popularity_weight)
+        self.popularity_pivot = float(popularity_pivot or Config.SEARCH_POPULARITY_PIVOT)
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def ensure_index(self):
+        """索引表或任一触发器不存在时创建并从 songs 表重建，返回索引是否可用"""
+        if self.ready:
+            return True
+        from sqlalchemy import text, bindparam
+        from database.models import db, Song
+        names = [FTS_TABLE] + [f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au')]
+        with self._lock:
+            if self.ready:
+                return True
+            try:
+                with db.engine.begin() as conn:
+                    existing = {row[0] for row in conn.execute(
+                        text("SELECT name FROM sqlite_master WHERE name IN :names").bindparams(
+                            bindparam('names', expanding=True)), {'names': names})}
+                    if len(existing) < len(names):
+                        for statement in _index_ddl(Song.__tablename__):
+                            conn.execute(text(statement))
+                        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                        count = conn.execute(text(f"SELECT count(*) FROM {Song.__tablename__}")).scalar()
+                        print(f"✅ 全文索引建立完成: {count}首歌曲")
+                self.ready = True
+            except Exception as e:
+                print(f"❌ 建立全文索引错误: {e}")
+        return self.ready
+
+    def _rank_sql(self):
+        weights = ', '.join(repr(w) for w in self.field_weights)
+        play_count = 'COALESCE(s.play_count, 0)'
+        # bm25() 越小越相关（负数），乘以播放次数加成后仍是越小越靠前
+        return (f"bm25({FTS_TABLE}, {weights}) * "
+                f"(1.0 + {self.popularity_weight!r} * {play_count} / ({play_count} + {self.popularity_pivot!r}))")
+
+    def _where(self, terms):
+        """返回 (是否使用全文索引, 是否需要 songs 表上的 LIKE 条件, WHERE 条件, 参数)"""
+        long_terms = [term for term in terms if len(term) >= GRAM_SIZE]
+        conditions, params = [], {}
+        if long_terms:
+            conditions.append(f"{FTS_TABLE} MATCH :match")
+            params['match'] = ' '.join('"' + term.replace('"', '""') + '"' for term in long_terms)
+        short_terms = [term for term in terms if len(term) < GRAM_SIZE]
+        for i, term in enumerate(short_terms):
+            params[f'p{i}'] = f'%{_escape_like(term)}%'
+            conditions.append('(' + ' OR '.join(
+                f"s.{field} LIKE :p{i} ESCAPE '\\'" for field in SEARCH_FIELDS) + ')')
+        return bool(long_terms), bool(short_terms), ' AND '.join(conditions), params
+
+    def search(self, terms, limit=20, offset=0):
+        """返回按相关度排序的歌曲ID列表"""
+        from sqlalchemy import text
+        from database.models import db, Song
+        songs = Song.__tablename__
+        try:
+            use_fts, _, where, params = self._where(terms)
+            if use_fts:
+                sql = (f"SELECT s.id FROM {FTS_TABLE} JOIN {songs} AS s ON s.id = {FTS_TABLE}.rowid "
+                       f"WHERE {where} ORDER BY {self._rank_sql()}, s.id LIMIT :limit OFFSET :offset")
+            else:
+                sql = (f"SELECT s.id FROM {songs} AS s WHERE {where} "
+                       f"ORDER BY s.play_count DESC, s.id LIMIT :limit OFFSET :offset")
+            params.update(limit=int(limit), offset=int(offset))
+            return [row[0] for row in db.session.execute(text(sql), params)]
+        except Exception as e:
+            print(f"❌ 全文搜索错误: {e}")
+            db.session.rollback()
+            return []
+
+    def count(self, terms):
+        """命中的歌曲总数"""
+        from sqlalchemy import text
+        from database.models import db, Song
+        try:
+            use_fts, use_like, where, params = self._where(terms)
+            if use_fts and not use_like:
+                sql = f"SELECT count(*) FROM {FTS_TABLE} WHERE {where}"
+            elif use_fts:
+                sql = (f"SELECT count(*) FROM {FTS_TABLE} JOIN {Song.__tablename__} AS s "
+                       f"ON s.id = {FTS_TABLE}.rowid WHERE {where}")
+            else:
+                sql = f"SELECT count(*) FROM {Song.__tablename__} AS s WHERE {where}"
+            return db.session.execute(text(sql), params).scalar() or 0
+        except Exception as e:
+            print(f"❌ 全文搜索计数错误: {e}")
+            db.session.rollback()
+            return 0
+
+    def add_songs(self, songs):
+        """由触发器同步，无需处理"""
+        return 0
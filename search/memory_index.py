@@ -0,0 +1,239 @@
+"""
+进程内 n-gram 倒排索引
+
+索引键为字段（及其拼音文本）中的单字、二字和三字片段（见 search.tokenize），倒排列表是按歌曲ID升序的
+紧凑整数数组（array('i')，每个ID 4字节）。查询时取全部搜索词的索引键，从最短的倒排列表开始
+用二分查找逐个求交集，只对交集中的少量候选校验子串，耗时与命中数相关，与曲库大小无关。
+
+非 SQLite 数据库或 SQLite 未编译 FTS5 时作为全部搜索的索引；在 SQLite 上，FTS5 trigram 索引
+无法处理的查询（含少于3个字符的词，如 "周杰"，或需要按拼音匹配的词）也由本索引完成。
+排序与 FTS5 索引相同：BM25 乘以播放次数加成，BM25 的文档频率用该词最短倒排列表的长度估计。
+
+首次使用时从数据库加载，batch_add_songs 写入的新歌增量加入（复制后替换倒排数组，读者不受影响）；
+超过 Config.SEARCH_INDEX_RELOAD_SECONDS 后在后台线程中从数据库重建，以合并其他进程的修改和最新的播放次数。
+重建期间加入的新歌同时记下，新索引替换旧索引时再加入一次（重建读取的可能是加入之前的数据）。
+"""
+import heapq
+import math
+import time
+import threading
+from array import array
+from bisect import bisect_left
+import numpy as np
+from config import Config
+from database.background import BackgroundRefresher
+from search.tokenize import text_grams, term_grams, text_length, pinyin_text, is_pinyin_term
+from search.fts import SEARCH_FIELDS
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _intersect(candidates, posting):
+    """有序ID数组 candidates 中同时出现在有序倒排数组 posting 里的ID（对 posting 二分查找）"""
+    values = np.frombuffer(posting, dtype=np.int32)
+    positions = np.searchsorted(values, candidates)
+    positions[positions == len(values)] = 0
+    return candidates[values[positions] == candidates]
+
+
+class MemorySongIndex:
+    """进程内的歌曲搜索索引（线程安全）"""
+
+    name = 'memory'
+
+    def __init__(self, field_weights=None, popularity_weight=None, popularity_pivot=None):
+        weights = field_weights or Config.SEARCH_FIELD_WEIGHTS
+        self.field_weights = [float(weights.get(field, 1.0)) for field in SEARCH_FIELDS]
+        self.popularity_weight = float(Config.SEARCH_POPULARITY_WEIGHT if popularity_weight is None
+                                       else popularity_weight)
+        self.popularity_pivot = float(popularity_pivot or Config.SEARCH_POPULARITY_PIVOT)
+
+        self._docs = {}             # song_id -> (各字段小写文本, 各字段拼音文本, 播放次数)
+        self._postings = {}         # 索引键 -> array('i')，歌曲ID升序
+        self._total_length = 0      # 全部歌曲的文本总长度（三元组数），用于平均长度
+        self.loaded_at = None
+        self._pending = None        # 重建期间加入的 (歌曲ID, 文档)，新索引替换时补上
+        self._refresher = BackgroundRefresher('search-index', '搜索索引')
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    @staticmethod
+    def _document(song):
+        """歌曲 -> (各字段小写文本, 各字段拼音文本, 播放次数)"""
+        fields = tuple((getattr(song, field) or '').lower() for field in SEARCH_FIELDS)
+        return fields, tuple(pinyin_text(text) for text in fields), song.play_count or 0
+
+    @staticmethod
+    def _grams(doc):
+        grams = set()
+        for text in doc[0] + doc[1]:
+            grams |= text_grams(text)
+        return grams
+
+    def build(self, rows):
+        """由歌曲行（id/title/artist/album/genre/play_count）建立索引，替换原有内容"""
+        docs, lists, total_length = {}, {}, 0
+        for row in sorted(rows, key=lambda row: row.id):
+            doc = self._document(row)
+            docs[row.id] = doc
+            total_length += sum(text_length(text) for text in doc[0])
+            for gram in self._grams(doc):
+                posting = lists.get(gram)
+                if posting is None:
+                    lists[gram] = [row.id]
+                else:
+                    posting.append(row.id)
+        postings = {gram: array('i', ids) for gram, ids in lists.items()}
+        with self._lock:
+            self._docs, self._postings, self._total_length = docs, postings, total_length
+            self.loaded_at = time.time()
+            pending, self._pending = self._pending, None
+            if pending:
+                self._add_documents(pending)
+        return self
+
+    def load(self):
+        """从数据库重建索引（一次查询）"""
+        from database.models import db, Song
+        with self._lock:
+            self._pending = []
+        try:
+            rows = db.session.query(
+                Song.id, Song.title, Song.artist, Song.album, Song.genre, Song.play_count
+            ).all()
+        except Exception as e:
+            print(f"❌ 搜索索引加载错误: {e}")
+            db.session.rollback()
+            with self._lock:
+                self._pending = None
+            return False
+
+        self.build(rows)
+        entries = sum(len(posting) for posting in self._postings.values())
+        print(f"✅ 搜索索引加载完成: {len(self._docs)}首歌曲, {len(self._postings)}个索引键, "
+              f"倒排数组 {entries * 4 / 1024 / 1024:.1f}MB")
+        return True
+
+    def _reload(self):
+        """后台重建（与首次同步加载互斥）"""
+        with self._load_lock:
+            self.load()
+
+    def ensure_index(self, max_age=None):
+        """未加载时同步加载；超过 max_age 秒时在后台重建，期间继续使用旧索引"""
+        max_age = Config.SEARCH_INDEX_RELOAD_SECONDS if max_age is None else max_age
+        if self.is_loaded:
+            if time.time() - self.loaded_at >= max_age:
+                self._refresher.trigger(self._reload)
+            return True
+        with self._load_lock:
+            return self.is_loaded or self.load()
+
+    def add_songs(self, songs):
+        """新增或修改的歌曲写入索引，返回处理的歌曲数"""
+        if not songs or (not self.is_loaded and self._pending is None):
+            return 0
+        documents = [(int(song.id), self._document(song)) for song in songs]
+        with self._lock:
+            if self._pending is not None:  # 正在重建：新索引替换时再加入一次
+                self._pending.extend(documents)
+            if not self.is_loaded:
+                return 0
+            self._add_documents(documents)
+        return len(documents)
+
+    def _add_documents(self, documents):
+        """(歌曲ID, 文档) 写入索引，已有的歌曲按新文档替换（调用方持有 self._lock）"""
+        postings = self._postings
+        for song_id, doc in documents:
+            old = self._docs.get(song_id)
+            old_grams = set()
+            if old is not None:
+                old_grams = self._grams(old)
+                self._total_length -= sum(text_length(text) for text in old[0])
+            new_grams = self._grams(doc)
+
+            # 倒排数组复制后整体替换，正在查询的读者仍使用旧数组
+            for gram in old_grams - new_grams:
+                posting = array('i', postings[gram])
+                posting.pop(bisect_left(posting, song_id))
+                postings[gram] = posting
+            for gram in new_grams - old_grams:
+                posting = array('i', postings.get(gram, ()))
+                posting.insert(bisect_left(posting, song_id), song_id)
+                postings[gram] = posting
+            self._docs[song_id] = doc
+            self._total_length += sum(text_length(text) for text in doc[0])
+
+    @staticmethod
+    def _matches(doc, term):
+        if any(term in text for text in doc[0]):
+            return True
+        return is_pinyin_term(term) and any(term in text for text in doc[1])
+
+    def _candidates(self, terms):
+        """返回 (匹配全部词的歌曲ID列表, 各词的估计文档频率)"""
+        postings, docs = self._postings, self._docs
+        lists, frequencies = [], []
+        for term in terms:
+            term_lists = [postings.get(gram, ()) for gram in term_grams(term)]
+            frequencies.append(min(len(posting) for posting in term_lists))
+            lists.extend(term_lists)
+        lists.sort(key=len)
+        if not lists or not lists[0]:
+            return [], frequencies
+
+        # 从最短的倒排数组开始逐个求交集
+        candidates = np.frombuffer(lists[0], dtype=np.int32)
+        for posting in lists[1:]:
+            candidates = _intersect(candidates, posting)
+            if not len(candidates):
+                return [], frequencies
+
+        matched = []
+        for song_id in candidates.tolist():
+            doc = docs.get(song_id)
+            if doc is not None and all(self._matches(doc, term) for term in terms):
+                matched.append(song_id)
+        return matched, frequencies
+
+    def search(self, terms, limit=20, offset=0):
+        """返回按相关度排序的歌曲ID列表"""
+        if not terms or not self.ensure_index():
+            return []
+        matched, frequencies = self._candidates(terms)
+        if not matched:
+            return []
+
+        docs = self._docs
+        n = max(len(docs), 1)
+        average = self._total_length / n or 1.0
+        idfs = [math.log(1 + (n - df + 0.5) / (df + 0.5)) for df in frequencies]
+        scored = []
+        for song_id in matched:
+            doc = docs.get(song_id)
+            if doc is None:  # 期间索引被重建且歌曲已删除
+                continue
+            fields, pinyins, play_count = doc
+            # 与 FTS5 的 bm25() 相同：词频按字段权重加权求和，长度归一化使用整首歌曲的三元组数
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(text_length(text) for text in fields) / average)
+            score = 0.0
+            for term, idf in zip(terms, idfs):
+                tf = sum(weight * text.count(term) for text, weight in zip(fields, self.field_weights))
+                if not tf and is_pinyin_term(term):
+                    tf = sum(weight * text.count(term) for text, weight in zip(pinyins, self.field_weights))
+                score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            score *= 1.0 + self.popularity_weight * play_count / (play_count + self.popularity_pivot)
+            scored.append((-score, song_id))
+        return [song_id for _, song_id in heapq.nsmallest(offset + limit, scored)[offset:]]
+
+    def count(self, terms):
+        """命中的歌曲总数"""
+        if not terms or not self.ensure_index():
+            return 0
+        return len(self._candidates(terms)[0])
@@ -0,0 +1,97 @@
+"""
+歌曲搜索入口
+
+按 Config.SEARCH_BACKEND 选择索引：auto 在 SQLite 上使用 FTS5 索引（SQLite 未编译 FTS5 时退回进程内索引），
+其他数据库使用进程内 n-gram 倒排索引；fts5 / memory 强制使用指定的索引。两种索引的匹配语义和排序方式相同。
+
+使用 FTS5 时，trigram 索引查不了的查询交给进程内 n-gram 索引（首次需要时加载）：
+含少于3个字符的词（如 "周杰"，否则只能扫描 songs 表），以及 FTS5 没有结果、可能是拼音的纯字母查询（如 "qilixiang"）。
+"""
+import threading
+from config import Config
+from search.tokenize import GRAM_SIZE, parse_terms, pinyin_enabled, is_pinyin_term
+from search.fts import FTS5SongIndex
+from search.memory_index import MemorySongIndex
+
+SEARCH_BACKENDS = ('auto', 'fts5', 'memory')
+
+
+class SongSearch:
+    """全进程共享的歌曲搜索（首次使用时选择并建立索引）"""
+
+    def __init__(self, backend=None):
+        self.backend_name = backend or Config.SEARCH_BACKEND
+        if self.backend_name not in SEARCH_BACKENDS:
+            raise ValueError(f"未知的搜索索引: {self.backend_name}")
+        self._index = None
+        self._ngram_index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._create_index()
+        return self._index
+
+    def _create_index(self):
+        from database.models import db
+        if self.backend_name != 'memory' and db.engine.dialect.name == 'sqlite':
+            index = FTS5SongIndex()
+            if index.ensure_index():
+                return index
+            print("⚠️ FTS5 不可用，使用进程内搜索索引")
+        return MemorySongIndex()
+
+    @property
+    def ngram_index(self):
+        """进程内 n-gram 索引；主索引就是进程内索引时直接复用"""
+        if isinstance(self.index, MemorySongIndex):
+            return self.index
+        if self._ngram_index is None:
+            with self._lock:
+                if self._ngram_index is None:
+                    self._ngram_index = MemorySongIndex()
+        return self._ngram_index
+
+    def _index_for(self, terms):
+        """选择处理这组搜索词的索引"""
+        index = self.index
+        if isinstance(index, MemorySongIndex):
+            return index
+        if any(len(term) < GRAM_SIZE for term in terms):
+            return self.ngram_index
+        if pinyin_enabled() and any(is_pinyin_term(term) for term in terms) and not index.count(terms):
+            return self.ngram_index
+        return index
+
+    def ensure_index(self):
+        """建立索引（应用启动时调用，避免第一次搜索时等待建索引）"""
+        return self.index.ensure_index()
+
+    def search(self, query, limit=20, offset=0):
+        """返回按相关度排序的歌曲ID列表"""
+        terms = parse_terms(query)
+        if not terms:
+            return []
+        return self._index_for(terms).search(terms, limit=limit, offset=offset)
+
+    def count(self, query):
+        """命中的歌曲总数"""
+        terms = parse_terms(query)
+        if not terms:
+            return 0
+        return self._index_for(terms).count(terms)
+
+    def add_songs(self, songs):
+        """新增或修改歌曲后同步已加载的进程内索引（FTS5 由触发器同步）"""
+        added = 0
+        for index in (self._index, self._ngram_index):
+            if index is not None:
+                added = index.add_songs(songs) or added
+        return added
+
+
+# 全进程共享的歌曲搜索
+song_search = SongSearch()
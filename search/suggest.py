@@ -0,0 +1,246 @@
+"""
+搜索框输入提示（前缀补全）
+
+把歌曲标题、歌手、专辑和流派规范化（NFKC、转小写、合并空白）后放进一个有序数组，
+每个条目在完整文本和其中每个单词的起始位置各有一个键（如 "shape of you" 也能由 "you" 补全）。
+查询前缀时用两次 bisect 找到键的区间，在区间内取热度（播放次数，歌手/专辑/流派为其全部歌曲之和）最高的几个。
+区间较大（多于 Config.SUGGEST_CACHE_RANGE 个键）的前缀在建索引时自底向上预先算好结果，
+因此任何前缀的查询都只扫描小区间或直接读缓存，单次查询在1毫秒以内。
+
+batch_add_songs 写入的新歌增量插入有序数组；热度随播放变化，超过 Config.SUGGEST_RELOAD_SECONDS 后
+在后台线程中从数据库重建，重建期间继续使用旧数组。重建期间插入的新歌同时记下，新数组替换时再插入一次。
+"""
+import heapq
+import time
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from config import Config
+from database.background import BackgroundRefresher
+
+SUGGEST_KINDS = ('title', 'artist', 'album', 'genre')
+KEY_END = '\U0010ffff'  # 大于任何字符，前缀区间为 [prefix, prefix + KEY_END)
+
+# 重建期间记下的新歌（只保留建索引需要的列，与 ORM 对象和会话无关）
+SongRow = namedtuple('SongRow', 'id title artist album genre play_count')
+
+
+def normalize(text):
+    """规范化文本：全角转半角、统一大小写、合并连续空白"""
+    return ' '.join(unicodedata.normalize('NFKC', text or '').casefold().split())
+
+
+def _lookup_keys(text):
+    """条目的全部查找键：完整文本和每个单词开头的后缀"""
+    key = normalize(text)
+    if not key:
+        return []
+    keys = [key]
+    for i, ch in enumerate(key):
+        if ch == ' ':
+            keys.append(key[i + 1:])
+    return keys
+
+
+def _rank_key(entries):
+    """条目排序：热度从高到低，同热度时文本短的在前"""
+    def key(ref):
+        entry = entries[ref]
+        return -entry[2], len(entry[1]), ref
+    return key
+
+
+class SuggestIndex:
+    """基于有序数组 + bisect 的前缀补全索引（线程安全）"""
+
+    def __init__(self, cache_range=None, reload_seconds=None):
+        self.cache_range = cache_range or Config.SUGGEST_CACHE_RANGE
+        self.reload_seconds = reload_seconds or Config.SUGGEST_RELOAD_SECONDS
+
+        self._keys = []             # 有序的查找键
+        self._refs = []             # 与 _keys 对应的条目下标
+        self._entries = []          # [类型, 文本, 热度, 歌曲ID, 歌手]
+        self._lookup = {}           # (类型, 歌曲ID/规范化文本) -> 条目下标，歌手/专辑/流派合并同名
+        self._cache = {}            # 前缀 -> 按热度排序的条目下标（区间较大的前缀）
+        self._pending = None        # 重建期间插入的 SongRow，新数组替换时补上
+        self.loaded_at = None
+        self._refresher = BackgroundRefresher('suggest-index', '输入提示索引')
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.loaded_at is not None
+
+    def _add(self, entries, lookup, pairs, song):
+        """把一首歌曲的标题/歌手/专辑/流派加入条目表，新条目的 (键, 条目下标) 追加到 pairs，返回涉及的条目下标"""
+        play_count = song.play_count or 0
+        touched = []
+        for kind in SUGGEST_KINDS:
+            text = getattr(song, kind)
+            normalized = normalize(text)
+            if not normalized:
+                continue
+            # 标题每首歌单独一条（带歌曲ID），其余按名称合并并累加热度
+            lookup_key = (kind, song.id if kind == 'title' else normalized)
+            ref = lookup.get(lookup_key)
+            if ref is not None:
+                entries[ref][2] += play_count
+                touched.append(ref)
+                continue
+            ref = len(entries)
+            entries.append([kind, text.strip(), play_count,
+                            song.id if kind == 'title' else None,
+                            song.artist if kind in ('title', 'album') else None])
+            lookup[lookup_key] = ref
+            pairs.extend((key, ref) for key in _lookup_keys(text))
+            touched.append(ref)
+        return touched
+
+    def load(self):
+        """从数据库重建索引（一次查询）"""
+        from database.models import db, Song
+        with self._lock:
+            self._pending = []
+        try:
+            rows = db.session.query(
+                Song.id, Song.title, Song.artist, Song.album, Song.genre, Song.play_count
+            ).all()
+        except Exception as e:
+            print(f"❌ 输入提示索引加载错误: {e}")
+            db.session.rollback()
+            with self._lock:
+                self._pending = None
+            return False
+
+        self.build(rows)
+        print(f"✅ 输入提示索引加载完成: {len(self._entries)}个条目, {len(self._keys)}个查找键")
+        return True
+
+    def build(self, rows):
+        """由歌曲行（id/title/artist/album/genre/play_count）建立索引，替换原有内容"""
+        entries, lookup, pairs = [], {}, []
+        for row in rows:
+            self._add(entries, lookup, pairs, row)
+        pairs.sort()
+        keys = [key for key, _ in pairs]
+        refs = [ref for _, ref in pairs]
+        cache = {}
+        if len(keys) > self.cache_range:
+            self._precompute(keys, refs, _rank_key(entries), cache, '', 0, len(keys))
+        with self._lock:
+            self._keys, self._refs = keys, refs
+            self._entries, self._lookup = entries, lookup
+            self._cache = cache
+            self.loaded_at = time.time()
+            pending, self._pending = self._pending, None
+            if pending:
+                self._insert(pending)
+        return self
+
+    def _precompute(self, keys, refs, rank_key, cache, prefix, lo, hi):
+        """自底向上预先计算区间较大的前缀的结果：父前缀合并各个子前缀（下一个字符）的结果，
+        总耗时与键数成正比，查询时不必扫描大区间"""
+        candidates = []
+        depth = len(prefix)
+        pos = lo
+        while pos < hi and len(keys[pos]) == depth:  # 与前缀完全相同的键排在区间最前
+            candidates.append(refs[pos])
+            pos += 1
+        while pos < hi:
+            child = prefix + keys[pos][depth]
+            end = bisect_left(keys, child + KEY_END, pos, hi)
+            if end - pos > self.cache_range:
+                candidates.extend(self._precompute(keys, refs, rank_key, cache, child, pos, end))
+            else:
+                candidates.extend(refs[pos:end])
+            pos = end
+        ranked = heapq.nsmallest(Config.SUGGEST_MAX_LIMIT, set(candidates), key=rank_key)
+        if prefix:
+            cache[prefix] = ranked
+        return ranked
+
+    def _reload(self):
+        """后台重建（与首次同步加载互斥）"""
+        with self._load_lock:
+            self.load()
+
+    def ensure_index(self):
+        """未加载时同步加载，已过期时后台重建"""
+        if self.is_loaded:
+            if time.time() - self.loaded_at >= self.reload_seconds:
+                self._refresher.trigger(self._reload)
+            return True
+        with self._load_lock:
+            return self.is_loaded or self.load()
+
+    def add_songs(self, songs):
+        """新歌的条目插入有序数组（只插入新条目，已存在的歌手/专辑/流派累加热度），返回新增的键数"""
+        if not songs or (not self.is_loaded and self._pending is None):
+            return 0
+        rows = [SongRow(song.id, song.title, song.artist, song.album, song.genre, song.play_count)
+                for song in songs]
+        with self._lock:
+            if self._pending is not None:  # 正在重建：新数组替换时再插入一次
+                self._pending.extend(rows)
+            if not self.is_loaded:
+                return 0
+            return self._insert(rows)
+
+    def _insert(self, rows):
+        """插入索引中还没有的歌曲，返回新增的键数（调用方持有 self._lock）"""
+        pairs, touched = [], set()
+        for row in rows:
+            if ('title', row.id) not in self._lookup:
+                touched.update(self._add(self._entries, self._lookup, pairs, row))
+        for key, ref in sorted(pairs):
+            i = bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._refs.insert(i, ref)
+        for ref in touched:
+            self._update_cache(ref)
+        return len(pairs)
+
+    def _update_cache(self, ref):
+        """新增或热度变化的条目并入已缓存的各个前缀的结果（调用方持有 self._lock）"""
+        for key in _lookup_keys(self._entries[ref][1]):
+            for end in range(1, len(key) + 1):
+                cached = self._cache.get(key[:end])
+                if cached is None:
+                    continue
+                ranked = sorted(set(cached) | {ref}, key=_rank_key(self._entries))
+                self._cache[key[:end]] = ranked[:Config.SUGGEST_MAX_LIMIT]
+
+    def _ranked(self, prefix, limit):
+        """前缀区间内按热度排序的前 limit 个条目下标（调用方持有 self._lock）"""
+        cached = self._cache.get(prefix)
+        if cached is not None:
+            return cached[:limit]
+
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + KEY_END, lo)
+        # 建索引时已缓存全部大区间，这里只会遇到小区间或增量插入后变大的区间
+        cacheable = hi - lo > self.cache_range
+        refs = set(self._refs[lo:hi])  # 同一条目可能有多个键落在区间内
+        ranked = heapq.nsmallest(Config.SUGGEST_MAX_LIMIT if cacheable else limit, refs,
+                                 key=_rank_key(self._entries))
+        if cacheable:
+            self._cache[prefix] = ranked
+        return ranked[:limit]
+
+    def suggest(self, query, limit=None):
+        """返回前缀补全 [{type, text, song_id, artist, popularity}]，按热度从高到低"""
+        limit = max(1, min(limit or Config.SUGGEST_LIMIT, Config.SUGGEST_MAX_LIMIT))
+        prefix = normalize(query)
+        if not prefix or not self.ensure_index():
+            return []
+        with self._lock:
+            entries = self._entries
+            rows = [entries[ref] for ref in self._ranked(prefix, limit)]
+            return [{'type': kind, 'text': text, 'song_id': song_id, 'artist': artist, 'popularity': popularity}
+                    for kind, text, popularity, song_id, artist in rows]
+
+
+# 全进程共享的输入提示索引
+suggest_index = SuggestIndex()
@@ -0,0 +1,85 @@
+"""
+搜索词切分与索引键（适用于中日韩文字）
+
+查询按空白切分为若干词（全部需要匹配，不区分大小写），每个词在标题、歌手、专辑、流派任一字段中
+作为子串出现即算匹配，与原来的 ILIKE '%q%' 语义一致。中文没有空格分词，因此不做分词，
+字段中连续的非空白字符按单字、二字（bigram）、三字（trigram）生成索引键：长度为1或2的词
+（如 "周杰"）直接对应一个键，更长的词用它的各个三元组求交集得到候选，再校验子串。
+
+安装 pypinyin 且开启 Config.SEARCH_PINYIN 时，含汉字的字段另外生成拼音文本 "全拼 首字母"
+（七里香 -> "qilixiang qlx"），同样生成索引键，纯字母的词（如 "qilixiang"、"zhoujie"、"qlx"）也可以匹配拼音。
+"""
+from config import Config
+
+try:
+    from pypinyin import lazy_pinyin
+    PINYIN_AVAILABLE = True
+except ImportError:
+    PINYIN_AVAILABLE = False
+
+GRAM_SIZE = 3
+
+# 中日韩统一表意文字（含扩展A/B、兼容表意文字）、日文假名和韩文音节
+CJK_RANGES = (
+    (0x3040, 0x30ff), (0x3400, 0x4dbf), (0x4e00, 0x9fff), (0xac00, 0xd7af),
+    (0xf900, 0xfaff), (0x20000, 0x2a6df),
+)
+
+
+def is_cjk(ch):
+    code = ord(ch)
+    return any(lo <= code <= hi for lo, hi in CJK_RANGES)
+
+
+def parse_terms(query, max_terms=None):
+    """把查询切分为小写、去重的搜索词；被其他词包含的短词是多余的条件，直接去掉"""
+    max_terms = max_terms or Config.SEARCH_MAX_TERMS
+    terms = []
+    for term in (query or '').lower().split():
+        if term not in terms:
+            terms.append(term)
+    terms = [term for term in terms if not any(term != other and term in other for other in terms)]
+    return terms[:max_terms]
+
+
+def text_grams(text):
+    """文本（已转小写）中所有不跨空白的单字、二字和三字片段"""
+    grams = set()
+    for run in text.split():
+        for size in range(1, GRAM_SIZE + 1):
+            for i in range(len(run) - size + 1):
+                grams.add(run[i:i + size])
+    return grams
+
+
+def text_length(text):
+    """字段文本在三元组分词下的长度（与 FTS5 trigram 分词器的词元数相同）"""
+    return max(len(text) - GRAM_SIZE + 1, 0)
+
+
+def term_grams(term):
+    """查找搜索词候选所用的索引键：包含该词的文本一定包含这些键中的每一个"""
+    if len(term) < GRAM_SIZE:
+        return {term}
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+def pinyin_enabled():
+    return PINYIN_AVAILABLE and Config.SEARCH_PINYIN
+
+
+def is_pinyin_term(term):
+    """纯字母的词可能是拼音"""
+    return term.isascii() and term.isalpha()
+
+
+def pinyin_text(text):
+    """含汉字的文本（已转小写）的拼音文本 "全拼 首字母"；不含汉字或未启用拼音时为空字符串"""
+    if not pinyin_enabled() or not any(is_cjk(ch) for ch in text):
+        return ''
+    syllables = []
+    for segment in lazy_pinyin(text):  # 非汉字部分原样返回
+        syllables.extend(segment.lower().split())
+    if not syllables:
+        return ''
+    return ''.join(syllables) + ' ' + ''.join(syllable[0] for syllable in syllables)
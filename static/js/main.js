@@ -3,6 +3,10 @@ class MusicRecApp {
     constructor() {
         this.baseUrl = '';
         this.csrfToken = document.querySelector('meta[name="csrf-token"]')?.content || '';
+        this.suggestCache = new Map();  // 规范化前缀 -> {time, items}
+        this.suggestCacheSize = 200;
+        this.suggestCacheTTL = 60000;   // 与接口的 Cache-Control max-age 一致
+        this.suggestController = null;
     }
 
     // 显示Toast消息
@@ -130,6 +134,63 @@ class MusicRecApp {
         return stars;
     }
 
+    // 与服务端一致的规范化：全角转半角、统一大小写、合并空白
+    normalizeQuery(text) {
+        return (text || '').normalize('NFKC').toLowerCase().trim().replace(/\s+/g, ' ');
+    }
+
+    // 搜索框输入提示；返回 null 表示请求已被更新的输入取消
+    async suggest(query, limit = 8) {
+        const key = this.normalizeQuery(query);
+        if (!key) return [];
+
+        const now = Date.now();
+        const cached = this.suggestCache.get(key);
+        if (cached && now - cached.time < this.suggestCacheTTL) return cached.items;
+
+        // 更短的前缀已拿到全部补全（不足 limit 条）时，在本地过滤即可，不必请求
+        for (let end = key.length - 1; end > 0; end--) {
+            const shorter = this.suggestCache.get(key.slice(0, end));
+            if (shorter && now - shorter.time < this.suggestCacheTTL && shorter.items.length < limit) {
+                const items = shorter.items.filter(item => {
+                    const text = this.normalizeQuery(item.text);
+                    return text.startsWith(key) || text.includes(' ' + key);
+                });
+                this.cacheSuggestions(key, items);
+                return items;
+            }
+        }
+
+        // 只保留最新一次输入的请求
+        if (this.suggestController) this.suggestController.abort();
+        this.suggestController = new AbortController();
+        try {
+            const response = await fetch(`/api/suggest?q=${encodeURIComponent(key)}&limit=${limit}`, {
+                headers: { 'Accept': 'application/json' },
+                credentials: 'same-origin',
+                signal: this.suggestController.signal
+            });
+            if (!response.ok) return [];
+            const result = await response.json();
+            const items = result.data || [];
+            this.cacheSuggestions(key, items);
+            return items;
+        } catch (error) {
+            if (error.name === 'AbortError') return null;
+            console.warn('获取输入提示失败:', error);
+            return [];
+        }
+    }
+
+    cacheSuggestions(key, items) {
+        this.suggestCache.delete(key);
+        this.suggestCache.set(key, { time: Date.now(), items });
+        // Map 按插入顺序迭代，超出容量时淘汰最早的前缀
+        while (this.suggestCache.size > this.suggestCacheSize) {
+            this.suggestCache.delete(this.suggestCache.keys().next().value);
+        }
+    }
+
     // 防抖函数
     debounce(func, wait) {
         let timeout;
@@ -186,6 +247,138 @@ async function checkSystemStatus() {
     }
 }
 
+// 播放记录队列：播放先存入 localStorage，攒够一批或定时通过 /api/plays/batch 上报，
+// 每条带幂等键，失败重试或重复上报都不会重复计数
+class PlayQueue {
+    constructor(options = {}) {
+        this.url = options.url || '/api/plays/batch';
+        this.storageKey = options.storageKey || 'pendingPlays';
+        this.batchSize = options.batchSize || 20;        // 攒够多少条立即上报
+        this.flushInterval = options.flushInterval || 30000;
+        this.maxPending = options.maxPending || 500;      // 本地最多缓存的条数
+        this.retryDelay = this.flushInterval;
+        this.flushing = false;
+        this.stopped = false;  // 登录已过期：保留记录，不再上报，重新登录后打开页面时再上报
+        this.timer = null;
+        this.exitHooks = [];  // 页面关闭前执行（如记录正在播放的歌曲）
+        
+        this.scheduleFlush(1000);  // 上报上次页面遗留的播放
+        window.addEventListener('pagehide', () => {
+            this.exitHooks.forEach(hook => hook());
+            this.flushOnExit();
+        });
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') this.flushOnExit();
+        });
+    }
+    
+    load() {
+        try {
+            return JSON.parse(localStorage.getItem(this.storageKey)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+    
+    save(plays) {
+        try {
+            localStorage.setItem(this.storageKey, JSON.stringify(plays.slice(-this.maxPending)));
+        } catch (error) {
+            console.error('保存播放记录失败:', error);
+        }
+    }
+    
+    newKey() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+    
+    add(songId, durationSeconds = 0, playedAt = Date.now()) {
+        const plays = this.load();
+        plays.push({
+            song_id: songId,
+            played_at: playedAt,
+            duration: Math.max(0, Math.round(durationSeconds)),
+            key: this.newKey()
+        });
+        this.save(plays);
+        
+        if (plays.length >= this.batchSize) {
+            this.flush();
+        } else {
+            this.scheduleFlush(this.flushInterval);
+        }
+    }
+    
+    scheduleFlush(delay) {
+        if (this.timer) return;
+        this.timer = setTimeout(() => {
+            this.timer = null;
+            this.flush();
+        }, delay);
+    }
+    
+    async flush() {
+        if (this.flushing || this.stopped) return;
+        const batch = this.load().slice(0, this.batchSize * 5);
+        if (batch.length === 0) return;
+        
+        this.flushing = true;
+        try {
+            const response = await fetch(this.url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                    'X-Requested-With': 'XMLHttpRequest'
+                },
+                credentials: 'same-origin',
+                body: JSON.stringify({ plays: batch })
+            });
+            
+            const contentType = response.headers.get('Content-Type') || '';
+            if (response.status === 401 || response.redirected ||
+                (response.ok && !contentType.includes('application/json'))) {
+                // 未登录或会话过期（401，或被重定向到登录页返回HTML）：记录留在本地，停止上报
+                console.warn('登录已过期，播放记录将在重新登录后上报');
+                this.stopped = true;
+                return;
+            }
+            const result = response.ok ? await response.json() : null;
+            if (!result || result.success !== true || !result.data) {
+                throw new Error(`HTTP错误: ${response.status}`);
+            }
+            // 服务端已处理本批（写入、重复或无效的条目都在返回结果中），从队列中移除
+            const sent = new Set(batch.map(play => play.key));
+            this.save(this.load().filter(play => !sent.has(play.key)));
+            this.retryDelay = this.flushInterval;
+        } catch (error) {
+            console.error('上报播放记录失败，稍后重试:', error);
+            this.retryDelay = Math.min(this.retryDelay * 2, 10 * 60 * 1000);
+            this.scheduleFlush(this.retryDelay);
+            return;
+        } finally {
+            this.flushing = false;
+        }
+        
+        if (this.load().length > 0) this.scheduleFlush(1000);
+    }
+    
+    onExit(hook) {
+        this.exitHooks.push(hook);
+    }
+    
+    flushOnExit() {
+        // 页面关闭时用 sendBeacon 尽力上报；记录保留在本地，下次打开页面再确认（服务端按幂等键去重）
+        const plays = this.load().slice(0, this.batchSize * 5);
+        if (plays.length === 0 || !navigator.sendBeacon) return;
+        const body = new Blob([JSON.stringify({ plays })], { type: 'application/json' });
+        navigator.sendBeacon(this.url, body);
+    }
+}
+
+window.playQueue = new PlayQueue();
+
 // 音乐播放器模拟
 class MusicPlayer {
     constructor() {
@@ -196,8 +389,10 @@ class MusicPlayer {
         this.volume = 0.8;
         this.playlist = [];
         this.currentIndex = -1;
+        this.playStartedAt = null;
         
         this.initializePlayer();
+        window.playQueue.onExit(() => this.finishCurrentPlay());
     }
     
     initializePlayer() {
@@ -277,7 +472,9 @@ class MusicPlayer {
     play(song) {
         if (!song) return;
         
+        this.finishCurrentPlay();
         this.currentSong = song;
+        this.playStartedAt = Date.now();
         this.currentTime = 0;
         this.duration = song.duration || 180;
         this.isPlaying = true;
@@ -291,9 +488,6 @@ class MusicPlayer {
         
         this.updateProgress();
         
-        // 记录播放历史
-        this.recordPlayHistory(song.id);
-        
         musicRecApp.showToast(`正在播放: ${song.title}`, 'info');
     }
     
@@ -350,17 +544,15 @@ class MusicPlayer {
             musicRecApp.formatDuration(this.currentTime);
     }
     
-    async recordPlayHistory(songId) {
-        try {
-            await musicRecApp.fetchJSON(`/api/songs/${songId}/play`, {
-                method: 'POST'
-            });
-        } catch (error) {
-            console.error('记录播放历史失败:', error);
-        }
+    // 当前歌曲播放结束（切歌/关闭/离开页面）时记录播放历史，时长为实际收听的秒数
+    finishCurrentPlay() {
+        if (!this.currentSong || !this.playStartedAt) return;
+        window.playQueue.add(this.currentSong.id, this.currentTime, this.playStartedAt);
+        this.playStartedAt = null;
     }
     
     close() {
+        this.finishCurrentPlay();
         document.getElementById('music-player').style.display = 'none';
         this.stop();
     }
@@ -442,20 +634,34 @@ function bindGlobalEvents() {
         }
     });
     
-    // 搜索功能
+    // 搜索框输入提示（完整搜索在提交表单时进行）
     const searchInput = document.getElementById('search-input');
-    if (searchInput) {
-        const debouncedSearch = musicRecApp.debounce(async function() {
-            const query = searchInput.value.trim();
-            if (query.length >= 2) {
-                await performSearch(query);
-            }
-        }, 300);
+    const suggestionList = document.getElementById('search-suggestions');
+    if (searchInput && suggestionList) {
+        const debouncedSuggest = musicRecApp.debounce(async function() {
+            const query = searchInput.value;
+            const items = await musicRecApp.suggest(query);
+            // 丢弃已被取消或输入已变化的结果
+            if (items === null || searchInput.value !== query) return;
+            renderSuggestions(suggestionList, items);
+        }, 150);
         
-        searchInput.addEventListener('input', debouncedSearch);
+        searchInput.addEventListener('input', debouncedSuggest);
     }
 }
 
+const SUGGESTION_TYPES = { title: '歌曲', artist: '歌手', album: '专辑', genre: '流派' };
+
+function renderSuggestions(list, items) {
+    list.innerHTML = '';
+    items.forEach(item => {
+        const option = document.createElement('option');
+        option.value = item.text;
+        option.label = SUGGESTION_TYPES[item.type] + (item.artist ? ` · ${item.artist}` : '');
+        list.appendChild(option);
+    });
+}
+
 // 搜索函数
 async function performSearch(query) {
     try {
@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_context():
+    """不连接数据库的最小应用上下文（后台刷新和候选来源需要）"""
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    """使用临时 SQLite 数据库的应用（已建表），在应用上下文中返回"""
+    from config import Config
+    from database.models import db
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
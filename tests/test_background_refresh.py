@@ -0,0 +1,69 @@
+"""后台刷新：同一时间只有一个刷新线程，刷新期间读取方继续使用旧数据"""
+import threading
+from database.background import BackgroundRefresher
+from recommender.popularity_snapshot import PopularitySnapshot
+
+
+def test_single_refresh_at_a_time(app_context):
+    refresher = BackgroundRefresher('test-refresh', '测试')
+    release = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+
+    assert refresher.trigger(refresh)
+    assert not refresher.trigger(refresh)
+    assert refresher.is_running
+    release.set()
+    assert refresher.join(5)
+    assert refresher.trigger(refresh)
+    assert refresher.join(5)
+    assert len(calls) == 2
+
+
+def test_failed_refresh_can_be_retried(app_context):
+    refresher = BackgroundRefresher('test-refresh', '测试')
+
+    def refresh():
+        raise RuntimeError('boom')
+
+    assert refresher.trigger(refresh)
+    assert refresher.join(5)
+    assert refresher.trigger(refresh)
+    assert refresher.join(5)
+
+
+def test_no_refresh_without_app_context():
+    refresher = BackgroundRefresher('test-refresh', '测试')
+    assert not refresher.trigger(lambda: None)
+
+
+def test_snapshot_serves_old_lists_while_refreshing(app_context, monkeypatch):
+    import database.db_operations as db_operations
+    started, release = threading.Event(), threading.Event()
+    lists = {'popular': ['a'], 'new': [], 'high_rated': []}
+
+    def snapshot(limit=10):
+        if lists['popular'] == ['b']:  # 第一次建立快照之后的刷新：等待测试放行
+            started.set()
+            release.wait(5)
+        return {name: list(rows) for name, rows in lists.items()}
+
+    monkeypatch.setattr(db_operations, 'get_song_lists_snapshot', snapshot)
+    popularity = PopularitySnapshot(capacity=10, refresh_seconds=3600, refresh_plays=1)
+    assert popularity.get('popular') == ['a']
+    version = popularity.version
+
+    lists['popular'] = ['b']
+    popularity.note_activity()
+    assert started.wait(5)
+    # 后台刷新还没有完成：继续返回旧快照，不等待
+    assert popularity.get('popular') == ['a']
+    assert popularity.version == version
+
+    release.set()
+    assert popularity._refresher.join(5)
+    assert popularity.get('popular') == ['b']
+    assert popularity.version == version + 1
@@ -0,0 +1,85 @@
+"""候选来源：各来源的截止时间互不影响，线程池中的任务不训练模型"""
+import threading
+import time
+import numpy as np
+from recommender.candidates import CandidateSource, ModelSource, run_sources
+from recommender.collaborative import CollaborativeFiltering
+from recommender.interactions import InteractionMatrix
+
+
+class StaticSource(CandidateSource):
+    """等待 delay 秒后返回固定结果"""
+
+    def __init__(self, name, delay, deadline):
+        self.name = name
+        self.delay = delay
+        super().__init__(deadline)
+
+    def generate(self, user_id, top_n, activity):
+        time.sleep(self.delay)
+        return [(self.name, 1.0)]
+
+
+def _activity():
+    return {'precomputed': {}, 'plays': {}, 'ratings': {}}
+
+
+def test_slow_source_does_not_delay_others(app_context):
+    fast = StaticSource('fast', 0.0, deadline=0.5)
+    slow = StaticSource('slow', 1.0, deadline=0.1)
+    start = time.perf_counter()
+    results = run_sources([slow, fast], user_id=1, top_n=5, load_activity=_activity, budget=0.5)
+    elapsed = time.perf_counter() - start
+
+    assert results == {'fast': [('fast', 1.0)]}
+    assert elapsed < 0.4
+
+
+def test_timed_out_source_uses_last_result(app_context):
+    source = StaticSource('flaky', 0.0, deadline=0.2)
+    assert run_sources([source], 1, 5, _activity) == {'flaky': [('flaky', 1.0)]}
+    source.delay = 0.5
+    assert run_sources([source], 1, 5, _activity) == {'flaky': [('flaky', 1.0)]}
+
+
+def test_unfitted_model_never_trains_in_the_pool(app_context):
+    rng = np.random.default_rng(0)
+    users = np.repeat(np.arange(1, 51), 5)
+    interactions = InteractionMatrix.from_triples(users, rng.integers(1, 101, len(users)),
+                                                  np.ones(len(users), dtype=np.float32),
+                                                  song_ids=np.arange(1, 101))
+    model = CollaborativeFiltering(top_n=10)
+    release = threading.Event()
+    fits = []
+
+    def fit(user_id=None, **kwargs):
+        fits.append(threading.current_thread().name)
+        release.wait(5)
+        model.fit_matrix(interactions)
+        return True
+
+    model.fit = fit
+    sources = [ModelSource('collaborative', model, deadline=0.3), StaticSource('charts', 0.0, deadline=0.3)]
+
+    # 并发请求：模型在后台训练，请求不等待，其他来源不受影响
+    results = []
+
+    def request():
+        with app_context.app_context():
+            results.append(run_sources(sources, 7, 5, _activity))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=request) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - start < 1.0
+    assert len(results) == 10
+    assert all(result['charts'] == [('charts', 1.0)] and result['collaborative'] == [] for result in results)
+    assert len(fits) == 1 and not fits[0].startswith('candidates')
+
+    release.set()
+    assert model._refresher.join(5)
+    result = run_sources(sources, 7, 5, _activity)
+    assert result['collaborative']
@@ -0,0 +1,42 @@
+"""条件 GET：ETag 区分同一资源的不同表示"""
+import time
+import pytest
+from flask import Flask, request
+from web.conditional import conditional_get
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/item/<int:item_id>')
+    @conditional_get(lambda item_id: ('7', time.time() - 60))
+    def item(item_id):
+        calls.append(item_id)
+        return {'id': item_id, 'fields': request.args.get('fields', '')}
+
+    client = app.test_client()
+    client.calls = calls
+    return client
+
+
+def test_fields_change_the_etag(client):
+    full = client.get('/item/1')
+    sparse = client.get('/item/1?fields=id,title')
+    assert full.status_code == sparse.status_code == 200
+    assert full.headers['ETag'] != sparse.headers['ETag']
+
+    # 完整表示的 ETag 不能让稀疏字段集的请求得到 304，反之亦然
+    response = client.get('/item/1?fields=id,title', headers={'If-None-Match': full.headers['ETag']})
+    assert response.status_code == 200
+    response = client.get('/item/1', headers={'If-None-Match': sparse.headers['ETag']})
+    assert response.status_code == 200
+
+
+def test_same_query_is_not_modified(client):
+    first = client.get('/item/1?fields=id,title&x=1')
+    calls = len(client.calls)
+    response = client.get('/item/1?x=1&fields=id,title', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert len(client.calls) == calls
@@ -0,0 +1,160 @@
+"""常驻内存的模型：过期后在后台重新训练，训练期间请求继续使用旧状态，新状态一次替换"""
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+import pytest
+from recommender.interactions import InteractionMatrix
+from recommender.collaborative import CollaborativeFiltering
+from recommender.als import ImplicitALSRecommender
+from recommender.content_based import ContentBasedRecommender
+
+
+def _interactions(num_users, num_songs, seed):
+    rng = np.random.default_rng(seed)
+    users = np.repeat(np.arange(1, num_users + 1), 8)
+    songs = rng.integers(1, num_songs + 1, size=len(users))
+    values = rng.random(len(users)).astype(np.float32) + 0.5
+    return InteractionMatrix.from_triples(users, songs, values, song_ids=np.arange(1, num_songs + 1))
+
+
+def _collaborative(interactions):
+    return CollaborativeFiltering(top_n=10).fit_matrix(interactions)
+
+
+def _als(interactions):
+    return ImplicitALSRecommender(top_n=10, factors=8, iterations=2).fit_matrix(interactions)
+
+
+MODELS = [_collaborative, _als]
+
+
+class SlowRefit:
+    """把模型的 fit() 换成等待测试放行后再在新数据上训练"""
+
+    def __init__(self, model, interactions):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+        def fit(user_id=None, **kwargs):
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            model.fit_matrix(interactions)
+            return True
+
+        model.fit = fit
+
+
+@pytest.mark.parametrize('make_model', MODELS)
+def test_stale_model_refits_in_background(app_context, make_model):
+    model = make_model(_interactions(200, 300, seed=1))
+    old_state = model.state
+    slow = SlowRefit(model, _interactions(400, 900, seed=2))
+
+    start = time.perf_counter()
+    assert model.ensure_fitted(max_age=0)
+    assert slow.started.wait(5)
+    # 重新训练进行中：其他请求不等待，继续使用旧状态，也不会再启动第二次训练
+    for _ in range(5):
+        assert model.ensure_fitted(max_age=0)
+        assert model.state is old_state
+    assert time.perf_counter() - start < 1.0
+    assert model.is_refitting
+
+    # 替换前后并发读取，每次读到的都是完整的一个版本
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                model.recommend_ids(7, 10)
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    slow.release.set()
+    assert model._refresher.join(5)
+    time.sleep(0.05)
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert not errors
+    assert model.state is not old_state
+    assert model.state.interactions.shape == (400, 900)
+    assert slow.calls == 1
+
+
+@pytest.mark.parametrize('make_model', MODELS)
+def test_first_fit_without_waiting(app_context, make_model):
+    model = make_model(_interactions(50, 80, seed=3))
+    model.state = None
+    slow = SlowRefit(model, _interactions(50, 80, seed=4))
+
+    assert not model.ensure_fitted(wait=False)
+    assert slow.started.wait(5)
+    assert not model.ensure_fitted(wait=False)
+    slow.release.set()
+    assert model._refresher.join(5)
+    assert model.ensure_fitted(wait=False)
+    assert slow.calls == 1
+
+
+Row = namedtuple('Row', 'id genre artist release_year duration audio_features')
+
+
+def _song_rows(start, end):
+    return [Row(i, f'genre{i % 5}', f'artist{i % 17}', 1990 + i % 30, 180 + i % 60, {'energy': (i % 10) / 10})
+            for i in range(start, end)]
+
+
+def test_stale_content_model_refits_in_background(app_context):
+    model = ContentBasedRecommender(top_n=10).fit_rows(_song_rows(1, 200))
+    old_state = model.state
+    loaded, release = threading.Event(), threading.Event()
+
+    def load_song_rows(song_ids=None):
+        rows = _song_rows(1, 400)
+        loaded.set()
+        release.wait(5)
+        return rows
+
+    model._load_song_rows = load_song_rows
+    assert model.ensure_fitted(max_age=0)
+    assert loaded.wait(5)
+    assert model.ensure_fitted(max_age=0)
+    assert model.state is old_state
+    assert model.similar_song_ids(3, 5)
+
+    release.set()
+    assert model._refresher.join(5)
+    assert len(model.state.song_ids) == 399
+
+
+def test_content_songs_added_during_refit_are_kept(app_context):
+    model = ContentBasedRecommender(top_n=10).fit_rows(_song_rows(1, 200))
+    loaded, release = threading.Event(), threading.Event()
+
+    def load_song_rows(song_ids=None):
+        rows = _song_rows(1, 200)  # 训练读取的曲库不含之后追加的新歌
+        loaded.set()
+        release.wait(5)
+        return rows
+
+    model._load_song_rows = load_song_rows
+    assert model.ensure_fitted(max_age=0)
+    assert loaded.wait(5)
+    assert model.add_songs(_song_rows(200, 210)) == 10
+    assert 205 in model.state.song_index
+
+    release.set()
+    assert model._refresher.join(5)
+    state = model.state
+    assert 205 in state.song_index
+    assert len(state.song_ids) == len(state.features) == 209
+    assert model._pending is None
@@ -0,0 +1,23 @@
+"""客户端批量上报播放的字段校验"""
+from database.models import db, Song, User, PlayEvent
+from database.db_operations import record_play_batch
+
+
+def test_rejects_bool_and_fractional_values(db_app):
+    db.session.add(User(id=1, username='u1', email='u1@example.com', password_hash='x'))
+    db.session.add_all([Song(id=i, title=f'song {i}', artist='artist') for i in (1, 2, 3)])
+    db.session.commit()
+
+    result = record_play_batch(1, [
+        {'song_id': True, 'duration': 30},
+        {'song_id': 2.5, 'duration': 30},
+        {'song_id': 2, 'duration': False},
+        {'song_id': 2, 'duration': 30.5},
+        {'song_id': 2, 'duration': 30},
+        {'song_id': 3.0, 'duration': '40'},
+    ])
+
+    assert result['accepted'] == 2
+    assert [item['index'] for item in result['rejected']] == [0, 1, 2, 3]
+    assert {item['reason'] for item in result['rejected']} == {'字段类型错误'}
+    assert sorted(song_id for song_id, in db.session.query(PlayEvent.song_id)) == [2, 3]
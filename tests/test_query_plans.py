@@ -0,0 +1,228 @@
+"""
+查询计划回归测试：在一个小的 SQLite 数据集上调用 database.db_operations（及歌曲列表分页 database.song_pages、
+字段投影 database.song_fields）的每个公开函数，对它们执行的每条 SQL 运行 EXPLAIN QUERY PLAN，
+出现全表扫描（SCAN 表 且没有使用索引）或临时B树排序/分组（USE TEMP B-TREE）即失败。
+
+- SQL 归属于直接执行它的函数；其他模块（推荐模型、搜索索引的整库加载）执行的语句不检查
+- 这些模块新增公开函数却没有在 _cases 中给出调用方式时同样失败，保证检查覆盖全部函数
+- 设计上就要处理整张表的语句（全量统计、全量重建）列在 ALLOWED 中并写明原因
+- 不执行 ANALYZE：没有统计信息时 SQLite 的查询计划只依赖索引本身、与表的大小无关，
+  因此小数据集上的计划与线上大库相同
+"""
+import os
+import time
+import inspect
+import traceback
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import event, text
+from config import Config
+from database.models import db, Song, User, Rating, PlayHistory, PlayEvent
+from database import db_operations, song_pages, song_fields
+
+NUM_SONGS = 3000
+NUM_USERS = 300
+GENRES = ['流行', '摇滚', '嘻哈', '爵士', '古典', '电子', 'R&B', '民谣', '乡村', '蓝调']
+CHARS = [chr(0x4e00 + i) for i in range(0, 20000, 7)]
+
+# (函数名, 计划中的问题) -> 允许的原因
+ALLOWED = {
+    ('get_system_stats', 'SCAN songs'): '全表统计（一次聚合），结果由 database.system_stats 缓存并按 TTL 刷新',
+    ('update_all_song_ratings', 'SCAN songs'): '不指定 song_ids 时按设计重建全部歌曲的评分统计（离线维护）',
+    ('update_all_song_play_counts', 'SCAN songs'): '按设计重建全部歌曲的播放次数（离线维护）',
+    ('get_song_lists_snapshot', 'USE TEMP B-TREE FOR ORDER BY'): '只对合并后的三个榜单（最多 3×limit 行）排序',
+    ('search_songs', 'SCAN songs'): '空查询时不排序，LIMIT 取满一页即停止',
+}
+CHECKED_MODULES = (db_operations, song_pages, song_fields)
+# 自身不执行被检查的语句的函数：不访问数据库、只执行 DDL，或查询由推荐模型执行
+NO_SQL = {'parse_fields', 'song_columns', 'encode_cursor', 'decode_cursor', 'upgrade_schema', 'get_similar_users'}
+PUBLIC_FUNCTIONS = sorted(name for module in CHECKED_MODULES
+                          for name, func in inspect.getmembers(module, inspect.isfunction)
+                          if func.__module__ == module.__name__ and not name.startswith('_'))
+_checked_files = {module.__file__ for module in CHECKED_MODULES}
+
+
+def _cases(sample):
+    """每个公开函数的调用方式；sample 为数据集中的样本ID"""
+    user_id, song_id, other_song = sample['user_id'], sample['song_id'], sample['other_song']
+    now = datetime.utcnow()
+    fields = ('id', 'title', 'artist')
+    return {
+        'get_system_stats': lambda: db_operations.get_system_stats(),
+        'get_top_songs': lambda: db_operations.get_top_songs(10),
+        'get_new_songs': lambda: db_operations.get_new_songs(10),
+        'get_high_rated_songs': lambda: db_operations.get_high_rated_songs(10),
+        'get_song_lists_snapshot': lambda: db_operations.get_song_lists_snapshot(limit=50),
+        'get_user_activity_snapshot': lambda: db_operations.get_user_activity_snapshot(user_id),
+        'get_song_summaries': lambda: db_operations.get_song_summaries([song_id, other_song]),
+        'get_song_by_id': lambda: (db_operations.get_song_by_id(song_id),
+                                   db_operations.get_song_by_id(song_id, fields=('id', 'title'))),
+        'record_play': lambda: db_operations.record_play(user_id, song_id, 120),
+        'record_plays': lambda: db_operations.record_plays([(user_id, song_id, 200, now, None)]),
+        'record_play_batch': lambda: db_operations.record_play_batch(user_id, [
+            {'song_id': other_song, 'duration': 180, 'key': f'check-{time.time()}'},
+        ]),
+        'search_songs': lambda: (db_operations.search_songs(sample['title'][:3]),
+                                 db_operations.search_songs(sample['title'][:3], fields=fields),
+                                 db_operations.search_songs(''), db_operations.search_songs('', fields=fields)),
+        'fuzzy_search_songs': lambda: (db_operations.fuzzy_search_songs(sample['artist']),
+                                       db_operations.fuzzy_search_songs(sample['artist'], fields=fields)),
+        'count_search_songs': lambda: (db_operations.count_search_songs(sample['title'][:3]),
+                                       db_operations.count_search_songs('')),
+        'get_user_ratings': lambda: db_operations.get_user_ratings(user_id),
+        'get_user_play_history': lambda: db_operations.get_user_play_history(user_id),
+        'get_similar_songs': lambda: db_operations.get_similar_songs(song_id),
+        'add_song': lambda: db_operations.add_song({'title': '检查用歌曲', 'artist': sample['artist'],
+                                                    'genre': '流行', 'play_count': 0}),
+        'batch_add_songs': lambda: db_operations.batch_add_songs([
+            {'title': f'检查用歌曲{i}', 'artist': sample['artist'], 'genre': '摇滚'} for i in range(3)
+        ]),
+        'update_song_rating': lambda: db_operations.update_song_rating(song_id),
+        'create_user': lambda: db_operations.create_user(f'check{time.time()}', f'check{time.time()}@x.com', 'pw'),
+        'authenticate_user': lambda: db_operations.authenticate_user('user1', 'wrong'),
+        'get_similar_users': lambda: db_operations.get_similar_users(user_id),
+        'add_rating': lambda: db_operations.add_rating(user_id, other_song, 4),
+        'delete_rating': lambda: db_operations.delete_rating(user_id, other_song),
+        'update_all_song_ratings': lambda: (db_operations.update_all_song_ratings(song_ids=[song_id]),
+                                            db_operations.update_all_song_ratings()),
+        'update_all_song_play_counts': lambda: db_operations.update_all_song_play_counts(),
+        'upgrade_schema': lambda: db_operations.upgrade_schema(),
+        'encode_cursor': lambda: song_pages.encode_cursor('play_count', 3, song_id),
+        'decode_cursor': lambda: song_pages.decode_cursor(song_pages.encode_cursor('new', now, song_id), 'new'),
+        'get_song_page': lambda: [
+            song_pages.get_song_page(sort_by, genre=genre, artist=artist, page=page, cursor=cursor, with_total=True,
+                                     fields=page_fields)
+            for page_fields in (None, fields)
+            for sort_by in song_pages.SONG_SORTS
+            for genre, artist in (('', ''), ('流行', '')) + (('', sample['artist']),) * (sort_by == 'play_count')
+            for page, cursor in ((50, None), (None, song_pages.get_song_page(
+                sort_by, genre=genre, artist=artist, limit=5)['next_cursor']))
+        ],
+        'parse_fields': lambda: song_fields.parse_fields('title,artist'),
+        'song_columns': lambda: song_fields.song_columns(fields),
+        'song_to_dict': lambda: song_fields.song_to_dict(song_fields.get_song_rows([song_id])[0]),
+        'get_song_rows': lambda: song_fields.get_song_rows([song_id, other_song], fields),
+    }
+
+
+def _generate(rng):
+    """歌曲（标题2-6个汉字，每位歌手约20首）、用户、评分、播放历史和播放事件（每位用户约25条）"""
+    songs = []
+    for i in range(NUM_SONGS):
+        artist = ''.join(CHARS[j] for j in np.random.default_rng(i // 20).integers(0, len(CHARS), 3))
+        title = ''.join(CHARS[j] for j in rng.integers(0, len(CHARS), int(rng.integers(2, 7))))
+        songs.append({'id': i + 1, 'title': title, 'artist': artist, 'album': f'{artist}的专辑{i % 7}',
+                      'genre': GENRES[i % len(GENRES)], 'play_count': int(rng.zipf(1.5) % 100000)})
+    db.session.execute(Song.__table__.insert(), songs)
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+        for i in range(1, NUM_USERS + 1)
+    ])
+    start = datetime.utcnow() - timedelta(days=30)
+    ratings, histories, events = [], [], []
+    for user_id in range(1, NUM_USERS + 1):
+        for song_id in np.unique(rng.integers(1, NUM_SONGS + 1, 25)).tolist():
+            at = start + timedelta(seconds=int(rng.integers(0, 30 * 86400)))
+            ratings.append({'user_id': user_id, 'song_id': song_id,
+                            'rating': float(rng.integers(1, 6)), 'created_at': at})
+            histories.append({'user_id': user_id, 'song_id': song_id, 'play_count': int(rng.integers(1, 20)),
+                              'last_played': at, 'total_duration': 600})
+            events.append({'user_id': user_id, 'song_id': song_id, 'played_at': at, 'duration': 200})
+    for table, rows in ((Rating, ratings), (PlayHistory, histories), (PlayEvent, events)):
+        db.session.execute(table.__table__.insert(), rows)
+    db.session.commit()
+    db_operations.update_all_song_ratings()
+    db_operations.update_all_song_play_counts()
+
+
+def _caller():
+    """直接执行这条 SQL 的函数名（SQLAlchemy 之外最内层的栈帧不在被检查的模块中时为 None）"""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        path = frame.filename.replace(os.sep, '/')
+        if ('/sqlalchemy/' in path or '/flask_sqlalchemy/' in path or path.startswith('<sqlalchemy')
+                or frame.filename == __file__):
+            continue
+        return frame.name if frame.filename in _checked_files else None
+    return None
+
+
+def _problems(plan, tables):
+    """查询计划中的全表扫描（只看数据表，子查询的结果集不算）和临时B树"""
+    problems = []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        if words[0] == 'SCAN' and words[1] in tables and ' USING ' not in detail:
+            problems.append(f'SCAN {words[1]}')
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+@pytest.fixture(scope='module')
+def plan_db(tmp_path_factory):
+    """生成好数据的 SQLite 数据库，返回 (应用, 各函数的调用方式)"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        _generate(np.random.default_rng(0))
+        row = db.session.execute(text('SELECT id, title, artist FROM songs WHERE id = :id'),
+                                 {'id': NUM_SONGS // 2}).one()
+        sample = {'user_id': 7, 'song_id': row.id, 'other_song': row.id + 1,
+                  'title': row.title, 'artist': row.artist}
+        yield app, _cases(sample)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_every_public_function_has_a_case(plan_db):
+    _, cases = plan_db
+    assert [name for name in PUBLIC_FUNCTIONS if name not in cases] == []
+
+
+@pytest.mark.parametrize('name', PUBLIC_FUNCTIONS)
+def test_query_plan_uses_indexes(plan_db, name):
+    app, cases = plan_db
+    if name not in cases:
+        pytest.skip('没有调用方式（见 test_every_public_function_has_a_case）')
+
+    with app.app_context():
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            caller = _caller()
+            if caller is not None and statement.lstrip().upper().startswith(
+                    ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')):
+                statements.append((caller, statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            cases[name]()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        tables = set(db.metadata.tables)
+        failures, checked = [], set()
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for caller, statement, parameters in statements:
+                if (caller, statement) in checked:
+                    continue
+                checked.add((caller, statement))
+                if isinstance(parameters, list):  # executemany 取第一组参数
+                    parameters = parameters[0] if parameters else ()
+                plan = cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                failures += [f"{caller}: {problem}\n    {' '.join(statement.split())[:200]}"
+                             for problem in _problems(plan, tables) if (caller, problem) not in ALLOWED]
+        finally:
+            connection.close()
+
+    # 防止检查本身失效（例如调用方识别错误时什么都不检查）
+    assert checked or name in NO_SQL, f'{name} 没有执行任何被检查的语句'
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,86 @@
+"""搜索索引的后台重建：重建期间加入的新歌在新索引替换旧索引后仍然存在"""
+import threading
+import pytest
+from collections import namedtuple
+from database.models import db, Song
+from search.memory_index import MemorySongIndex
+from search.suggest import SuggestIndex
+from search.fuzzy import FuzzyIndex
+
+Row = namedtuple('Row', 'id title artist album genre play_count')
+
+
+def _insert_songs(count):
+    db.session.execute(Song.__table__.insert(), [
+        {'id': i, 'title': f'song {i}', 'artist': f'artist {i % 5}', 'album': f'album {i % 7}',
+         'genre': 'pop', 'play_count': i} for i in range(1, count + 1)
+    ])
+    db.session.commit()
+
+
+def _block_build(index):
+    """重建读取数据库之后、替换索引之前等待测试放行"""
+    building, release = threading.Event(), threading.Event()
+    build = index.build
+
+    def blocked(rows):
+        building.set()
+        release.wait(5)
+        return build(rows)
+
+    index.build = blocked
+    return building, release
+
+
+@pytest.mark.parametrize('make_index, find', [
+    (MemorySongIndex, lambda index: index.search(['brand'])),
+    (lambda: SuggestIndex(cache_range=4), lambda index: [item['song_id'] for item in index.suggest('brand new')]),
+])
+def test_songs_added_during_reload_are_kept(db_app, make_index, find):
+    _insert_songs(30)
+    index = make_index()
+    assert index.load()
+    building, release = _block_build(index)
+
+    assert index._refresher.trigger(index._reload)
+    assert building.wait(5)
+    # 重建已经读完数据库：这首新歌只能由 add_songs 加入
+    assert index.add_songs([Row(1000, 'brand new song', 'artist 1', 'album 1', 'pop', 0)])
+    assert find(index) == [1000]
+
+    release.set()
+    assert index._refresher.join(5)
+    assert find(index) == [1000]
+    assert index._pending is None
+
+
+def test_suggest_replay_does_not_double_count(db_app):
+    _insert_songs(10)
+    index = SuggestIndex(cache_range=4)
+    assert index.load()
+    popularity = {item['text']: item['popularity'] for item in index.suggest('artist', 10)}
+    building, release = _block_build(index)
+
+    assert index._refresher.trigger(index._reload)
+    assert building.wait(5)
+    index.add_songs([Row(1000, 'brand new song', 'artist 1', 'album 1', 'pop', 3)])
+    release.set()
+    assert index._refresher.join(5)
+
+    after = {item['text']: item['popularity'] for item in index.suggest('artist', 10)}
+    assert after['artist 1'] == popularity['artist 1'] + 3
+
+
+def test_fuzzy_stays_dirty_for_songs_added_during_reload(db_app):
+    _insert_songs(10)
+    index = FuzzyIndex()
+    assert index.load()
+    building, release = _block_build(index)
+
+    assert index._refresher.trigger(index._reload)
+    assert building.wait(5)
+    index.add_songs([Row(1000, 'brand new song', 'artist 1', 'album 1', 'pop', 0)])
+    release.set()
+    assert index._refresher.join(5)
+    assert index._dirty
+
@@ -0,0 +1,22 @@
+"""歌曲评分统计：增量维护与全量重建得到相同的（保留一位小数的）平均分"""
+from database.models import db, Song, User
+from database.db_operations import add_rating, update_all_song_ratings, update_song_rating
+
+
+def test_incremental_and_rebuild_round_the_same(db_app):
+    db.session.add_all([User(id=i, username=f'u{i}', email=f'u{i}@example.com', password_hash='x')
+                        for i in (1, 2, 3)])
+    db.session.add(Song(id=1, title='song', artist='artist'))
+    db.session.commit()
+    for user_id, rating in ((1, 5), (2, 4), (3, 4)):
+        add_rating(user_id, 1, rating)
+    incremental = db.session.get(Song, 1).avg_rating
+
+    update_all_song_ratings()
+    db.session.expire_all()
+    rebuilt = db.session.get(Song, 1).avg_rating
+    update_song_rating(1)
+    db.session.expire_all()
+
+    assert incremental == rebuilt == db.session.get(Song, 1).avg_rating == 4.3
+    assert db.session.get(Song, 1).rating_count == 3
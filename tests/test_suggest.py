@@ -0,0 +1,16 @@
+"""输入提示的返回条数"""
+from collections import namedtuple
+from search.suggest import SuggestIndex
+
+Row = namedtuple('Row', 'id title artist album genre play_count')
+
+
+def _index():
+    return SuggestIndex(cache_range=4).build([Row(i, f'song {i}', 'artist', 'album', 'pop', i) for i in range(1, 30)])
+
+
+def test_limit_is_clamped():
+    index = _index()
+    assert len(index.suggest('song', limit=-5)) == 1
+    assert len(index.suggest('song', limit=3)) == 3
+    assert [item['song_id'] for item in index.suggest('song', limit=2)] == [29, 28]
@@ -0,0 +1,40 @@
+"""用户邻域：计算期间重新训练时，旧模型算出的邻居不写入新模型的缓存"""
+from recommender.user_neighborhood import UserNeighborhood
+
+USERS = [1, 1, 1, 2, 2, 2, 3, 3]
+SONGS = [1, 2, 3, 1, 2, 3, 1, 2]
+RATINGS = [5, 4, 1, 5, 4, 2, 1, 2]
+
+
+def _refit_during_compute(model):
+    """第一次计算邻居时用新的评分重新训练"""
+    compute = model._compute_block
+
+    def compute_block(state, rows):
+        result = compute(state, rows)
+        if not hasattr(model, '_refitted'):
+            model._refitted = True
+            model.fit_arrays(USERS + [4, 4], SONGS + [1, 2], RATINGS + [5, 4])
+        return result
+
+    model._compute_block = compute_block
+
+
+def test_precompute_discards_results_from_replaced_state():
+    model = UserNeighborhood(threshold=0.0).fit_arrays(USERS, SONGS, RATINGS)
+    _refit_during_compute(model)
+
+    assert model.precompute() == 0
+    assert model._cache == {}
+    assert model.precompute() == 4
+    assert 4 in {uid for uid, _, _ in model.similar_users(1, limit=10)}
+
+
+def test_similar_users_does_not_cache_results_from_replaced_state():
+    model = UserNeighborhood(threshold=0.0).fit_arrays(USERS, SONGS, RATINGS)
+    _refit_during_compute(model)
+
+    stale = model.similar_users(1, limit=10)
+    assert 4 not in {uid for uid, _, _ in stale}
+    assert 1 not in model._cache
+    assert 4 in {uid for uid, _, _ in model.similar_users(1, limit=10)}
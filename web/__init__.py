@@ -0,0 +1,7 @@
+"""
+Web 层工具：HTTP 响应缓存和条件 GET
+"""
+from web.page_cache import PageCache, page_cache
+from web.conditional import conditional_get
+
+__all__ = ['PageCache', 'page_cache', 'conditional_get']
@@ -0,0 +1,113 @@
+"""
+JSON 接口的条件 GET（ETag/Last-Modified/304）
+
+视图用 conditional_get(version) 装饰，version(**视图参数) 返回 (版本标识, 最后修改时间)，
+由内存中的版本计数得到（见 database.data_versions、榜单快照的 version），不查询数据库：
+- 请求的 If-None-Match 与当前 ETag 相同（或没有 If-None-Match 而 If-Modified-Since 不早于最后修改时间）时
+  直接返回 304，视图不执行
+- 否则执行视图，200 响应带上 ETag、Last-Modified 和 Cache-Control
+
+ETag 还带有查询参数（排序后）的摘要：同一资源的不同表示（如 ?fields=id,title 与完整字段）ETag 不同。
+版本在视图执行前读取：视图执行期间数据被修改时，响应带的是旧版本，下一次请求会重新获取。
+Last-Modified 精确到秒，按最后修改时间向上取整；最后一次修改就在当前这一秒内时不发送 Last-Modified，
+也不按 If-Modified-Since 判断（同一秒内可能还有修改，客户端拿到的时间无法区分这一秒内的先后）。
+Cache-Control 为 Config.API_CACHE_MAX_AGE 秒内直接使用，之后 Config.API_STALE_WHILE_REVALIDATE 秒内
+可以先使用旧响应、同时在后台验证。
+"""
+import math
+import time
+import zlib
+from functools import wraps
+from datetime import datetime, timezone
+from flask import request, make_response
+from config import Config
+from database.data_versions import data_versions
+
+
+def _cache_control():
+    return (f'public, max-age={Config.API_CACHE_MAX_AGE}, '
+            f'stale-while-revalidate={Config.API_STALE_WHILE_REVALIDATE}')
+
+
+def _set_headers(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = _cache_control()
+    return response
+
+
+def _variant():
+    """查询参数的摘要（参数排序后计算，顺序不同的相同参数得到相同的摘要）"""
+    if not request.args:
+        return ''
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    return f'-{zlib.crc32(query.encode("utf-8")):08x}'
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return last_modified is not None and since is not None and since >= last_modified
+
+
+def conditional_get(version):
+    """视图装饰器；version(**kwargs) 返回 (版本标识, 最后修改时间戳)，返回 None 时不处理"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                current = version(**kwargs)
+            except Exception as e:
+                print(f"⚠️ 接口版本获取错误: {e}")
+                current = None
+            if current is None or request.method != 'GET':
+                return view(*args, **kwargs)
+            tag, modified_at = current
+            etag = f'{data_versions.nonce}-{tag}{_variant()}'
+            # HTTP 日期精确到秒：向上取整，修改发生在当前这一秒内时不使用
+            modified_second = math.ceil(modified_at)
+            last_modified = None
+            if modified_second <= time.time():
+                last_modified = datetime.fromtimestamp(modified_second, tz=timezone.utc)
+
+            if _not_modified(etag, last_modified):
+                return _set_headers(make_response('', 304), etag, last_modified)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_headers(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def song_version(song_id):
+    """单首歌曲详情"""
+    return data_versions.get('catalog', f'song:{song_id}')
+
+
+def genres_version():
+    """流派列表"""
+    return data_versions.get('catalog')
+
+
+def artists_version():
+    """艺术家列表（按总播放次数排序）"""
+    return data_versions.get('catalog', 'plays')
+
+
+def charts_version():
+    """排行榜：榜单快照刷新后改变；热度榜另加热度榜版本，热度分随时间衰减，按热度榜缓存时间分段"""
+    from recommender.popularity_snapshot import popularity_snapshot
+    version = popularity_snapshot.current_version()
+    if version is None:
+        return None
+    tag, modified_at = str(version), popularity_snapshot.built_at or data_versions.started_at
+    if request.args.get('mode') == 'trending' and request.args.get('type', 'popular') == 'popular':
+        from recommender.trending import trending_engine
+        trending_engine.top(20)  # 热度榜缓存过期时重新计算
+        period = int(time.time() // Config.TRENDING_CACHE_SECONDS)
+        tag += f'.{trending_engine.top_version}.{period}'
+        modified_at = max(modified_at, period * Config.TRENDING_CACHE_SECONDS)
+    return tag, modified_at
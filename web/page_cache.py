@@ -0,0 +1,118 @@
+"""
+匿名页面的整页缓存（ETag/304）
+
+首页、探索、排行榜页面对未登录用户完全相同，内容只随榜单数据变化。视图用 page_cache.cached(version)
+装饰，version 返回页面所依赖数据的版本（如榜单快照刷新次数）：
+- 请求带 If-None-Match 且与当前 ETag 相同时直接返回 304，不渲染、不读缓存
+- 缓存中该路径和查询参数的页面版本与当前版本相同时返回缓存的页面
+- 否则渲染页面并缓存（条目超过 Config.PAGE_CACHE_SIZE 时按 LRU 淘汰）
+
+ETag 为强校验值 "进程标识-版本"，进程标识在每次启动时随机生成（重启后版本号从头计数，不会与旧页面混淆）。
+响应带 Cache-Control: Config.PAGE_CACHE_CONTROL 和 Vary: Cookie；已登录用户、有待显示的 flash 消息、
+非 GET 请求、version 返回 None 以及修改了会话的响应都不缓存。
+"""
+import uuid
+import threading
+from functools import wraps
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import request, session, make_response
+from flask_login import current_user
+from config import Config
+
+
+class PageCache:
+    """按 (路径, 查询参数) 缓存渲染好的页面（线程安全）"""
+
+    def __init__(self, max_entries=None, enabled=None):
+        self.max_entries = max_entries or Config.PAGE_CACHE_SIZE
+        self.enabled = Config.PAGE_CACHE_ENABLED if enabled is None else enabled
+        self.nonce = uuid.uuid4().hex[:8]
+        self._entries = OrderedDict()   # key -> (etag, 页面内容, mimetype)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def _key():
+        args = sorted(request.args.items(multi=True))
+        return request.path + ('?' + urlencode(args) if args else '')
+
+    @staticmethod
+    def _cacheable():
+        return (request.method == 'GET' and not current_user.is_authenticated
+                and not session.get('_flashes'))
+
+    @staticmethod
+    def _set_headers(response, etag):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = Config.PAGE_CACHE_CONTROL
+        response.vary.add('Cookie')
+        return response
+
+    def cached(self, version):
+        """视图装饰器；version() 返回页面数据的版本，None 表示不缓存"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or not self._cacheable():
+                    return view(*args, **kwargs)
+                try:
+                    current = version()
+                except Exception as e:
+                    print(f"⚠️ 页面版本获取错误: {e}")
+                    current = None
+                if current is None:
+                    return view(*args, **kwargs)
+                etag = f'{self.nonce}-{current}'
+
+                if request.if_none_match.contains(etag):
+                    self.not_modified += 1
+                    return self._set_headers(make_response('', 304), etag)
+
+                key = self._key()
+                with self._lock:
+                    entry = self._entries.get(key)
+                    hit = entry is not None and entry[0] == etag
+                    if hit:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                if hit:
+                    return self._set_headers(make_response(entry[1], 200, {'Content-Type': entry[2]}), etag)
+
+                self.misses += 1
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough or session.modified:
+                    return response
+                # 版本在渲染前读取：渲染期间数据更新时，下一次请求的版本不同，会重新渲染
+                with self._lock:
+                    self._entries[key] = (etag, response.get_data(), response.headers['Content-Type'])
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                return self._set_headers(response, etag)
+            return wrapper
+        return decorator
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        requests = self.hits + self.misses + self.not_modified
+        return {
+            'enabled': self.enabled,
+            'size': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_rate': round((self.hits + self.not_modified) / requests, 3) if requests else 0.0,
+        }
+
+
+# 全进程共享的整页缓存
+page_cache = PageCache()